@@ -55,6 +55,12 @@ def read_root():
 @app.post("/webhook")
 async def webhook(request: Request):
     body = await request.json()
+    # The intent handlers block (model inference, waiting for care tips); run
+    # them on the webhook thread pool (below) so requests on this worker overlap
+    return await run_in_webhook_pool(handle_webhook, body)
+
+
+def handle_webhook(body: dict) -> JSONResponse:
     logger.info("Request body: %s", json.dumps(body, ensure_ascii=False))
 
     session_path = body.get("session") or body.get("sessionInfo", {}).get("session")
@@ -161,13 +167,18 @@ async def webhook(request: Request):
 # app/main.py
 # ADAPTED VERSION - Enhanced RAG Integration While Preserving Colleague's Code
 
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Header, Request, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import hmac
 import logging
 import json
+import math
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 import logging
 import os
 import sys
@@ -192,6 +203,41 @@ else:
     globals.RAG_AVAILABLE = False
     print(f"⚠️  Services directory not found: {services_dir}")
 
+from app.services.severity_predictor import get_severity_predictor
+
+# Load the classifier at import time: under gunicorn with preload_app the master
+# loads it once and the forked workers share it copy-on-write.
+get_severity_predictor()
+
+# Staged load shedding of the /webhook intents that run RAG work (ADMISSION_CONTROL)
+from app.services.admission import (
+    ADMISSION_CONTROL, WEBHOOK_THREADS, AdmissionControlMiddleware, get_admission_controller,
+)
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionControlMiddleware)
+
+# /webhook handlers run here rather than on the loop's default executor, which
+# stays free for the other to_thread users (batch, diagnostics, model reload).
+# Threads start on first use, so this is safe to create before the fork.
+_webhook_pool = ThreadPoolExecutor(max_workers=WEBHOOK_THREADS, thread_name_prefix="webhook")
+
+
+async def run_in_webhook_pool(func, *args):
+    # Carry the request's context (the admission stage) into the pool thread,
+    # as asyncio.to_thread would
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_webhook_pool, context.run, func, *args)
+
+
+@app.on_event("shutdown")
+def shutdown_webhook_pool():
+    _webhook_pool.shutdown(wait=False, cancel_futures=True)
+
+# Opt-in, redacted recording of /webhook traffic for replay (WEBHOOK_RECORD_PATH)
+if os.getenv("WEBHOOK_RECORD_PATH"):
+    from app.services.webhook_recorder import WebhookRecorderMiddleware
+    app.add_middleware(WebhookRecorderMiddleware)
+
 
 # ===== ENHANCED RAG TESTING ENDPOINTS (NEW) =====
 
@@ -200,6 +246,15 @@ class EnhancedPainCareRequest(BaseModel):
     severity_score: int = Field(..., ge=1, le=5, description="Pain severity score from 1 to 5")
     user_id: Optional[str] = Field(default="default", description="Optional user identifier")
 
+class BatchCareTipItem(BaseModel):
+    user_id: Optional[str] = Field(default="default", description="Optional user identifier")
+    severity_score: int = Field(..., ge=1, le=5, description="Pain severity score from 1 to 5")
+    symptom: str = Field(default="pain", description="Symptom, currently only pain is RAG-enhanced")
+
+class BatchCareTipRequest(BaseModel):
+    items: List[BatchCareTipItem] = Field(..., min_length=1)
+    max_concurrency: Optional[int] = Field(default=None, ge=1, description="Unique computations run at once")
+
 class EnhancedPainCareResponse(BaseModel):
     symptom: str
     severity_score: int
@@ -218,7 +273,7 @@ class EnhancedPainCareResponse(BaseModel):
 @app.get("/health")
 def enhanced_health_check():
     """Enhanced health check endpoint"""
-    return {
+    health = {
         "status": "healthy",
         "service": "Enhanced Parkinson's Care Assistant API",
         "version": "2.0.0",
@@ -230,6 +285,25 @@ def enhanced_health_check():
             "Evidence-based pain management guidance"
         ] if globals.RAG_AVAILABLE else ["Basic API functionality"]
     }
+    health["admission"] = get_admission_controller().stats()
+    # Follow-up topic answers: a failing refresh is retried every FOLLOWUP_RETRY_SECONDS
+    from app.services.followup_topics import get_followup_answers
+    health["followup_answers"] = get_followup_answers().stats()
+    if globals.RAG_AVAILABLE:
+        from app.services.rag.rag_service import (
+            get_semantic_cache_stats, get_single_flight_stats, get_symptom_resource_stats,
+        )
+        from app.services.rag.google_http import get_transport_stats
+        from app.services.rag.resilience import resilience_status
+        # Circuit breaker and rate limiter state of the Gemini clients in this worker
+        health["resilience"] = resilience_status()
+        health["single_flight"] = get_single_flight_stats()
+        health["symptom_resources"] = get_symptom_resource_stats()
+        health["semantic_cache"] = get_semantic_cache_stats()
+        health["google_http"] = get_transport_stats()
+        if health["resilience"]["degraded"]:
+            health["status"] = "degraded"
+    return health
 
 # Enhanced Pain Care Tip Endpoint (POST)
 @app.post("/api/pain/care-tip", response_model=EnhancedPainCareResponse)
@@ -309,233 +383,148 @@ async def get_enhanced_pain_care_tip_get(severity_score: int, user_id: Optional[
         logger.error(f"Unexpected error in get_enhanced_pain_care_tip_get: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Batch Care Tips (NDJSON stream)
+@app.post("/api/pain/care-tip/batch")
+async def get_pain_care_tips_batch(request: BatchCareTipRequest):
+    """
+    Care tips for many users in one call, streamed as NDJSON (one line per item,
+    in completion order, then a summary line). Items with the same severity and
+    symptom share one retrieval and generation.
+
+    Request body:
+    {
+        "items": [{"user_id": "u1", "severity_score": 3, "symptom": "pain"}, ...],
+        "max_concurrency": 4
+    }
+    """
+    if not globals.RAG_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="Enhanced Pain RAG service is not available. Please check server configuration."
+        )
+
+    from app.services.care_tip_batch import BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS, stream_care_tips
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+
+    logger.info(f"Processing batch of {len(request.items)} pain care tip items")
+    items = [item.model_dump() for item in request.items]
+    return StreamingResponse(
+        stream_care_tips(items, request.max_concurrency or BATCH_MAX_CONCURRENCY),
+        media_type="application/x-ndjson",
+    )
+
+# Diagnostics: served from the background report (app/services/diagnostics.py)
+async def _cached_diagnostics_report(name: str, refresh: bool) -> dict:
+    from app.services.diagnostics import get_diagnostics
+    diagnostics = get_diagnostics()
+    # The scheduler starts on first use, so idle workers make no LLM calls
+    diagnostics.start()
+
+    if refresh and not diagnostics.force_refresh():
+        retry_after = math.ceil(diagnostics.refresh_retry_after())
+        raise HTTPException(
+            status_code=429,
+            detail=f"Diagnostics were refreshed recently; try again in {retry_after}s",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    report = diagnostics.report(name)
+    if report is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Diagnostics report not ready yet; the first background run is in progress",
+            headers={"Retry-After": "30"}
+        )
+    if refresh:
+        report['refresh_started'] = True
+    return report
+
+
 # Enhanced Comprehensive Testing
 @app.get("/api/pain/test-all-severities")
-async def test_all_enhanced_pain_severities(user_id: Optional[str] = "test_user"):
+async def test_all_enhanced_pain_severities(user_id: Optional[str] = "test_user", refresh: bool = False):
     """
-    Test endpoint to get ENHANCED care tips for all pain severity levels
-    Includes enhanced system metrics and quality assessment
+    ENHANCED care tips for all pain severity levels, with system metrics and quality assessment.
+    Served from the cached background report (see report_age_seconds); refresh=true
+    starts a re-run in the background and returns the current report, at most once
+    per DIAGNOSTICS_MIN_REFRESH_SECONDS. user_id is ignored.
     """
     if not globals.RAG_AVAILABLE:
         raise HTTPException(
             status_code=503, 
             detail="Enhanced Pain RAG service is not available. Please check server configuration."
         )
-    
-    try:
-        results = {}
-        logger.info("Testing all pain severity levels with ENHANCED system")
-        
-        total_sources = 0
-        total_media = 0
-        total_relevance_score = 0
-        enhanced_searches = 0
-        
-        for severity in range(1, 6):
-            try:
-                result = get_refined_tip_with_rag(severity, "pain", user_id)
-                results[f"severity_{severity}"] = result
-                
-                # Collect enhanced metrics
-                if result['success']:
-                    retrieval_info = result.get('retrieval_info', {})
-                    sources_count = len(result.get('sources', []))
-                    media_count = len(result.get('media_resources', []))
-                    
-                    total_sources += sources_count
-                    total_media += media_count
-                    
-                    if retrieval_info.get('enhanced_pain_search', False):
-                        enhanced_searches += 1
-                    
-                    avg_relevance = retrieval_info.get('avg_pain_relevance_score', 0)
-                    total_relevance_score += avg_relevance
-                    
-                    logger.info(f"Enhanced test severity {severity}: Success - "
-                               f"sources={sources_count}, media={media_count}, "
-                               f"relevance={avg_relevance:.1f}, enhanced={retrieval_info.get('enhanced_pain_search', False)}")
-                else:
-                    logger.error(f"Enhanced test severity {severity}: Failed")
-                    
-            except Exception as e:
-                results[f"severity_{severity}"] = {
-                    'error': str(e),
-                    'success': False,
-                    'severity_score': severity
-                }
-                logger.error(f"Failed to test enhanced severity {severity}: {str(e)}")
-        
-        # Calculate enhanced summary
-        successful_tests = sum(1 for result in results.values() if result.get('success', False))
-        avg_overall_relevance = total_relevance_score / 5 if successful_tests > 0 else 0
-        
-        enhanced_summary = {
-            'total_tests': 5,
-            'successful_tests': successful_tests,
-            'success_rate': f"{successful_tests/5*100:.1f}%",
-            'enhanced_searches_used': enhanced_searches,
-            'enhanced_system_usage': f"{enhanced_searches/5*100:.1f}%",
-            'total_sources_found': total_sources,
-            'total_media_found': total_media,
-            'average_sources_per_test': f"{total_sources/5:.1f}",
-            'average_media_per_test': f"{total_media/5:.1f}",
-            'average_relevance_score': f"{avg_overall_relevance:.2f}",
-            'system_quality': "excellent" if avg_overall_relevance > 20 else "good" if avg_overall_relevance > 15 else "needs_improvement"
-        }
-        
-        return {
-            'enhanced_summary': enhanced_summary,
-            'results': results,
-            'success': True,
-            'system_version': '2.0.0 - Enhanced'
-        }
-        
-    except Exception as e:
-        logger.error(f"Unexpected error in test_all_enhanced_pain_severities: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    return await _cached_diagnostics_report("test_all_severities", refresh)
 
 # Enhanced Validation Endpoint
 @app.get("/api/pain/validate")
-async def validate_enhanced_pain_system():
+async def validate_enhanced_pain_system(refresh: bool = False):
     """
     ENHANCED validation endpoint to check if the pain-focused system is working correctly
     Includes detailed quality metrics and recommendations
+    Served from the cached background report, like /api/pain/test-all-severities
     """
     if not globals.RAG_AVAILABLE:
         raise HTTPException(
             status_code=503, 
             detail="Enhanced Pain RAG service is not available. Please check server configuration."
         )
-    
-    try:
-        logger.info("Running ENHANCED pain system validation")
-        
-        # Test moderate pain (most common case)
-        test_result = get_refined_tip_with_rag(3, "pain", 'enhanced_validation_user')
-        
-        if not test_result['success']:
-            return {
-                'validation_passed': False,
-                'error': test_result.get('error', 'Unknown error'),
-                'system_status': 'FAILED',
-                'recommendations': ['Check enhanced RAG system configuration', 'Verify ChromaDB path', 'Check Google API key']
-            }
-        
-        retrieval_info = test_result.get('retrieval_info', {})
-        sources = test_result.get('sources', [])
-        media_resources = test_result.get('media_resources', [])
-        
-        # Enhanced validation checks
-        enhanced_validation = {
-            'system_responsive': test_result['success'],
-            'enhanced_search_active': retrieval_info.get('enhanced_pain_search', False),
-            'enhanced_filtering_active': retrieval_info.get('enhanced_filtering', False),
-            'pain_sources_found': len(sources),
-            'pain_media_found': len(media_resources),
-            'ai_response_generated': bool(test_result.get('ai_enhanced_tip', '')),
-            'proper_care_level': test_result.get('care_level') == 'basic_care',
-            'high_relevance_scores': retrieval_info.get('avg_pain_relevance_score', 0) > 15
-        }
-        
-        # Check source quality (enhanced)
-        pain_focused_sources = 0
-        general_sources = 0
-        high_relevance_sources = 0
-        
-        for source in sources:
-            title = source.get('title', '').lower()
-            relevance_str = source.get('relevance', '')
-            
-            # Check if source is pain-focused
-            if any(keyword in title for keyword in ['pain', 'relief', 'treatment', 'therapy', 'management']):
-                pain_focused_sources += 1
-            
-            # Check if source is general content (should be filtered out)
-            if any(keyword in title for keyword in ['early signs', 'getting diagnosed', 'about us', 'career', 'homepage']):
-                general_sources += 1
-            
-            # Check relevance score
-            if 'score:' in relevance_str:
-                try:
-                    score_part = relevance_str.split('score:')[1].split(')')[0].strip()
-                    score = float(score_part)
-                    if score > 15:
-                        high_relevance_sources += 1
-                except:
-                    pass
-        
-        enhanced_validation.update({
-            'pain_focused_sources': pain_focused_sources,
-            'general_sources_filtered': general_sources == 0,
-            'high_relevance_sources': high_relevance_sources,
-            'source_quality_excellent': pain_focused_sources == len(sources) and general_sources == 0
-        })
-        
-        # Check AI response quality
-        ai_response = test_result.get('ai_enhanced_tip', '').lower()
-        pain_keywords = ['pain', 'relief', 'therapy', 'treatment', 'management', 'exercise', 'evidence', 'research']
-        pain_keywords_found = [kw for kw in pain_keywords if kw in ai_response]
-        
-        enhanced_validation.update({
-            'pain_keywords_in_response': pain_keywords_found,
-            'pain_focused_ai': len(pain_keywords_found) >= 2,
-            'evidence_based_language': any(word in ai_response for word in ['evidence', 'research', 'studies', 'clinical'])
-        })
-        
-        # Overall validation score
-        validations_passed = sum(1 for v in enhanced_validation.values() if v is True)
-        total_validations = len([v for v in enhanced_validation.values() if isinstance(v, bool)])
-        validation_score = validations_passed / total_validations * 100
-        
-        # Generate recommendations
-        recommendations = []
-        if validation_score >= 85:
-            recommendations.append("✅ EXCELLENT: Enhanced system is working optimally!")
-        elif validation_score >= 70:
-            recommendations.append("✅ GOOD: Enhanced system is working well with minor room for improvement")
-        else:
-            recommendations.append("⚠️ NEEDS IMPROVEMENT: Enhanced system needs attention")
-        
-        if not enhanced_validation['enhanced_search_active']:
-            recommendations.append("❌ Enhanced search not active - check enhanced rag_service.py installation")
-        
-        if general_sources > 0:
-            recommendations.append(f"⚠️ Found {general_sources} general sources - enhanced filtering may need improvement")
-        
-        if enhanced_validation['pain_focused_sources'] == len(sources) and len(sources) > 0:
-            recommendations.append("✅ All sources are pain-focused - excellent enhanced filtering!")
-        
-        if retrieval_info.get('avg_pain_relevance_score', 0) < 15:
-            recommendations.append("⚠️ Consider increasing relevance thresholds for better quality")
-        
-        response = {
-            'validation_passed': validation_score >= 70,
-            'validation_score': f"{validation_score:.1f}%",
-            'system_status': 'EXCELLENT' if validation_score >= 85 else 'GOOD' if validation_score >= 70 else 'NEEDS_IMPROVEMENT',
-            'enhanced_validation_details': enhanced_validation,
-            'source_quality_metrics': {
-                'total_sources': len(sources),
-                'pain_focused_sources': pain_focused_sources,
-                'general_sources': general_sources,
-                'high_relevance_sources': high_relevance_sources,
-                'avg_relevance_score': retrieval_info.get('avg_pain_relevance_score', 0)
-            },
-            'recommendations': recommendations,
-            'test_result_summary': {
-                'care_level': test_result.get('care_level'),
-                'escalation_needed': test_result.get('escalation_needed'),
-                'ai_response_length': len(test_result.get('ai_enhanced_tip', '')),
-                'enhanced_features_used': retrieval_info.get('enhanced_pain_search', False)
-            },
-            'success': True
-        }
-        
-        logger.info(f"Enhanced validation completed: {validation_score:.1f}% score")
-        return response
-        
-    except Exception as e:
-        logger.error(f"Enhanced validation failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Enhanced validation failed: {str(e)}")
+
+    return await _cached_diagnostics_report("validate", refresh)
+
+# Severity model hot reload (MODEL_RELOAD_DIR / MODEL_RELOAD_INTERVAL)
+@app.on_event("startup")
+def start_model_watcher():
+    # Per worker: the watcher thread would not survive the fork from the master
+    get_severity_predictor().start_watcher()
+
+
+def _check_admin_token(token: Optional[str]):
+    admin_token = os.getenv("ADMIN_TOKEN")
+    # Fail closed: without a configured token the admin endpoints are off
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not hmac.compare_digest((token or "").encode(), admin_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+
+@app.get("/admin/model")
+def get_active_model(x_admin_token: Optional[str] = Header(None)):
+    """Active severity model in this worker: version, checksum, load time and reload state."""
+    _check_admin_token(x_admin_token)
+    return get_severity_predictor().status()
+
+
+@app.post("/admin/model/reload")
+async def reload_model(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """
+    Checks the model source now; a changed (or, with force=true, the same)
+    artifact is loaded, smoke-tested and swapped in. Only this worker reloads;
+    the others pick the change up on their next watcher check.
+    """
+    _check_admin_token(x_admin_token)
+    predictor = get_severity_predictor()
+    swapped = await asyncio.to_thread(predictor.check_for_update, force)
+    status = predictor.status()
+    if not swapped and status["last_error"]:
+        raise HTTPException(status_code=422, detail=f"Model not swapped: {status['last_error']}")
+    return {"swapped": swapped, **status}
+
+# Streaming cohorts over user_answers.jsonl (app/services/cohorts.py)
+@app.on_event("startup")
+def start_cohort_updater():
+    from app.services.cohorts import start_cohort_updater as start
+    start()
+
+
+@app.get("/api/cohorts")
+def get_cohorts():
+    """Current cohorts: size, mean severity and centroid profile, plus update stats."""
+    from app.services.cohorts import get_cohort_model
+    model = get_cohort_model()
+    return {"cohorts": model.summary(), **model.stats()}
 
 # Enhanced Information Endpoint
 @app.get("/api/info")
@@ -558,8 +547,12 @@ def get_enhanced_api_info():
             "health": "GET /health - Enhanced health check",
             "pain_care_post": "POST /api/pain/care-tip - Get enhanced pain care tip (POST)",
             "pain_care_get": "GET /api/pain/care-tip/{severity} - Get enhanced pain care tip (GET)",
-            "test_all": "GET /api/pain/test-all-severities - Test all pain severities with enhanced metrics",
-            "validate": "GET /api/pain/validate - Validate enhanced RAG system",
+            "pain_care_batch": "POST /api/pain/care-tip/batch - Care tips for many users, streamed as NDJSON",
+            "test_all": "GET /api/pain/test-all-severities[?refresh=true] - Cached report for all pain severities",
+            "validate": "GET /api/pain/validate[?refresh=true] - Cached validation of the enhanced RAG system",
+            "cohorts": "GET /api/cohorts - Patient cohorts updated incrementally from submissions",
+            "admin_model": "GET /admin/model - Active severity model version and load time",
+            "admin_model_reload": "POST /admin/model/reload[?force=true] - Load, smoke-test and swap in a new model",
             "info": "GET /api/info - This endpoint",
             "docs": "GET /docs - FastAPI interactive documentation"
         },
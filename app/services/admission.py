@@ -0,0 +1,224 @@
+# app/services/admission.py
+# Admission control and staged load shedding for /webhook.
+#
+# Each worker computes a load figure from three signals:
+#   - webhook requests in flight, against ADMISSION_MAX_IN_FLIGHT;
+#   - RAG care-tip generations running (the submit turn's background
+#     threads), against ADMISSION_MAX_RAG_BACKLOG;
+#   - p95 latency of the heavy intents over the last ADMISSION_WINDOW_SECONDS,
+#     against WEBHOOK_SLO_SECONDS.
+# The largest ratio is the load. As it crosses each ADMISSION_STAGE_LOADS
+# threshold, more optional work is shed:
+#   1 skip_rag    submit saves the predefined tip (and the media already
+#                 retrieved) instead of starting a Gemini generation, and
+#                 free-text follow-up questions get the topic menu;
+#   2 predefined  the care-tip turn also stops waiting: it serves the tip if
+#                 it is ready, the predefined tip otherwise;
+#   3 reject      submit and the care-tip turn get an immediate "try again"
+#                 reply (their Dialogflow contexts stay alive for the retry).
+# Core intents (clarification, definition and goal, feedback, fallback) do no
+# model or RAG work and are always served.
+#
+# The middleware decides the stage once per request; handlers read it with
+# current_stage(). The webhook runs its handlers in a thread pool of
+# WEBHOOK_THREADS (default ADMISSION_MAX_IN_FLIGHT), so requests overlap and
+# those queued for a thread count as in flight. Latency is timed from the
+# moment the request reaches the middleware, queueing included. Rejected
+# requests are not counted in the latency window, so the stage steps down
+# only as the slow samples age out of it.
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") == "1"
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+ADMISSION_MAX_RAG_BACKLOG = int(os.getenv("ADMISSION_MAX_RAG_BACKLOG", "16"))
+WEBHOOK_THREADS = int(os.getenv("WEBHOOK_THREADS", str(ADMISSION_MAX_IN_FLIGHT)))
+# Dialogflow gives up on a webhook after 5 s
+WEBHOOK_SLO_SECONDS = float(os.getenv("WEBHOOK_SLO_SECONDS", "4"))
+ADMISSION_WINDOW_SECONDS = float(os.getenv("ADMISSION_WINDOW_SECONDS", "30"))
+# Loads at which stages 1, 2 and 3 start
+ADMISSION_STAGE_LOADS = [float(v) for v in os.getenv("ADMISSION_STAGE_LOADS", "0.8,1.0,1.25").split(",")]
+# Fewer latency samples than this in the window are not a signal
+MIN_LATENCY_SAMPLES = 5
+
+NORMAL, SKIP_RAG, PREDEFINED, REJECT = 0, 1, 2, 3
+STAGE_NAMES = {NORMAL: "normal", SKIP_RAG: "skip_rag", PREDEFINED: "predefined", REJECT: "reject"}
+
+# Intents that run model inference or RAG work; everything else is core
+HEAVY_INTENTS = ("Activity_assessment - custom", "Activity_assessment - custom - yes")
+ADMISSION_PATHS = ("/webhook",)
+
+TRY_AGAIN_TEXT = "I'm getting a lot of requests right now. Please send your last answer again in a few seconds."
+
+_current_stage = contextvars.ContextVar("admission_stage", default=NORMAL)
+
+
+def current_stage() -> int:
+    """Shedding stage decided for the webhook request being handled (NORMAL outside one)."""
+    return _current_stage.get()
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_rag_backlog: int = ADMISSION_MAX_RAG_BACKLOG,
+                 slo_seconds: float = WEBHOOK_SLO_SECONDS, window_seconds: float = ADMISSION_WINDOW_SECONDS,
+                 stage_loads=ADMISSION_STAGE_LOADS):
+        self.max_in_flight = max_in_flight
+        self.max_rag_backlog = max_rag_backlog
+        self.slo_seconds = slo_seconds
+        self.window_seconds = window_seconds
+        self.stage_loads = list(stage_loads)
+        self.in_flight = 0
+        self.rag_backlog = 0
+        self._latencies = deque()  # (finished at, seconds)
+        self._lock = threading.Lock()
+        self.admitted = {STAGE_NAMES[stage]: 0 for stage in (NORMAL, SKIP_RAG, PREDEFINED)}
+        self.rejected = 0
+
+    def _p95_latency(self, now: float) -> float:
+        while self._latencies and self._latencies[0][0] < now - self.window_seconds:
+            self._latencies.popleft()
+        if len(self._latencies) < MIN_LATENCY_SAMPLES:
+            return 0.0
+        return float(np.percentile([seconds for _, seconds in self._latencies], 95))
+
+    def _signals(self, now: float) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight / self.max_in_flight,
+            "rag_backlog": self.rag_backlog / self.max_rag_backlog,
+            "latency": self._p95_latency(now) / self.slo_seconds,
+        }
+
+    def _stage(self, load: float) -> int:
+        return sum(load >= threshold for threshold in self.stage_loads)
+
+    def stage(self) -> int:
+        """Stage the current load maps to, for work that does not pass through the middleware."""
+        if not ADMISSION_CONTROL:
+            return NORMAL
+        with self._lock:
+            return self._stage(max(self._signals(time.monotonic()).values()))
+
+    def admit(self, heavy: bool) -> int:
+        """Counts the request in flight and returns its stage; callers must call release()."""
+        with self._lock:
+            stage = self._stage(max(self._signals(time.monotonic()).values())) if heavy else NORMAL
+            self.in_flight += 1
+            if stage >= REJECT:
+                self.rejected += 1
+            else:
+                self.admitted[STAGE_NAMES[stage]] += 1
+            return stage
+
+    def release(self, heavy: bool, seconds: float, rejected: bool):
+        with self._lock:
+            self.in_flight -= 1
+            if heavy and not rejected:
+                self._latencies.append((time.monotonic(), seconds))
+
+    @contextmanager
+    def rag_job(self):
+        """Counts a background RAG generation in the backlog while it runs."""
+        with self._lock:
+            self.rag_backlog += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.rag_backlog -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            signals = self._signals(now)
+            load = max(signals.values())
+            return {
+                "enabled": ADMISSION_CONTROL,
+                "stage": STAGE_NAMES[self._stage(load)],
+                "load": round(load, 3),
+                "signals": {name: round(value, 3) for name, value in signals.items()},
+                "in_flight": self.in_flight,
+                "rag_backlog": self.rag_backlog,
+                "p95_latency_seconds": round(self._p95_latency(now), 3),
+                "slo_seconds": self.slo_seconds,
+                "admitted": dict(self.admitted),
+                "rejected": self.rejected,
+            }
+
+
+_admission_controller_instance = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global _admission_controller_instance
+    if _admission_controller_instance is None:
+        _admission_controller_instance = AdmissionController()
+    return _admission_controller_instance
+
+
+def try_again_response() -> Dict[str, Any]:
+    return {
+        "fulfillmentText": TRY_AGAIN_TEXT,
+        "fulfillmentMessages": [{"text": {"text": [TRY_AGAIN_TEXT]}}],
+    }
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware deciding each ADMISSION_PATHS request's shedding stage."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in ADMISSION_PATHS or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+
+        # The intent decides whether the request can be shed, so read the body
+        # first and replay it to the app
+        messages = []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request" or not message.get("more_body"):
+                break
+        try:
+            body = json.loads(b"".join(m.get("body", b"") for m in messages) or b"{}")
+            intent = body["queryResult"]["intent"]["displayName"]
+        except (ValueError, KeyError, TypeError):
+            intent = ""
+
+        async def replay_receive():
+            return messages.pop(0) if messages else await receive()
+
+        controller = get_admission_controller()
+        heavy = intent in HEAVY_INTENTS
+        stage = controller.admit(heavy)
+        try:
+            if stage >= REJECT:
+                logger.warning(f"Shedding '{intent}': load {controller.stats()['load']}")
+                payload = json.dumps(try_again_response()).encode()
+                await send({"type": "http.response.start", "status": 200,
+                            "headers": [(b"content-type", b"application/json"),
+                                        (b"content-length", str(len(payload)).encode())]})
+                await send({"type": "http.response.body", "body": payload})
+                return
+            token = _current_stage.set(stage)
+            try:
+                await self.app(scope, replay_receive, send)
+            finally:
+                _current_stage.reset(token)
+        finally:
+            controller.release(heavy, time.perf_counter() - start, stage >= REJECT)
@@ -0,0 +1,79 @@
+# app/services/care_tip_batch.py
+# Batch care tips for many (user_id, severity, symptom) items, streamed as NDJSON.
+#
+# The RAG result depends only on (severity, symptom, prompt version), so a
+# batch of thousands of users collapses to a handful of unique computations.
+# Each unique key runs once, at most max_concurrency at a time in worker
+# threads, and as soon as it finishes one line per item that asked for it is
+# streamed back. The last line is a summary.
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List
+
+from app.services.rag.rag_service import coalescing_key, get_refined_tip_with_rag
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "5000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+
+def _line(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+async def stream_care_tips(items: List[Dict], max_concurrency: int = BATCH_MAX_CONCURRENCY) -> AsyncIterator[str]:
+    """
+    Yields one NDJSON line per item ({"index", "user_id", "severity_score",
+    "symptom", "result"}) in completion order, then {"summary": {...}}.
+    """
+    start = time.perf_counter()
+    groups: Dict[tuple, List[int]] = {}
+    for index, item in enumerate(items):
+        groups.setdefault(coalescing_key(item["severity_score"], item.get("symptom", "pain")), []).append(index)
+
+    semaphore = asyncio.Semaphore(max(1, min(max_concurrency, BATCH_MAX_CONCURRENCY)))
+
+    async def run(key: tuple):
+        severity, symptom, _ = key
+        async with semaphore:
+            # The RAG call blocks on retrieval and Gemini; keep it off the event loop
+            try:
+                result = await asyncio.to_thread(
+                    get_refined_tip_with_rag, severity, symptom, items[groups[key][0]].get("user_id", "batch"))
+            except Exception as e:
+                result = {'symptom': symptom, 'severity_score': severity, 'error': str(e), 'success': False}
+        return key, result
+
+    succeeded = failed = degraded = 0
+    for task in asyncio.as_completed([run(key) for key in groups]):
+        key, result = await task
+        for index in groups[key]:
+            item = items[index]
+            if result.get("success"):
+                succeeded += 1
+            else:
+                failed += 1
+            degraded += bool(result.get("degraded"))
+            yield _line({
+                "index": index,
+                "user_id": item.get("user_id", "default"),
+                "severity_score": item["severity_score"],
+                "symptom": item.get("symptom", "pain"),
+                "result": result,
+            })
+
+    summary = {
+        "items": len(items),
+        "unique_computations": len(groups),
+        "succeeded": succeeded,
+        "failed": failed,
+        "degraded": degraded,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    logger.info(f"Batch care tips: {summary}")
+    yield _line({"summary": summary})
@@ -1,12 +1,21 @@
+import os
 import json
+import time
 import logging
 
-from app.services.utils import read_refined_care_tip, save_refined_care_tip
+from app.services.admission import PREDEFINED, current_stage, get_admission_controller
+from app.services.utils import read_refined_care_tip, save_refined_care_tip, is_care_tip_pending
 from app.services.pain_handlers import handle_pain_report
 from app.services.collect_answers import extract_answers_from_context
 
 logger = logging.getLogger(__name__)
 
+# How long the "yes" turn waits for a care tip that another worker is still generating
+CARE_TIP_WAIT_SECONDS = float(os.getenv("CARE_TIP_WAIT_SECONDS", "3"))
+# A pending marker older than this belongs to a generation whose worker died;
+# twice the worst case of a chat call (LLM_TIMEOUT 20 s, three attempts)
+CARE_TIP_STALE_SECONDS = float(os.getenv("CARE_TIP_STALE_SECONDS", "120"))
+
 
 def handle_care_tip(body):
     session_id = body.get("session", "").split("/")[-1]
@@ -15,7 +24,31 @@ def handle_care_tip(body):
 
     logger.info(f"Reading from saved care-tip file, session_id: {session_id}, uuid: {uuid}")
 
-    care_tips = read_refined_care_tip(session_id, uuid)
+    # Under load, don't hold the request polling for a tip that may be minutes away
+    shedding = current_stage() >= PREDEFINED
+    care_tips = read_refined_care_tip(session_id, uuid, wait_seconds=0 if shedding else CARE_TIP_WAIT_SECONDS)
+    if is_care_tip_pending(care_tips) and _is_stale(care_tips):
+        logger.warning(f"Care tip pending since {care_tips.get('time')}, treating it as failed, session_id: {session_id}")
+        if care_tips.get("severity_score") is None:
+            care_tips = None
+        else:
+            care_tips = _pain_care_tip(session_id, care_tips["severity_score"], predefined_only=True)
+            save_refined_care_tip(session_id, uuid, care_tips)
+    if is_care_tip_pending(care_tips) and shedding and care_tips.get("severity_score") is not None:
+        logger.info(f"Care tip still pending under load, serving the predefined tip, session_id: {session_id}")
+        return _pain_care_tip(session_id, care_tips["severity_score"], predefined_only=True)
+    if is_care_tip_pending(care_tips):
+        return {
+            "fulfillmentText": "Your care tips are still being prepared. Please reply \"Yes\" again in a few seconds.",
+            "fulfillmentMessages": [
+                {
+                    "text": {
+                        "text": ["Your care tips are still being prepared. Please reply \"Yes\" again in a few seconds."]
+                    }
+                }
+            ],
+        }
+
     if not care_tips:
         return {
             "fulfillmentText": "Sorry, failed to retrieve care tip. Please try again later.",
@@ -32,22 +65,43 @@ def handle_care_tip(body):
     return care_tips
 
 
+def _is_stale(marker) -> bool:
+    return time.time() - marker.get("time", 0) > CARE_TIP_STALE_SECONDS
+
+
+def _pain_care_tip(session_id: str, severity_score: int, predefined_only: bool = False):
+    return handle_pain_report({
+        "queryResult": {
+            "parameters": {
+                "severity_score": severity_score,
+                "symptom": "pain"
+            },
+        },
+        "session": session_id,
+    }, predefined_only=predefined_only)
+
+
+def save_predefined_care_tip(session_id: str, uuid: str, severity_score: int):
+    """Saves the predefined care tip right away, for a submit that sheds the RAG generation."""
+    save_refined_care_tip(session_id, uuid, _pain_care_tip(session_id, severity_score, predefined_only=True))
+
+
 def run_rag_async(session_id: str, uuid: str, severity_score: int):
     try:
         logger.info(f"[RAG async] start processing, session_id: {session_id}, uuid: {uuid}, severity_score: {severity_score}")
-        result = handle_pain_report({
-            "queryResult": {
-                "parameters": {
-                    "severity_score": severity_score,
-                    "symptom": "pain"
-                },
-            },
-            "session": session_id,
-        })
+        # Counted in the RAG backlog that admission control sheds on
+        with get_admission_controller().rag_job():
+            result = _pain_care_tip(session_id, severity_score)
 
         logger.info(f"[RAG async] result: {json.dumps(result, ensure_ascii=False)}")
 
         # Save care tips
         save_refined_care_tip(session_id, uuid, result)
     except Exception as e:
-        logger.error(f"[RAG async] Failed to get care tip: {str(e)}")
\ No newline at end of file
+        logger.error(f"[RAG async] Failed to get care tip: {str(e)}")
+        # Replace the pending marker, or every "yes" turn would keep asking the user to wait
+        try:
+            save_predefined_care_tip(session_id, uuid, severity_score)
+        except Exception as fallback_err:
+            logger.error(f"[RAG async] Failed to save the predefined care tip: {str(fallback_err)}")
+            save_refined_care_tip(session_id, uuid, {})
\ No newline at end of file
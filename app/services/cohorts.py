@@ -0,0 +1,305 @@
+# app/services/cohorts.py
+# Incrementally updated patient cohorts (streaming mini-batch k-means).
+#
+# clustering.ipynb clusters the whole dataset offline (KMeans, k=5, on the
+# one-hot categorical + ordinal score encoding). Here the same KMeans is fitted
+# once on the seed dataset, and then the centroids follow new submissions.
+# Rows appended to user_answers.jsonl are read in fixed batches of
+# COHORT_BATCH_SIZE. Each batch moves every centroid to the running mean of
+# the rows assigned to it (the mini-batch k-means update), so there is never a
+# full refit.
+#
+# The model is a (k, 15) float32 centroid array plus per-cohort counts.
+# Assigning a submission is one distance computation against k centroids.
+# Batches end at fixed row counts, so every worker that tails the same file
+# ends up with identical centroids and cohort ids.
+#
+#   python -m app.services.cohorts                       # catch up on user_answers.jsonl and print cohorts
+#   python -m app.services.cohorts --answers answers.jsonl --state cohorts.npz
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COHORT_COUNT = int(os.getenv("COHORT_COUNT", "5"))
+COHORT_BATCH_SIZE = int(os.getenv("COHORT_BATCH_SIZE", "64"))
+# Seconds between reads of new rows; 0 disables the background updater
+COHORT_UPDATE_INTERVAL = float(os.getenv("COHORT_UPDATE_INTERVAL", "30"))
+COHORT_ANSWERS_PATH = os.getenv("COHORT_ANSWERS_PATH", "user_answers.jsonl")
+# Optional .npz file the centroids are saved to, so a restart resumes instead of re-reading
+COHORT_STATE_PATH = os.getenv("COHORT_STATE_PATH", "")
+COHORT_SEED_DATA = os.getenv("COHORT_SEED_DATA", os.path.join(BASE_DIR, "data", "synthetic_users_dataset_2000.csv"))
+RANDOM_STATE = 42
+
+# Encoding used by clustering.ipynb: one-hot categories, then the scores as ordinals (1..5 -> 0..4)
+CATEGORIES = {
+    "pain_type": ["burning", "dull", "sharp", "throbbing"],
+    "radiates": ["no", "yes"],
+    "duration": ["last week", "more than a week ago", "several days ago", "today", "yesterday"],
+}
+SCORE_FIELDS = ["self_score", "sleep_score", "activity_score", "mood_score"]
+FEATURE_NAMES = [f"{field}={value}" for field, values in CATEGORIES.items() for value in values] + SCORE_FIELDS
+_OFFSETS = {}
+_position = 0
+for _field, _values in CATEGORIES.items():
+    _OFFSETS[_field] = {value: _position + i for i, value in enumerate(_values)}
+    _position += len(_values)
+_SCORE_START = _position
+
+
+def encode(answers: Dict) -> Optional[np.ndarray]:
+    """Feature vector for one assessment, or None if a field is missing or unknown."""
+    x = np.zeros(len(FEATURE_NAMES), dtype=np.float32)
+    try:
+        for field, offsets in _OFFSETS.items():
+            x[offsets[str(answers[field]).strip().lower()]] = 1.0
+        for i, field in enumerate(SCORE_FIELDS):
+            score = int(answers[field])
+            if not 1 <= score <= 5:
+                return None
+            x[_SCORE_START + i] = score - 1
+    except (KeyError, TypeError, ValueError):
+        return None
+    return x
+
+
+def _severity(answers: Dict) -> Optional[float]:
+    value = answers.get("predicted_severity_score", answers.get("severity_score"))
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class CohortModel:
+    def __init__(self, centroids: np.ndarray, counts: np.ndarray, severity_sums: np.ndarray,
+                 severity_counts: np.ndarray, fitted_offset: int = 0, rows_fitted: int = 0):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.counts = counts.astype(np.int64)
+        self.severity_sums = severity_sums.astype(np.float64)
+        self.severity_counts = severity_counts.astype(np.int64)
+        # Byte offset in the answers file after the last row of the last fitted batch
+        self.fitted_offset = fitted_offset
+        self.rows_fitted = rows_fitted
+        self.updated_at = time.time()
+        self._update_lock = threading.Lock()
+
+    @classmethod
+    def bootstrap(cls, seed_path: str = COHORT_SEED_DATA, k: int = COHORT_COUNT) -> "CohortModel":
+        """Initial centroids: the notebook's KMeans on the seed dataset."""
+        import pandas as pd
+        from sklearn.cluster import KMeans
+
+        rows = pd.read_csv(seed_path).to_dict(orient="records")
+        encoded = [(encode(r), _severity(r)) for r in rows]
+        X = np.stack([x for x, _ in encoded if x is not None])
+        severities = np.array([s for x, s in encoded if x is not None], dtype=np.float64)
+        labels = KMeans(n_clusters=k, random_state=RANDOM_STATE, n_init=10).fit_predict(X)
+        # Order cohorts by mean severity so ids read mildest to most severe
+        mean_severity = np.array([severities[labels == j].mean() for j in range(k)])
+        order = np.argsort(mean_severity)
+        remap = np.empty(k, dtype=np.int64)
+        remap[order] = np.arange(k)
+        labels = remap[labels]
+        centroids = np.stack([X[labels == j].mean(axis=0) for j in range(k)])
+        counts = np.bincount(labels, minlength=k)
+        return cls(centroids, counts, np.bincount(labels, weights=severities, minlength=k), counts.copy())
+
+    def assign(self, answers: Dict) -> Optional[int]:
+        """Cohort id for one submission (O(k)); None if the answers are incomplete."""
+        x = encode(answers)
+        if x is None:
+            return None
+        centroids = self.centroids  # one read: a concurrent update swaps the whole array
+        return int(((centroids - x) ** 2).sum(axis=1).argmin())
+
+    def partial_fit(self, X: np.ndarray, severities: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Mini-batch k-means step: each centroid becomes the mean of everything
+        assigned to it so far. Returns the batch's labels.
+        """
+        centroids = self.centroids
+        k = len(centroids)
+        distances = (X * X).sum(axis=1)[:, None] - 2 * X @ centroids.T + (centroids * centroids).sum(axis=1)
+        labels = distances.argmin(axis=1)
+        batch_counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids, dtype=np.float64)
+        np.add.at(sums, labels, X)
+        counts = self.counts + batch_counts
+        updated = centroids.astype(np.float64)
+        moved = batch_counts > 0
+        updated[moved] = (updated[moved] * self.counts[moved, None] + sums[moved]) / counts[moved, None]
+
+        if severities is not None:
+            known = ~np.isnan(severities)
+            self.severity_sums = self.severity_sums + np.bincount(labels[known], weights=severities[known], minlength=k)
+            self.severity_counts = self.severity_counts + np.bincount(labels[known], minlength=k)
+        self.counts = counts
+        self.centroids = updated.astype(np.float32)
+        self.rows_fitted += len(X)
+        self.updated_at = time.time()
+        return labels
+
+    def _batches(self, path: str, batch_size: int) -> Iterable[tuple]:
+        """(X, severities, end_offset) for each full batch of complete new lines."""
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < self.fitted_offset:
+                logger.info(f"{path} was truncated or rotated; reading it from the start")
+                self.fitted_offset = 0
+            f.seek(self.fitted_offset)
+            offset = self.fitted_offset
+            vectors, severities = [], []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a row still being written; read it next time
+                offset += len(line)
+                try:
+                    answers = json.loads(line)
+                except ValueError:
+                    continue
+                x = encode(answers)
+                if x is None:
+                    continue
+                severity = _severity(answers)
+                vectors.append(x)
+                severities.append(np.nan if severity is None else severity)
+                if len(vectors) == batch_size:
+                    yield np.stack(vectors), np.array(severities), offset
+                    vectors, severities = [], []
+
+    def update_from_file(self, path: str = COHORT_ANSWERS_PATH, batch_size: int = COHORT_BATCH_SIZE) -> int:
+        """Fits every full batch of rows appended since the last call; returns the rows fitted."""
+        if not os.path.exists(path):
+            return 0
+        with self._update_lock:
+            fitted = 0
+            for X, severities, end_offset in self._batches(path, batch_size):
+                self.partial_fit(X, severities)
+                self.fitted_offset = end_offset
+                fitted += len(X)
+            return fitted
+
+    def save(self, path: str):
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, counts=self.counts, severity_sums=self.severity_sums,
+                 severity_counts=self.severity_counts, fitted_offset=self.fitted_offset, rows_fitted=self.rows_fitted)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CohortModel":
+        with np.load(path) as state:
+            return cls(state["centroids"], state["counts"], state["severity_sums"], state["severity_counts"],
+                       int(state["fitted_offset"]), int(state["rows_fitted"]))
+
+    def summary(self) -> List[Dict]:
+        """Per cohort: size, mean severity and the profile its centroid describes."""
+        cohorts = []
+        for j, centroid in enumerate(self.centroids):
+            profile = {}
+            for field, offsets in _OFFSETS.items():
+                values = list(offsets)
+                block = centroid[[offsets[v] for v in values]]
+                profile[field] = values[int(block.argmax())]
+            for i, field in enumerate(SCORE_FIELDS):
+                profile[field] = round(float(centroid[_SCORE_START + i]) + 1, 2)
+            severity = self.severity_sums[j] / self.severity_counts[j] if self.severity_counts[j] else None
+            cohorts.append({
+                "cohort": j,
+                "size": int(self.counts[j]),
+                "mean_severity": round(float(severity), 2) if severity is not None else None,
+                "profile": profile,
+            })
+        return cohorts
+
+    def stats(self) -> Dict:
+        return {
+            "k": len(self.centroids),
+            "rows_fitted": self.rows_fitted,
+            "fitted_offset": self.fitted_offset,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.updated_at)),
+            "batch_size": COHORT_BATCH_SIZE,
+            "update_interval_seconds": COHORT_UPDATE_INTERVAL,
+        }
+
+
+_cohort_model_instance = None
+_cohort_model_lock = threading.Lock()
+_updater = None
+
+
+def get_cohort_model() -> CohortModel:
+    global _cohort_model_instance
+    if _cohort_model_instance is None:
+        with _cohort_model_lock:
+            if _cohort_model_instance is None:
+                model = None
+                if COHORT_STATE_PATH and os.path.exists(COHORT_STATE_PATH):
+                    try:
+                        model = CohortModel.load(COHORT_STATE_PATH)
+                    except Exception as e:
+                        logger.warning(f"Cohort state {COHORT_STATE_PATH} not loaded ({e}); bootstrapping")
+                _cohort_model_instance = model or CohortModel.bootstrap()
+    return _cohort_model_instance
+
+
+def assign_cohort(answers: Dict) -> Optional[int]:
+    """Cohort of a submission; never raises, so it can't break the submit turn."""
+    try:
+        return get_cohort_model().assign(answers)
+    except Exception as e:
+        logger.warning(f"Cohort assignment failed: {e}")
+        return None
+
+
+def start_cohort_updater(interval: float = COHORT_UPDATE_INTERVAL):
+    # Per worker, after the fork; a no-op when disabled or already running
+    global _updater
+    if interval <= 0 or (_updater is not None and _updater.is_alive()):
+        return
+
+    def run():
+        while True:
+            try:
+                model = get_cohort_model()
+                if model.update_from_file() and COHORT_STATE_PATH:
+                    model.save(COHORT_STATE_PATH)
+            except Exception as e:
+                logger.warning(f"Cohort update failed: {e}")
+            time.sleep(interval)
+
+    _updater = threading.Thread(target=run, daemon=True, name="cohort-updater")
+    _updater.start()
+    logger.info(f"Updating cohorts from {COHORT_ANSWERS_PATH} every {interval}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the streaming cohorts from collected answers")
+    parser.add_argument("--answers", default=COHORT_ANSWERS_PATH)
+    parser.add_argument("--state", default=COHORT_STATE_PATH, help="Load/save the centroids here (.npz)")
+    parser.add_argument("--batch-size", type=int, default=COHORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    model = CohortModel.load(args.state) if args.state and os.path.exists(args.state) else CohortModel.bootstrap()
+    start = time.perf_counter()
+    fitted = model.update_from_file(args.answers, args.batch_size)
+    print(f"✅ Fitted {fitted} new rows from {args.answers} in {time.perf_counter() - start:.2f}s "
+          f"({model.rows_fitted} since bootstrap)")
+    if args.state:
+        model.save(args.state)
+        print(f"💾 State saved to {args.state}")
+    for cohort in model.summary():
+        print(f"   cohort {cohort['cohort']}: {cohort['size']:>8} rows, mean severity {cohort['mean_severity']}, "
+              f"{cohort['profile']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# app/services/followup_topics.py
+# Precomputed answers for pain follow-up questions ("exercise", "medication",
+# "doctor", ...), served from memory by handle_pain_followup.
+#
+# The follow-up answers are cut from the moderate (severity 3) pain care tip.
+# Before, every follow-up ran that retrieval and a Gemini generation just to
+# slice a few hundred characters. Now one background refresh produces the tip
+# and composes every topic's answer from it. The refresh runs on first use,
+# then every FOLLOWUP_REFRESH_SECONDS (FOLLOWUP_RETRY_SECONDS after a failed or
+# degraded result). A follow-up is one regex match plus a dict lookup. Until
+# the first refresh finishes, each topic's fixed evidence-based text is
+# served instead.
+#
+# Other questions are answered by rag_service.answer_question, which reuses
+# the answer of an earlier similar question (semantic_cache.py) instead of
+# generating a new one.
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+FOLLOWUP_SEVERITY = 3  # Default moderate severity for follow-up
+FOLLOWUP_REFRESH_SECONDS = float(os.getenv("FOLLOWUP_REFRESH_SECONDS", "3600"))
+FOLLOWUP_RETRY_SECONDS = float(os.getenv("FOLLOWUP_RETRY_SECONDS", "60"))
+# Answer follow-ups that match no topic with RAG instead of the topic menu.
+# Off by default: each new question costs an embedding, a retrieval and a Gemini call
+FOLLOWUP_FREE_TEXT = os.getenv("FOLLOWUP_FREE_TEXT", "0") == "1"
+# Shorter inputs ("ok", "thanks") get the topic menu
+MIN_QUESTION_WORDS = 3
+
+GENERAL = "general"
+# Keywords that make a question a topic follow-up, and which topic answers it.
+# Checked in this order, as substrings ("exercises" is an exercise question).
+TOPIC_KEYWORDS = (
+    ("exercise", ("exercise",)),
+    ("medication", ("medication",)),
+    ("doctor", ("doctor", "healthcare")),
+)
+TRIGGER_KEYWORDS = ("exercise", "therapy", "medication", "doctor")
+
+_TRIGGER_RE = re.compile("|".join(re.escape(k) for k in TRIGGER_KEYWORDS))
+_TOPIC_RES = [(topic, re.compile("|".join(re.escape(k) for k in keywords))) for topic, keywords in TOPIC_KEYWORDS]
+
+DEFAULT_TEXT = "I can help you with pain management strategies."
+FALLBACK_TEXTS = {
+    "exercise": "Here are evidence-based exercise recommendations for pain management:\n\n"
+                "Gentle exercises like walking, stretching, and range-of-motion activities can help with pain "
+                "management. Always consult your healthcare provider before starting new exercises.",
+    "medication": "Regarding pain medication for Parkinson's:\n\n"
+                  "It's important to work with your healthcare provider to find the right pain management approach. "
+                  "They can help determine if medication adjustments or new treatments might help with your pain.",
+    "doctor": "When speaking with your healthcare provider about pain:\n\n"
+              "• Describe the location, intensity, and timing of your pain\n"
+              "• Share what makes it better or worse\n"
+              "• Mention how it affects your daily activities\n"
+              "• Keep a pain diary to track patterns\n",
+    GENERAL: DEFAULT_TEXT,
+}
+
+
+def match_topic(user_input: str) -> Optional[str]:
+    """Topic answering the question, GENERAL for other trigger words, None if it isn't a topic follow-up."""
+    text = user_input.lower()
+    if not _TRIGGER_RE.search(text):
+        return None
+    for topic, pattern in _TOPIC_RES:
+        if pattern.search(text):
+            return topic
+    return GENERAL
+
+
+def compose_answer(topic: str, rag_result: Dict) -> str:
+    """A topic's answer cut from the care tip, worded as handle_pain_followup always did."""
+    ai_content = rag_result.get('ai_enhanced_tip', '') or ''
+    if topic == "exercise":
+        response_text = "Here are evidence-based exercise recommendations for pain management:\n\n"
+        if any(word in ai_content.lower() for word in ["exercise", "stretch", "physical", "movement"]):
+            response_text += ai_content[:400] + "..."
+        else:
+            response_text = FALLBACK_TEXTS["exercise"]
+    elif topic == "medication":
+        response_text = "Regarding pain medication for Parkinson's:\n\n"
+        if "medication" in ai_content.lower():
+            response_text += ai_content[:400] + "..."
+        else:
+            response_text = FALLBACK_TEXTS["medication"]
+    elif topic == "doctor":
+        response_text = FALLBACK_TEXTS["doctor"]
+        if ai_content and len(ai_content) > 50:
+            response_text += f"\n**Additional guidance:** {ai_content[:300]}..."
+    else:
+        response_text = ai_content
+        if not response_text or len(response_text) < 50:
+            response_text = rag_result.get('predefined_tip', DEFAULT_TEXT)
+
+    retrieval_info = rag_result.get('retrieval_info', {})
+    if retrieval_info.get('enhanced_pain_search'):
+        sources_count = retrieval_info.get('total_pain_docs_found', 0)
+        if sources_count > 0:
+            response_text += f"\n\n📚 This information is based on {sources_count} specialized pain management sources."
+    return response_text
+
+
+def answer_free_text(user_input: str) -> Optional[str]:
+    """Answer to a question that matches no topic, or None to show the topic menu."""
+    if not FOLLOWUP_FREE_TEXT or len(user_input.split()) < MIN_QUESTION_WORDS:
+        return None
+    from app.services.admission import SKIP_RAG, get_admission_controller
+    from app.services.rag.rag_service import answer_question
+
+    # Under load the topic menu, which costs nothing, instead of a possible retrieval and Gemini call
+    if get_admission_controller().stage() >= SKIP_RAG:
+        return None
+
+    result = answer_question(user_input, "pain")
+    if not result.get('success') or len(result.get('answer', '')) < 50:
+        return None
+    response_text = result['answer']
+    if result.get('sources'):
+        response_text += f"\n\n📚 This information is based on {len(result['sources'])} specialized pain management sources."
+    return response_text
+
+
+class FollowupAnswers:
+    def __init__(self, refresh_seconds: float = FOLLOWUP_REFRESH_SECONDS,
+                 retry_seconds: float = FOLLOWUP_RETRY_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+        self.answers: Dict[str, str] = dict(FALLBACK_TEXTS)
+        self.refreshed_at = None
+        self.last_error = ""
+        self.refreshes = 0
+        self.failed_refreshes = 0
+        self.served = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def refresh(self) -> bool:
+        """Recomputes every topic's answer from one care tip; True if it was a full (non-degraded) result."""
+        from app.services.rag.rag_service import get_refined_tip_with_rag
+
+        start = time.perf_counter()
+        rag_result = get_refined_tip_with_rag(severity_score=FOLLOWUP_SEVERITY, symptom="pain",
+                                              user_id="followup_prefetch")
+        if not rag_result.get('success'):
+            self.last_error = rag_result.get('error', 'care tip generation failed')
+            logger.warning(f"Follow-up answers not refreshed: {self.last_error}")
+            return False
+
+        # Swap the whole dict: readers see either the old or the new answers
+        self.answers = {topic: compose_answer(topic, rag_result) for topic in FALLBACK_TEXTS}
+        self.refreshed_at = time.time()
+        self.refreshes += 1
+        self.last_error = "degraded result" if rag_result.get('degraded') else ""
+        logger.info(f"Follow-up answers refreshed in {time.perf_counter() - start:.2f}s")
+        return not rag_result.get('degraded')
+
+    def _run(self):
+        while True:
+            try:
+                ok = self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Follow-up answers not refreshed: {e}")
+                ok = False
+            if not ok:
+                self.failed_refreshes += 1
+            self._wake.wait(self.refresh_seconds if ok else self.retry_seconds)
+            self._wake.clear()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="followup-answers")
+                self._thread.start()
+
+    def answer(self, topic: str) -> str:
+        if self._thread is None:
+            self.start()
+        self.served += 1
+        return self.answers.get(topic, DEFAULT_TEXT)
+
+    def stats(self) -> Dict:
+        return {
+            "refreshed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.refreshed_at))
+            if self.refreshed_at else None,
+            "refreshes": self.refreshes,
+            "failed_refreshes": self.failed_refreshes,
+            "served": self.served,
+            "last_error": self.last_error,
+        }
+
+
+_followup_answers_instance = None
+
+
+def get_followup_answers() -> FollowupAnswers:
+    global _followup_answers_instance
+    if _followup_answers_instance is None:
+        _followup_answers_instance = FollowupAnswers()
+    return _followup_answers_instance
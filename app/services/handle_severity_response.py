@@ -1,8 +1,11 @@
 import threading
 from app.services.collect_answers import save_answers_jsonl
 from app.services.collect_answers import extract_answers_from_context
-from app.services.severity_predictor import SeverityPredictor
-from app.services.care_tip_handlers import run_rag_async
+from app.services.severity_predictor import get_severity_predictor
+from app.services.admission import SKIP_RAG, current_stage
+from app.services.care_tip_handlers import run_rag_async, save_predefined_care_tip
+from app.services.utils import mark_care_tip_pending
+from app.services.cohorts import assign_cohort
 from app.config import globals
 
 DESIRED_KEYS = [
@@ -25,11 +28,16 @@ def handle_submit(body):
             user_input_dict[key] = int(user_input_dict[key])
 
     # Predict severity using only allowed fields
-    # Initialize Severity Predictor
-    predictor = SeverityPredictor()
+    # Shared predictor, loaded once per process (or once in the master with preload)
+    predictor = get_severity_predictor()
     severity_score = predictor.predict(user_input_dict)
     user_input_dict["predicted_severity_score"] = severity_score
 
+    # Cohort from the streaming clusters, for care-tip selection and analytics
+    cohort = assign_cohort(user_input_dict)
+    if cohort is not None:
+        user_input_dict["cohort"] = cohort
+
     # Save to JSONL
     save_answers_jsonl(user_input_dict)
 
@@ -37,11 +45,18 @@ def handle_submit(body):
     if globals.RAG_AVAILABLE:
         session_id = body.get("session", "").split("/")[-1]
         care_tip_uuid = body.get("care_tip_uuid", "")
-        threading.Thread(
-            target=run_rag_async,
-            args=(session_id, care_tip_uuid, severity_score),
-            daemon=True
-        ).start()
+        if current_stage() >= SKIP_RAG:
+            # Overloaded: no Gemini generation, the predefined tip is ready for the "yes" turn
+            save_predefined_care_tip(session_id, care_tip_uuid, severity_score)
+        else:
+            # Mark the tip as pending first so the "yes" turn can wait for it,
+            # even if it lands on a different worker than this thread
+            mark_care_tip_pending(session_id, care_tip_uuid, severity_score)
+            threading.Thread(
+                target=run_rag_async,
+                args=(session_id, care_tip_uuid, severity_score),
+                daemon=True
+            ).start()
 
     # Respond to Dialogflow
     return [
@@ -4,14 +4,16 @@ import json
 import time
 from typing import Dict, Any
 import logging
-from .rag.rag_service import get_refined_tip_with_rag
+from .rag.rag_service import get_predefined_tip, get_refined_tip_with_rag
+from .followup_topics import answer_free_text, get_followup_answers, match_topic
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def handle_pain_report(request_data: Dict[str, Any]) -> Dict[str, Any]:
+def handle_pain_report(request_data: Dict[str, Any], predefined_only: bool = False) -> Dict[str, Any]:
     """
-    ENHANCED pain report handler with improved RAG integration
+    ENHANCED pain report handler with improved RAG integration.
+    With predefined_only (load shedding) the tip is the predefined one, without Gemini or retrieval.
     """
     try:
         session_id = request_data.get("session", "").split("/")[-1]
@@ -20,10 +22,13 @@ def handle_pain_report(request_data: Dict[str, Any]) -> Dict[str, Any]:
         symptom = parameters.get("symptom", "pain")
 
         # Get ENHANCED care tip using improved RAG system
-        rag_result = get_refined_tip_with_rag(
-            severity_score=severity_score,
-            symptom=symptom,
-        )
+        if predefined_only:
+            rag_result = get_predefined_tip(severity_score)
+        else:
+            rag_result = get_refined_tip_with_rag(
+                severity_score=severity_score,
+                symptom=symptom,
+            )
 
         ### --------------------- Dummy data for debugging -----------------------
         # tmp_str = r'{"symptom": "pain", "severity_score": 3, "care_level": "basic_care", "escalation_needed": false, "predefined_tip": "Warm packs may help control your pain. However, avoid electric heating pads as they can cause burns with prolonged use.\n\nIf your pain is due to acute injury, consider using a cold pack instead to reduce pain and swelling. This should typically not be done for > 20 minutes.", "ai_enhanced_tip": "Pain management research suggests that combining heat and cold therapy can be particularly effective for some individuals.  You might try alternating between a warm pack (as previously suggested, avoiding electric pads) and a cold pack (for no more than 20 minutes at a time) to see if this approach provides more relief than either method alone.  Remember to always protect your skin with a thin cloth between the pack and your skin to prevent burns or irritation.", "sources": [], "media_resources": [{"type": "podcast", "title": "“Living Well Starts Here” podcast", "organization": "PMD Alliance", "media_url": "https://yopn.podbean.com/", "source_url": "https://yopn.podbean.com/", "description": "“Living Well Starts Here” podcast", "duration": "", "content_preview": "Podcast Title: “Living Well Starts Here” podcast\nDescription: “Living Well Starts Here” podcast\nPodcast URL: https://yopn.podbean.com/\nSource Page: https://www.pmdalliance.org/2025/06/10/tiktok-yopd-c..."}, {"type": "podcast", "title": "Communicating About Off Episodes", "organization": "American Parkinson Disease Association", "media_url": "https://d2icp22po6iej.cloudfront.net/wp-content/uploads/2025/07/82559239_APDA21493-Communicating-About-Off-D4V3_V5_Proof.pdf", "source_url": "https://d2icp22po6iej.cloudfront.net/wp-content/uploads/2025/07/82559239_APDA21493-Communicating-About-Off-D4V3_V5_Proof.pdf", "description": "Communicating About Off Episodes", "duration": "", "content_preview": "Podcast Title: Communicating About Off Episodes\nDescription: Communicating About Off Episodes\nPodcast URL: https://d2icp22po6iej.cloudfront.net/wp-content/uploads/2025/07/82559239_APDA21493-Communicat..."}], "tone_info": {"tone_style": "practical_supportive", "focus_area": "immediate_relief_strategies"}, "retrieval_info": {"enhanced_pain_search": true, "simplified_filtering": true, "total_pain_docs_found": 0, "total_pain_media_found": 2}, "success": true}'
@@ -289,69 +294,24 @@ def handle_pain_followup(request_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     try:
         user_input = request_data.get("queryResult", {}).get("queryText", "")
-        session_id = request_data.get("session", "").split("/")[-1]
         
-        # Check if user is asking for more specific information
-        if any(keyword in user_input.lower() for keyword in ["exercise", "therapy", "medication", "doctor"]):
-            # Use ENHANCED RAG to get more specific information
-            rag_result = get_refined_tip_with_rag(
-                severity_score=3,  # Default moderate severity for follow-up
-                symptom="pain",
-                user_id=session_id
-            )
-            
-            if rag_result['success']:
-                # Extract relevant information based on user's question
-                if "exercise" in user_input.lower():
-                    response_text = "Here are evidence-based exercise recommendations for pain management:\n\n"
-                    # Filter for exercise-related content from AI response
-                    ai_content = rag_result.get('ai_enhanced_tip', '')
-                    if any(word in ai_content.lower() for word in ["exercise", "stretch", "physical", "movement"]):
-                        response_text += ai_content[:400] + "..."
-                    else:
-                        response_text += "Gentle exercises like walking, stretching, and range-of-motion activities can help with pain management. Always consult your healthcare provider before starting new exercises."
-                
-                elif "medication" in user_input.lower():
-                    response_text = "Regarding pain medication for Parkinson's:\n\n"
-                    ai_content = rag_result.get('ai_enhanced_tip', '')
-                    if "medication" in ai_content.lower():
-                        response_text += ai_content[:400] + "..."
-                    else:
-                        response_text += "It's important to work with your healthcare provider to find the right pain management approach. They can help determine if medication adjustments or new treatments might help with your pain."
-                
-                elif "doctor" in user_input.lower() or "healthcare" in user_input.lower():
-                    response_text = "When speaking with your healthcare provider about pain:\n\n"
-                    response_text += "• Describe the location, intensity, and timing of your pain\n"
-                    response_text += "• Share what makes it better or worse\n"
-                    response_text += "• Mention how it affects your daily activities\n"
-                    response_text += "• Keep a pain diary to track patterns\n"
-                    
-                    ai_content = rag_result.get('ai_enhanced_tip', '')
-                    if ai_content and len(ai_content) > 50:
-                        response_text += f"\n**Additional guidance:** {ai_content[:300]}..."
-                
-                else:
-                    response_text = rag_result.get('ai_enhanced_tip', 'I can help you with pain management strategies.')
-                    if not response_text or len(response_text) < 50:
-                        response_text = rag_result.get('predefined_tip', 'I can help you with pain management strategies.')
-                
-                # Add enhanced system note if available
-                retrieval_info = rag_result.get('retrieval_info', {})
-                if retrieval_info.get('enhanced_pain_search'):
-                    sources_count = retrieval_info.get('total_pain_docs_found', 0)
-                    if sources_count > 0:
-                        response_text += f"\n\n📚 This information is based on {sources_count} specialized pain management sources."
-                
-                return {
-                    "fulfillmentText": response_text,
-                    "fulfillmentMessages": [
-                        {
-                            "text": {
-                                "text": [response_text]
-                            }
+        # Topic questions are answered from the precomputed answers
+        # (app/services/followup_topics.py) instead of a RAG call per question
+        topic = match_topic(user_input)
+        # Other questions: the answer to the same or a similar earlier question,
+        # or a new RAG answer (None falls through to the topic menu)
+        response_text = get_followup_answers().answer(topic) if topic is not None else answer_free_text(user_input)
+        if response_text is not None:
+            return {
+                "fulfillmentText": response_text,
+                "fulfillmentMessages": [
+                    {
+                        "text": {
+                            "text": [response_text]
                         }
-                    ]
-                }
+                    }
+                ]
+            }
         
         # Default enhanced follow-up response
         return {
@@ -401,15 +361,18 @@ def handle_other_symptoms(request_data: Dict[str, Any], symptom_type: str) -> Di
         
         symptom = symptom_mapping.get(symptom_type.lower(), symptom_type)
         
-        # Dummy severity score for testing
-        # TODO: Replace with actual ML model prediction
-        dummy_severity = 3  # Default moderate severity
+        # The assessed severity when the request carries one, moderate otherwise
+        parameters = request_data.get("queryResult", {}).get("parameters", {})
+        try:
+            severity_score = int(parameters.get("severity_score") or 3)
+        except (TypeError, ValueError):
+            severity_score = 3
         
         logger.info(f"Processing {symptom} report for session {session_id}")
         
-        # Get enhanced response (currently only pain is enhanced)
+        # Get enhanced response from the symptom's own queries, index and care tips
         rag_result = get_refined_tip_with_rag(
-            severity_score=dummy_severity,
+            severity_score=severity_score,
             symptom=symptom,
             user_id=session_id
         )
@@ -440,7 +403,7 @@ def handle_other_symptoms(request_data: Dict[str, Any], symptom_type: str) -> Di
                         "lifespanCount": 5,
                         "parameters": {
                             "symptom": symptom,
-                            "severity": dummy_severity,
+                            "severity": severity_score,
                             "escalation_reason": f"High severity {symptom} reported"
                         }
                     }
@@ -450,7 +413,7 @@ def handle_other_symptoms(request_data: Dict[str, Any], symptom_type: str) -> Di
             
         else:
             # Fallback response
-            return _create_fallback_response(dummy_severity, symptom, user_input)
+            return _create_fallback_response(severity_score, symptom, user_input)
             
     except Exception as e:
         logger.error(f"Error in handle_other_symptoms: {str(e)}")
@@ -0,0 +1,95 @@
+# app/services/preload.py
+# Preload-before-fork startup: load read-only assets once in the gunicorn master
+# so every forked worker shares them copy-on-write.
+import gc
+import logging
+import os
+import time
+from pathlib import Path
+
+from app.services.rag.index_versions import resolve_chromadb_path
+from app.services.severity_predictor import get_severity_predictor
+
+logger = logging.getLogger(__name__)
+
+# Published index version if ingest.py has written one (see index_versions.py)
+CHROMADB_PATH = resolve_chromadb_path(Path(__file__).parent / "rag" / "ChromaDB_Parkinson_Data")
+
+def _preload_numpy_index():
+    # The NumPy index is pure memory-mapped arrays, so unlike the Chroma client
+    # it is safe to open in the master and use from the forked workers.
+    try:
+        from app.services.rag import rag_service
+        if rag_service.VECTOR_STORE_BACKEND != "numpy":
+            return None
+        from app.services.rag.numpy_store import load_numpy_index
+        return load_numpy_index(rag_service.NUMPY_INDEX_PATH or CHROMADB_PATH / "numpy_index")
+    except Exception as e:
+        logger.warning(f"NumPy index not preloaded: {e}")
+        return None
+
+
+def _preload_lexical_index(numpy_index):
+    # Built from the NumPy index only: reading the Chroma collection here would
+    # open a Chroma client in the master
+    try:
+        from app.services.rag import rag_service
+        if rag_service.RETRIEVAL_MODE not in ("hybrid", "lexical") or numpy_index is None:
+            return None
+        from app.services.rag.lexical_index import load_lexical_index
+        return load_lexical_index(CHROMADB_PATH, numpy_index=numpy_index)
+    except Exception as e:
+        logger.warning(f"Lexical index not preloaded: {e}")
+        return None
+
+
+def preload_assets() -> dict:
+    """
+    Loads the read-only assets in the current (master) process. Call before
+    workers are forked; returns a summary of what was loaded.
+    """
+    start = time.perf_counter()
+
+    get_severity_predictor()
+    numpy_index = _preload_numpy_index()
+    lexical_index = _preload_lexical_index(numpy_index)
+
+    # Import the RAG stack (langchain, Chroma and Google client libraries) so
+    # their code and module state are shared instead of imported per worker.
+    # The clients themselves are built per worker, see reinitialize_after_fork.
+    try:
+        from app.services.rag import rag_service  # noqa: F401
+    except ImportError as e:
+        logger.warning(f"RAG service not preloaded: {e}")
+
+    # Move everything loaded so far out of the GC's reach: a collection in a
+    # worker would otherwise write to these objects' headers and un-share the
+    # copy-on-write pages.
+    gc.collect()
+    gc.freeze()
+
+    summary = {
+        "classifier": True,
+        "numpy_index_docs": len(numpy_index) if numpy_index is not None else 0,
+        "lexical_index_docs": len(lexical_index) if lexical_index is not None else 0,
+        "frozen_objects": gc.get_freeze_count(),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    logger.info(f"Preloaded assets in master (pid {os.getpid()}): {summary}")
+    return summary
+
+
+def reinitialize_after_fork() -> None:
+    """
+    Runs in each worker right after fork. gRPC channels and the Chroma client
+    are not fork-safe, so the embedding/LLM clients and vector store are never
+    created in the master; drop any instance that was, so each worker builds
+    its own on first use.
+    """
+    try:
+        from app.services.rag import rag_service
+        if rag_service._enhanced_pain_rag_instance is not None:
+            logger.warning("RAG instance was created before fork, rebuilding it in the worker")
+            rag_service._enhanced_pain_rag_instance = None
+    except ImportError:
+        pass
@@ -0,0 +1,154 @@
+# app/services/rag/context_builder.py
+# Token-budgeted prompt context from retrieved chunks.
+#
+# Instead of concatenating the first 600 characters of every document, the
+# builder splits the retrieved chunks into sentences, scores each one by its
+# overlap with the severity's queries (plus a small bonus for the document's
+# retrieval rank and for sentences early in a chunk), drops sentences that
+# repeat text already selected, and packs the best ones into a per-severity
+# token budget. Selected sentences are emitted in their original order under
+# a "Source: org - title" header, so the prompt stays readable.
+#
+# Tokens are estimated (about 4 characters per token for English text) so no
+# tokenizer call is needed on the request path.
+
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from langchain.schema import Document
+
+from .lexical_index import tokenize
+
+CHARS_PER_TOKEN = 4
+DEFAULT_CONTEXT_TOKEN_BUDGETS = {1: 250, 2: 300, 3: 400, 4: 500, 5: 600}
+# "severity:tokens" pairs, e.g. "1:200,5:800"; unlisted severities keep the default
+CONTEXT_TOKEN_BUDGETS = {
+    **DEFAULT_CONTEXT_TOKEN_BUDGETS,
+    **{int(k): int(v) for k, v in (pair.split(":") for pair in
+                                   os.getenv("CONTEXT_TOKEN_BUDGETS", "").split(",") if ":" in pair)},
+}
+# Sentences whose word sets overlap an already selected sentence this much are skipped
+DUPLICATE_OVERLAP = 0.7
+MIN_SENTENCE_CHARS = 30
+# Longer runs without sentence punctuation (lists, menus) are cut into pieces of about this size
+MAX_SENTENCE_CHARS = 400
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'“])|\n{2,}|\s\*\s")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _cut(sentence: str) -> List[str]:
+    pieces = []
+    while len(sentence) > MAX_SENTENCE_CHARS:
+        cut = sentence.rfind(" ", 0, MAX_SENTENCE_CHARS)
+        cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+        pieces.append(sentence[:cut])
+        sentence = sentence[cut:].lstrip()
+    return pieces + [sentence]
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = (_SPACE_RE.sub(" ", s).strip(" *#-") for s in _SENTENCE_RE.split(text or ""))
+    return [piece for s in sentences for piece in _cut(s) if len(piece) >= MIN_SENTENCE_CHARS]
+
+
+@dataclass
+class BuiltContext:
+    text: str
+    tokens_used: int
+    token_budget: int
+    sentences_used: int = 0
+    sentences_considered: int = 0
+    duplicates_skipped: int = 0
+    sources_used: List[int] = field(default_factory=list)  # indexes into the input documents
+
+    def stats(self) -> Dict:
+        return {
+            "context_tokens": self.tokens_used,
+            "context_token_budget": self.token_budget,
+            "context_sentences": self.sentences_used,
+            "context_sentences_considered": self.sentences_considered,
+            "context_duplicates_skipped": self.duplicates_skipped,
+            "context_sources": len(self.sources_used),
+        }
+
+
+def _header(doc: Document) -> str:
+    return f"Source: {doc.metadata.get('organization', 'Unknown')} - {doc.metadata.get('title', 'Unknown')}"
+
+
+def _is_duplicate(words: frozenset, selected: List[frozenset]) -> bool:
+    for other in selected:
+        smaller = min(len(words), len(other))
+        if smaller and len(words & other) / smaller >= DUPLICATE_OVERLAP:
+            return True
+    return False
+
+
+def build_context(docs: List[Document], queries: Iterable[str], token_budget: int,
+                  empty_text: str = "Limited pain-specific information available.") -> BuiltContext:
+    """Packs the most query-relevant, non-repeated sentences of docs into token_budget tokens."""
+    query_terms = {term for query in queries for term in tokenize(query)}
+
+    candidates = []  # (score, doc index, sentence index, sentence, words)
+    for rank, doc in enumerate(docs):
+        sentences = split_sentences(doc.page_content)
+        for position, sentence in enumerate(sentences):
+            terms = tokenize(sentence)
+            if not terms:
+                continue
+            overlap = sum(term in query_terms for term in terms)
+            score = overlap / math.sqrt(len(terms)) + 0.5 / (rank + 1) + 0.25 / (position + 1)
+            candidates.append((score, rank, position, sentence, frozenset(terms)))
+    candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+
+    used = 0
+    selected: Dict[int, List[tuple]] = {}
+    selected_words: List[frozenset] = []
+    headers = set()
+    duplicates = 0
+    for score, rank, position, sentence, words in candidates:
+        if _is_duplicate(words, selected_words):
+            duplicates += 1
+            continue
+        # A source's header is paid for once, with its first sentence; chunks of
+        # the same page share one header
+        cost = estimate_tokens(sentence) + 1
+        if _header(docs[rank]) not in headers:
+            cost += estimate_tokens(_header(docs[rank])) + 2
+        if used + cost > token_budget:
+            continue
+        used += cost
+        headers.add(_header(docs[rank]))
+        selected.setdefault(rank, []).append((position, sentence))
+        selected_words.append(words)
+
+    if not selected:
+        return BuiltContext(empty_text, estimate_tokens(empty_text), token_budget,
+                            sentences_considered=len(candidates), duplicates_skipped=duplicates)
+
+    parts: Dict[str, List[str]] = {}
+    for rank in sorted(selected):
+        parts.setdefault(_header(docs[rank]), []).extend(sentence for _, sentence in sorted(selected[rank]))
+    text = "\n\n".join(f"{header}\n{' '.join(sentences)}" for header, sentences in parts.items())
+    return BuiltContext(
+        text=text,
+        tokens_used=estimate_tokens(text),
+        token_budget=token_budget,
+        sentences_used=sum(len(s) for s in selected.values()),
+        sentences_considered=len(candidates),
+        duplicates_skipped=duplicates,
+        sources_used=sorted(selected),
+    )
+
+
+def context_budget(severity: int, budgets: Optional[Dict[int, int]] = None) -> int:
+    budgets = budgets or CONTEXT_TOKEN_BUDGETS
+    return budgets.get(severity, max(budgets.values()))
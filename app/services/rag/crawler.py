@@ -0,0 +1,517 @@
+# app/services/rag/crawler.py
+# Asynchronous crawler for the Parkinson's organization sites.
+#
+# Port of fyi_rag_notebooks/Crawl_ParkinsonWebsites.ipynb (same organizations,
+# link filters, media detection and page text extraction) that:
+#   - crawls all organizations concurrently, with a per-host limit on
+#     concurrent requests and a minimum delay between requests to a host
+#     (the robots.txt Crawl-delay when larger),
+#   - fetches each host's robots.txt once and skips disallowed URLs,
+#   - sends If-None-Match / If-Modified-Since with the validators of the
+#     previous crawl and reuses the previous record on 304 Not Modified,
+#   - streams one JSON line per page and per media item, readable by
+#     ingest.py (see ingest.load_crawl),
+#   - writes the crawl stats in the parkinsons_crawl_summary.json format.
+#
+#   python -m app.services.rag.crawler --output parkinsons_crawl.jsonl --previous parkinsons_crawl.jsonl.prev
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "ParkinsonsCareBot/1.0"
+
+ORGANIZATIONS = {
+    "Parkinson's Foundation": "https://www.parkinson.org/",
+    "Michael J. Fox Foundation": "https://www.michaeljfox.org/",
+    "American Parkinson Disease Association": "https://www.apdaparkinson.org/",
+    "Parkinson Canada": "https://www.parkinson.ca/",
+    "European Parkinson's Disease Association": "https://parkinsonseurope.org/",
+    "Parkinson's UK": "https://www.parkinsons.org.uk/",
+    "Davis Phinney Foundation": "https://davisphinneyfoundation.org/",
+    "PMD Alliance": "https://www.pmdalliance.org/",
+    "ParkinsonNet": "https://www.parkinsonnet.com/"
+}
+
+MEDIA_INDICATORS = {
+    'video': [
+        'youtube.com', 'vimeo.com', 'video', 'watch', 'webinar',
+        'presentation', 'lecture', 'talk', 'interview'
+    ],
+    'podcast': [
+        'podcast', 'audio', 'listen', 'episode', 'spotify.com',
+        'apple.com/podcasts', 'soundcloud.com', 'anchor.fm'
+    ]
+}
+
+EXCLUDED_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
+    r'.*\.(pdf|doc|docx|xls|xlsx|ppt|pptx|zip|rar|tar|gz)$',
+    r'.*/(login|register|signin|signup|cart|checkout|donate|payment)',
+    r'.*\?.*utm_',
+    r'.*#.*',
+    r'.*/search.*',
+    r'.*/tag/.*',
+    r'.*/category/.*',
+    r'.*/author/.*',
+    r'.*/wp-admin/.*',
+    r'.*/wp-content/.*',
+    r'.*\.php\?.*',
+    r'mailto:.*',
+    r'tel:.*',
+    r'javascript:.*'
+]]
+
+_YOUTUBE_RE = re.compile(r'youtube\.com|youtu\.be')
+_VIMEO_RE = re.compile(r'vimeo\.com')
+
+
+# =============================================================================
+# Page parsing (CPU-bound, run in a worker thread)
+# =============================================================================
+
+def classify_media_link(url: str, text: str) -> Optional[str]:
+    url_lower, text_lower = url.lower(), text.lower()
+    for media_type in ('video', 'podcast'):
+        for indicator in MEDIA_INDICATORS[media_type]:
+            if indicator in url_lower or indicator in text_lower:
+                return media_type
+    return None
+
+
+def _media_description(link, link_text: str) -> str:
+    parts = [link_text]
+    parent = link.parent
+    if parent:
+        if link.get('title'):
+            parts.append(link.get('title'))
+        for _ in range(3):
+            if not parent:
+                break
+            parent_text = parent.get_text(strip=True)
+            if parent_text and parent_text != link_text and len(parent_text) < 500:
+                parts.append(parent_text)
+            parent = parent.parent
+    sibling = link.find_next_sibling()
+    if sibling:
+        sibling_text = sibling.get_text(strip=True)
+        if sibling_text and len(sibling_text) < 200:
+            parts.append(sibling_text)
+    return " | ".join(filter(None, parts))
+
+
+def is_valid_url(url: str, base_domain: str) -> bool:
+    try:
+        if base_domain not in urlparse(url).netloc:
+            return False
+        return not any(pattern.match(url) for pattern in EXCLUDED_PATTERNS)
+    except Exception:
+        return False
+
+
+def parse_page(html: bytes, url: str, base_domain: str) -> Dict[str, Any]:
+    """Text (markdown), metadata, media items and internal links of one page, from a single parse."""
+    import html2text
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    media = []
+    internal_links: Set[str] = set()
+    for link in soup.find_all('a', href=True):
+        href = link.get('href')
+        if not href:
+            continue
+        full_url = urljoin(url, href)
+        link_text = link.get_text(strip=True)
+        media_type = classify_media_link(full_url, link_text)
+        if media_type:
+            media.append({'type': media_type, 'url': full_url, 'title': link_text,
+                          'description': _media_description(link, link_text), 'source_page': url})
+
+        parsed = urlparse(full_url)
+        clean_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+        if clean_url.endswith('/') and len(clean_url) > 1:
+            clean_url = clean_url[:-1]
+        if is_valid_url(clean_url, base_domain):
+            internal_links.add(clean_url)
+
+    for pattern, label in ((_YOUTUBE_RE, "YouTube"), (_VIMEO_RE, "Vimeo")):
+        for embed in soup.find_all('iframe', src=pattern):
+            title = embed.get('title') or f"{label} Video"
+            media.append({'type': 'video', 'url': embed.get('src'), 'title': title,
+                          'description': f"Embedded {label} video: {title}", 'source_page': url})
+    for audio in soup.find_all('audio'):
+        if audio.get('src'):
+            title = audio.get('title') or "Audio Content"
+            media.append({'type': 'podcast', 'url': urljoin(url, audio.get('src')), 'title': title,
+                          'description': f"Audio content: {title}", 'source_page': url})
+
+    try:
+        title = soup.title.string.strip() if soup.title else ""
+    except Exception:
+        title = urlparse(url).path[1:].replace("/", "-")
+    meta_description = soup.find("meta", attrs={"name": "description"})
+    meta_keywords = soup.find("meta", attrs={"name": "keywords"})
+
+    for script in soup(["script", "style"]):
+        script.extract()
+    converter = html2text.HTML2Text()
+    converter.images_to_alt = True
+    converter.body_width = 0
+    converter.single_line_break = True
+
+    return {
+        'text': converter.handle(str(soup)),
+        'metadata': {
+            'title': title,
+            'url': url,
+            'description': meta_description.get("content") if meta_description else title,
+            'keywords': meta_keywords.get("content") if meta_keywords else "",
+        },
+        'media': media,
+        'links': sorted(internal_links),
+    }
+
+
+# =============================================================================
+# Politeness: robots.txt cache and per-host limits
+# =============================================================================
+
+class HostPolicy:
+    """
+    Per-host politeness: robots.txt (fetched once), a cap on concurrent
+    requests and a minimum interval between request starts.
+    """
+
+    def __init__(self, session, max_concurrency: int, min_delay: float, user_agent: str = USER_AGENT):
+        self.session = session
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.user_agent = user_agent
+        self._robots: Dict[str, Optional[RobotFileParser]] = {}
+        self._robots_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_start: Dict[str, float] = defaultdict(float)
+        self._pacing_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def robots(self, url: str) -> Optional[RobotFileParser]:
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        async with self._robots_locks[origin]:
+            if origin not in self._robots:
+                parser = None
+                try:
+                    async with self.session.get(f"{origin}/robots.txt", allow_redirects=True) as response:
+                        if response.status == 200:
+                            parser = RobotFileParser()
+                            parser.parse((await response.text(errors="replace")).splitlines())
+                        elif response.status in (401, 403):
+                            # Same convention as urllib.robotparser: access denied means disallow all
+                            parser = RobotFileParser()
+                            parser.disallow_all = True
+                except Exception as e:
+                    logger.info(f"No robots.txt for {origin}: {e}")
+                self._robots[origin] = parser
+        return self._robots[origin]
+
+    async def allowed(self, url: str) -> bool:
+        robots = await self.robots(url)
+        return robots is None or robots.can_fetch(self.user_agent, url)
+
+    async def delay_for(self, url: str) -> float:
+        robots = await self.robots(url)
+        crawl_delay = robots.crawl_delay(self.user_agent) if robots is not None else None
+        return max(self.min_delay, float(crawl_delay or 0))
+
+    def semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[host]
+
+    async def wait_turn(self, url: str):
+        host = urlparse(url).netloc
+        delay = await self.delay_for(url)
+        async with self._pacing_locks[host]:
+            now = time.monotonic()
+            start = max(now, self._next_start[host])
+            self._next_start[host] = start + delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+# =============================================================================
+# Output
+# =============================================================================
+
+def load_previous_crawl(path: Optional[Path]) -> Dict[str, Dict[str, Any]]:
+    """Page records of a previous JSONL crawl by URL, with their media, for conditional requests."""
+    pages: Dict[str, Dict[str, Any]] = {}
+    if not path or not Path(path).exists():
+        return pages
+    media_by_page = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("type") == "page":
+                pages[record["url"]] = record
+            elif record.get("type") == "media":
+                media_by_page[record.get("source_page")].append(record)
+    for url, page in pages.items():
+        page["media"] = media_by_page.get(url, [])
+    return pages
+
+
+class CrawlWriter:
+    """Streams page and media records to a JSONL file as they are produced."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._media_seen: Dict[str, Set[str]] = defaultdict(set)
+
+    def write_page(self, org_name: str, base_url: str, url: str, page: Dict[str, Any], depth: int,
+                   crawled_at: str, etag: Optional[str], last_modified: Optional[str]) -> Tuple[int, int]:
+        record = {
+            "type": "page", "organization": org_name, "base_url": base_url, "url": url,
+            "text": page["text"], "metadata": page["metadata"], "depth": depth, "crawled_at": crawled_at,
+            "etag": etag, "last_modified": last_modified, "links": page["links"],
+        }
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        videos = podcasts = 0
+        for media in page["media"]:
+            if not media.get("url") or media["url"] in self._media_seen[org_name]:
+                continue
+            self._media_seen[org_name].add(media["url"])
+            media_record = {"type": "media", "organization": org_name, "base_url": base_url,
+                            **{k: media.get(k) for k in ("url", "title", "description", "source_page")},
+                            "media_type": media["type"]}
+            self._file.write(json.dumps(media_record, ensure_ascii=False) + "\n")
+            if media["type"] == "video":
+                videos += 1
+            else:
+                podcasts += 1
+        self._file.flush()
+        return videos, podcasts
+
+    def close(self):
+        self._file.close()
+
+
+# =============================================================================
+# Crawler
+# =============================================================================
+
+class AsyncCrawler:
+    def __init__(self, organizations: Dict[str, str] = None, max_pages_per_org: int = 100, max_depth: int = 3,
+                 per_host_concurrency: int = 2, min_delay: float = 1.0, max_connections: int = 16,
+                 timeout: float = 10.0, previous: Dict[str, Dict[str, Any]] = None, user_agent: str = USER_AGENT):
+        self.organizations = organizations or ORGANIZATIONS
+        self.max_pages_per_org = max_pages_per_org
+        self.max_depth = max_depth
+        self.per_host_concurrency = per_host_concurrency
+        self.min_delay = min_delay
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.previous = previous or {}
+        self.user_agent = user_agent
+        self.stats = defaultdict(int)
+
+    async def fetch(self, session, policy: HostPolicy, url: str) -> Tuple[int, Optional[bytes], Dict[str, str]]:
+        """(status, body, headers). Sends the previous crawl's validators, if any."""
+        headers = {}
+        previous = self.previous.get(url)
+        if previous:
+            if previous.get("etag"):
+                headers["If-None-Match"] = previous["etag"]
+            if previous.get("last_modified"):
+                headers["If-Modified-Since"] = previous["last_modified"]
+
+        host = urlparse(url).netloc
+        async with policy.semaphore(host):
+            await policy.wait_turn(url)
+            self.stats["requests"] += 1
+            async with session.get(url, headers=headers, allow_redirects=True) as response:
+                if response.status == 200 and "html" not in response.headers.get("Content-Type", "text/html"):
+                    return 415, None, dict(response.headers)
+                body = await response.read() if response.status == 200 else None
+                self.stats["bytes_downloaded"] += len(body or b"")
+                return response.status, body, dict(response.headers)
+
+    async def crawl_organization(self, session, policy: HostPolicy, writer: CrawlWriter,
+                                 org_name: str, base_url: str) -> Dict[str, Any]:
+        base_domain = urlparse(base_url).netloc
+        visited: Set[str] = set()
+        queue: asyncio.Queue = asyncio.Queue()
+        queue.put_nowait((base_url, 0))
+        result = {"pages_crawled": 0, "videos_found": 0, "podcasts_found": 0, "max_depth_reached": 0,
+                  "not_modified": 0, "errors": 0, "robots_disallowed": 0}
+
+        async def worker():
+            while True:
+                url, depth = await queue.get()
+                try:
+                    if url in visited or depth > self.max_depth or len(visited) >= self.max_pages_per_org:
+                        continue
+                    visited.add(url)
+                    if not await policy.allowed(url):
+                        result["robots_disallowed"] += 1
+                        continue
+
+                    try:
+                        status, body, headers = await self.fetch(session, policy, url)
+                    except Exception as e:
+                        logger.warning(f"Error fetching {url}: {e}")
+                        result["errors"] += 1
+                        continue
+
+                    previous = self.previous.get(url)
+                    if status == 304 and previous:
+                        result["not_modified"] += 1
+                        page = {"text": previous["text"], "metadata": previous["metadata"],
+                                "media": [{**m, "type": m.get("media_type")} for m in previous.get("media", [])],
+                                "links": previous.get("links", [])}
+                        etag, last_modified = previous.get("etag"), previous.get("last_modified")
+                    elif status == 200 and body is not None:
+                        page = await asyncio.to_thread(parse_page, body, url, base_domain)
+                        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+                    else:
+                        logger.info(f"HTTP {status} for {url}")
+                        result["errors"] += 1
+                        continue
+
+                    videos, podcasts = writer.write_page(
+                        org_name, base_url, url, page, depth, time.strftime('%Y-%m-%d %H:%M:%S'), etag, last_modified)
+                    result["pages_crawled"] += 1
+                    result["videos_found"] += videos
+                    result["podcasts_found"] += podcasts
+                    result["max_depth_reached"] = max(result["max_depth_reached"], depth)
+
+                    if depth < self.max_depth:
+                        for link in page["links"]:
+                            if link not in visited:
+                                queue.put_nowait((link, depth + 1))
+                except Exception as e:
+                    # A parse or write failure must not kill the worker, or
+                    # queue.join() would wait forever on the remaining URLs
+                    logger.warning(f"Error processing {url}: {e}")
+                    result["errors"] += 1
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.per_host_concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+        logger.info(f"Crawled {org_name}: {result}")
+        return result
+
+    async def crawl(self, output_path: Path) -> Dict[str, Any]:
+        import aiohttp
+
+        start = time.perf_counter()
+        writer = CrawlWriter(output_path)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        try:
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector,
+                                             headers={"User-Agent": self.user_agent}) as session:
+                policy = HostPolicy(session, self.per_host_concurrency, self.min_delay, self.user_agent)
+                names = list(self.organizations)
+                results = await asyncio.gather(
+                    *(self.crawl_organization(session, policy, writer, name, self.organizations[name]) for name in names),
+                    return_exceptions=True,
+                )
+        finally:
+            writer.close()
+
+        return crawl_summary(dict(zip(names, results)), dict(self.stats), time.perf_counter() - start)
+
+
+def crawl_summary(results: Dict[str, Any], stats: Dict[str, int], seconds: float) -> Dict[str, Any]:
+    """Same shape as the notebook's parkinsons_crawl_summary.json, plus transfer stats."""
+    summary = {
+        'total_organizations': len(results),
+        'successful_crawls': 0,
+        'failed_crawls': 0,
+        'total_pages_scraped': 0,
+        'total_videos_found': 0,
+        'total_podcasts_found': 0,
+        'organizations_summary': {},
+    }
+    for org_name, data in results.items():
+        if isinstance(data, BaseException):
+            summary['failed_crawls'] += 1
+            summary['organizations_summary'][org_name] = {'status': 'failed', 'error': str(data)}
+            continue
+        summary['successful_crawls'] += 1
+        summary['total_pages_scraped'] += data['pages_crawled']
+        summary['total_videos_found'] += data['videos_found']
+        summary['total_podcasts_found'] += data['podcasts_found']
+        summary['organizations_summary'][org_name] = {'status': 'success', **data}
+
+    summary['crawl_stats'] = {
+        'requests': stats.get('requests', 0),
+        'bytes_downloaded': stats.get('bytes_downloaded', 0),
+        'not_modified': sum(d.get('not_modified', 0) for d in results.values() if isinstance(d, dict)),
+        'robots_disallowed': sum(d.get('robots_disallowed', 0) for d in results.values() if isinstance(d, dict)),
+        'errors': sum(d.get('errors', 0) for d in results.values() if isinstance(d, dict)),
+        'seconds': round(seconds, 2),
+    }
+    return summary
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Crawl the Parkinson's organization sites to JSONL")
+    parser.add_argument("--output", default="parkinsons_crawl.jsonl")
+    parser.add_argument("--summary", default="parkinsons_crawl_summary.json")
+    parser.add_argument("--previous", default=None,
+                        help="Previous JSONL crawl: its ETag/Last-Modified validators make unchanged pages 304s")
+    parser.add_argument("--org", action="append", default=[], metavar="NAME=URL",
+                        help="Crawl these organizations instead of the built-in list (repeatable)")
+    parser.add_argument("--max-pages", type=int, default=100, help="Maximum pages per organization")
+    parser.add_argument("--max-depth", type=int, default=3)
+    parser.add_argument("--per-host-concurrency", type=int, default=2)
+    parser.add_argument("--min-delay", type=float, default=1.0, help="Minimum seconds between requests to a host")
+    parser.add_argument("--max-connections", type=int, default=16)
+    args = parser.parse_args()
+
+    organizations = dict(org.split("=", 1) for org in args.org) if args.org else ORGANIZATIONS
+    if args.previous and Path(args.previous).resolve() == Path(args.output).resolve():
+        parser.error("--previous must differ from --output (the output is rewritten while crawling)")
+
+    crawler = AsyncCrawler(
+        organizations, max_pages_per_org=args.max_pages, max_depth=args.max_depth,
+        per_host_concurrency=args.per_host_concurrency, min_delay=args.min_delay,
+        max_connections=args.max_connections, previous=load_previous_crawl(args.previous),
+    )
+    summary = asyncio.run(crawler.crawl(Path(args.output)))
+    with open(args.summary, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    print("\n=== CRAWLING SUMMARY ===")
+    print(f"Total Organizations: {summary['total_organizations']}")
+    print(f"Successful Crawls: {summary['successful_crawls']}")
+    print(f"Total Pages Scraped: {summary['total_pages_scraped']}")
+    print(f"Total Videos Found: {summary['total_videos_found']}")
+    print(f"Total Podcasts Found: {summary['total_podcasts_found']}")
+    print(f"Requests: {summary['crawl_stats']['requests']}, not modified: {summary['crawl_stats']['not_modified']}, "
+          f"{summary['crawl_stats']['bytes_downloaded'] / (1024 * 1024):.1f} MB in {summary['crawl_stats']['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# app/services/rag/dedupe.py
+# Boilerplate stripping and near-duplicate chunk removal for ingestion.
+#
+# Crawled pages repeat each site's navigation, footer and cookie text
+# ("Close * Understanding Parkinson's * What is Parkinson's? * 10 Early
+# Signs ..."), so many chunks are mostly menu. Two stages clean that up:
+#   1. per organization, lines that appear on a large share of its pages are
+#      boilerplate and are removed before chunking;
+#   2. web page chunks whose word shingles are near-identical to an earlier
+#      chunk (MinHash signatures, LSH banding, Jaccard >= threshold) are dropped.
+#
+#   python -m app.services.rag.dedupe --crawl parkinsons_crawl.jsonl          # shrink report for a crawl
+#   python -m app.services.rag.dedupe --chromadb-path <index dir>             # near-duplicates already stored
+
+import argparse
+import logging
+import re
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# A line is boilerplate when it appears on at least this share of an
+# organization's pages (and on at least BOILERPLATE_MIN_PAGES pages)
+BOILERPLATE_PAGE_FRACTION = 0.3
+BOILERPLATE_MIN_PAGES = 3
+
+NEAR_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 Jaccard almost always share a band
+
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_WORD_RE = re.compile(r"\w+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+# =============================================================================
+# Boilerplate lines
+# =============================================================================
+
+def _normalize_line(line: str) -> str:
+    return _SPACE_RE.sub(" ", line).strip().lower()
+
+
+def find_boilerplate_lines(page_texts: Iterable[str], min_fraction: float = BOILERPLATE_PAGE_FRACTION,
+                           min_pages: int = BOILERPLATE_MIN_PAGES) -> Set[str]:
+    """Normalized lines repeated across a site's pages (navigation, footers, banners)."""
+    page_counts: Dict[str, int] = defaultdict(int)
+    n_pages = 0
+    for text in page_texts:
+        n_pages += 1
+        for line in {_normalize_line(line) for line in (text or "").splitlines()}:
+            if line:
+                page_counts[line] += 1
+    cutoff = max(min_pages, min_fraction * n_pages)
+    return {line for line, count in page_counts.items() if count >= cutoff}
+
+
+def strip_boilerplate(text: str, boilerplate: Set[str]) -> str:
+    if not boilerplate or not text:
+        return text
+    return "\n".join(line for line in text.splitlines() if _normalize_line(line) not in boilerplate)
+
+
+# =============================================================================
+# MinHash / LSH near-duplicates
+# =============================================================================
+
+class MinHasher:
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def shingles(self, text: str) -> np.ndarray:
+        words = _WORD_RE.findall(text.lower())
+        if len(words) < self.shingle_size:
+            words_grams = [" ".join(words)] if words else []
+        else:
+            words_grams = [" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)]
+        # crc32 rather than hash(): stable across processes, so ingestion is reproducible
+        return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in words_grams), dtype=np.uint64))
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        shingles = self.shingles(text)
+        if len(shingles) == 0:
+            return None
+        # (a * x + b) mod p with a, b, x < 2^31: products stay below 2^62, no uint64 overflow
+        x = shingles[None, :] % _MERSENNE_PRIME
+        hashed = (self.a[:, None] * x + self.b[:, None]) % _MERSENNE_PRIME
+        return hashed.min(axis=1)
+
+
+class NearDuplicateIndex:
+    """Greedy LSH index: add() keeps a text unless a kept one is a near-duplicate of it."""
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, bands: int = LSH_BANDS,
+                 hasher: MinHasher = None):
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher()
+        self.bands = bands
+        self.rows = len(self.hasher.a) // bands
+        self.buckets: Dict[tuple, List[int]] = defaultdict(list)
+        self.signatures: List[np.ndarray] = []
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def find_duplicate(self, signature: np.ndarray) -> Optional[int]:
+        candidates = {i for key in self._band_keys(signature) for i in self.buckets.get(key, ())}
+        for i in sorted(candidates):
+            if float(np.mean(self.signatures[i] == signature)) >= self.threshold:
+                return i
+        return None
+
+    def add(self, text: str) -> bool:
+        """True if the text was kept (no near-duplicate seen before)."""
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return True
+        if self.find_duplicate(signature) is not None:
+            return False
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        for key in self._band_keys(signature):
+            self.buckets[key].append(index)
+        return True
+
+
+def remove_near_duplicates(docs: list, threshold: float = NEAR_DUPLICATE_THRESHOLD,
+                           content_types: tuple = ("web_page",)) -> tuple:
+    """
+    Drops near-duplicate chunks of the given content types (media documents
+    are short and differ mainly by URL, so they are kept). Returns (kept, dropped).
+    """
+    index = NearDuplicateIndex(threshold)
+    kept, dropped = [], []
+    for doc in docs:
+        if doc.metadata.get("content_type") not in content_types or index.add(doc.page_content):
+            kept.append(doc)
+        else:
+            dropped.append(doc)
+    return kept, dropped
+
+
+def shrink_report(before: list, after: list, raw_chars: int = 0, stripped_chars: int = 0) -> Dict[str, float]:
+    before_chars = sum(len(doc.page_content) for doc in before)
+    after_chars = sum(len(doc.page_content) for doc in after)
+    report = {
+        "chunks_before": len(before),
+        "chunks_after": len(after),
+        "chunks_removed_pct": round(100 * (1 - len(after) / max(len(before), 1)), 1),
+        "chars_before": before_chars,
+        "chars_after": after_chars,
+        "chars_removed_pct": round(100 * (1 - after_chars / max(before_chars, 1)), 1),
+    }
+    if raw_chars:
+        report["page_chars_before_boilerplate_strip"] = raw_chars
+        report["page_chars_after_boilerplate_strip"] = stripped_chars
+        report["boilerplate_removed_pct"] = round(100 * (1 - stripped_chars / raw_chars), 1)
+    return report
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    from langchain.schema import Document
+    from .export_index import DEFAULT_COLLECTION, read_chroma_collection
+    from .index_versions import resolve_chromadb_path
+
+    parser = argparse.ArgumentParser(description="Report what boilerplate stripping and near-duplicate removal remove")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--crawl", help="Crawler output (.json or .jsonl): full ingestion pipeline, with and without cleanup")
+    source.add_argument("--chromadb-path", help="Existing index: near-duplicates among stored chunks")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD)
+    parser.add_argument("--examples", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.crawl:
+        from .ingest import crawl_documents, load_crawl
+        crawl = load_crawl(Path(args.crawl))
+        baseline = crawl_documents(crawl, strip_boilerplate=False, dedupe_threshold=None)
+        stats = {}
+        cleaned = crawl_documents(crawl, strip_boilerplate=True, dedupe_threshold=args.threshold, stats=stats)
+        report = {**shrink_report(baseline, cleaned, stats.get("raw_chars", 0), stats.get("stripped_chars", 0)),
+                  "near_duplicates_dropped": stats.get("near_duplicates_dropped", 0)}
+        print("📉 Crawl cleanup:")
+    else:
+        data = read_chroma_collection(resolve_chromadb_path(args.chromadb_path), args.collection,
+                                      include=("documents", "metadatas"))
+        docs = [Document(page_content=text or "", metadata=metadata or {}, id=doc_id)
+                for doc_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"])]
+        kept, dropped = remove_near_duplicates(docs, args.threshold)
+        report = {**shrink_report(docs, kept), "near_duplicates_dropped": len(dropped)}
+        print("📉 Near-duplicates in the stored index:")
+        for doc in dropped[:args.examples]:
+            print(f"   - [{doc.metadata.get('organization')}] {doc.page_content[:100]!r}")
+
+    for key, value in report.items():
+        print(f"   {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# app/services/rag/export_index.py
+# Exports the Chroma collection into the memory-mapped NumPy index read by
+# numpy_store.NumpyVectorStore. No embeddings are recomputed.
+#
+#   python -m app.services.rag.export_index --dtype float16
+#   python -m app.services.rag.export_index --quantize pq
+
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from .numpy_store import (
+    MANIFEST_FILE, EMBEDDINGS_FILE, NORMS_FILE, DOCUMENTS_FILE,
+    DOCUMENT_OFFSETS_FILE, METADATA_FILE, METADATA_CODES_FILE,
+)
+from .index_versions import resolve_chromadb_path
+from .quantization import QUANTIZATION_METHODS, build_quantizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHROMADB_PATH = Path(__file__).parent / "ChromaDB_Parkinson_Data"
+DEFAULT_COLLECTION = "parkinsons_complete_kb"
+PAGE_SIZE = 1000
+
+
+def read_chroma_collection(chromadb_path: Path, collection_name: str,
+                           include=("embeddings", "documents", "metadatas")) -> Dict[str, list]:
+    """Reads ids and the `include` fields (default: embeddings, documents, metadatas) from a persisted Chroma collection."""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=str(chromadb_path))
+    collection = client.get_collection(collection_name)
+    total = collection.count()
+
+    data = {"ids": [], **{field: [] for field in include}}
+    for offset in range(0, total, PAGE_SIZE):
+        page = collection.get(
+            include=list(include),
+            limit=PAGE_SIZE,
+            offset=offset,
+        )
+        data["ids"].extend(page["ids"])
+        for field in include:
+            data[field].extend(page[field])
+        logger.info(f"Read {len(data['ids'])}/{total} records from {collection_name}")
+
+    return data
+
+
+def encode_metadata(metadatas: List[dict]):
+    """
+    Dictionary-encodes metadata into columns: one int32 code per (row, column)
+    pointing into that column's list of distinct values, -1 when missing.
+    """
+    columns = sorted({key for metadata in metadatas for key in (metadata or {})})
+    values = {name: [] for name in columns}
+    lookup = {name: {} for name in columns}
+    codes = np.full((len(metadatas), len(columns)), -1, dtype=np.int32)
+
+    for row, metadata in enumerate(metadatas):
+        for col, name in enumerate(columns):
+            if not metadata or name not in metadata:
+                continue
+            value = metadata[name]
+            key = (type(value).__name__, value)
+            code = lookup[name].get(key)
+            if code is None:
+                code = len(values[name])
+                lookup[name][key] = code
+                values[name].append(value)
+            codes[row, col] = code
+
+    return columns, values, codes
+
+
+def write_numpy_index(data: Dict[str, list], output_path: Path, dtype: str = "float32", source: str = "") -> dict:
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    # Norms come from the stored precision so distances stay consistent with the matrix
+    stored = embeddings.astype(dtype)
+    norms = np.einsum("ij,ij->i", stored.astype(np.float32), stored.astype(np.float32))
+
+    encoded_docs = [(doc or "").encode("utf-8") for doc in data["documents"]]
+    offsets = np.zeros(len(encoded_docs) + 1, dtype=np.int64)
+    np.cumsum([len(doc) for doc in encoded_docs], out=offsets[1:])
+
+    columns, values, codes = encode_metadata(data["metadatas"])
+
+    np.save(output_path / EMBEDDINGS_FILE, stored)
+    np.save(output_path / NORMS_FILE, norms.astype(np.float32))
+    np.save(output_path / DOCUMENT_OFFSETS_FILE, offsets)
+    np.save(output_path / METADATA_CODES_FILE, codes)
+    with open(output_path / DOCUMENTS_FILE, "wb") as f:
+        for doc in encoded_docs:
+            f.write(doc)
+    with open(output_path / METADATA_FILE, "w", encoding="utf-8") as f:
+        json.dump({"ids": data["ids"], "columns": columns, "values": values}, f, ensure_ascii=False)
+
+    manifest = {
+        "count": int(embeddings.shape[0]),
+        "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+        "dtype": dtype,
+        "distance": "l2",
+        "columns": columns,
+        "source": source,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(output_path / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export the Chroma collection to a memory-mapped NumPy index")
+    parser.add_argument("--chromadb-path", default=str(resolve_chromadb_path(DEFAULT_CHROMADB_PATH)))
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--output", default=None,
+                        help="Default: numpy_index/ inside the current index version (or the base directory)")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32",
+                        help="Storage precision of the embedding matrix")
+    parser.add_argument("--quantize", choices=QUANTIZATION_METHODS, action="append", default=[],
+                        help="Also build quantized codes (repeatable); enable with NUMPY_INDEX_QUANTIZATION")
+    parser.add_argument("--pq-subspaces", type=int, default=96)
+    args = parser.parse_args()
+
+    chromadb_path = resolve_chromadb_path(args.chromadb_path)
+    args.output = args.output or str(chromadb_path / "numpy_index")
+    data = read_chroma_collection(chromadb_path, args.collection)
+    manifest = write_numpy_index(data, Path(args.output), args.dtype, source=f"{chromadb_path}:{args.collection}")
+    for method in args.quantize:
+        build_quantizer(Path(args.output), method, args.pq_subspaces)
+
+    size = sum(p.stat().st_size for p in Path(args.output).iterdir())
+    print(f"✅ Exported {manifest['count']} documents (dim={manifest['dim']}, {args.dtype}) "
+          f"to {args.output} ({size / (1024 * 1024):.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# app/services/rag/google_http.py
+# One pooled, keep-alive HTTP transport shared by the Gemini embedding and
+# chat clients.
+#
+# The LangChain Google clients each open their own gRPC channel, and every
+# place that builds one (the RAG system, debug_web_page_search, ingestion,
+# the benchmark) pays its own connection setup and TLS handshake. With
+# GOOGLE_HTTP_TRANSPORT=pooled, make_embeddings() and make_chat_model() return
+# thin REST clients for the same API instead. Every call in the process goes
+# through one httpx.Client:
+#   - up to GOOGLE_HTTP_POOL_SIZE keep-alive connections, reused across calls
+#     and clients; HTTP/2 (one multiplexed connection) through the `h2`
+#     package from requirements.txt, HTTP/1.1 keep-alive if it is missing;
+#   - separate connect and read timeouts;
+#   - retries of connection errors, 429 and 5xx with exponentially growing,
+#     fully jittered backoff (Retry-After is honored up to the cap).
+# TCP connects, TLS handshakes and requests are counted, so connection reuse
+# shows up in /health (`google_http`), next to the protocol the requests
+# actually went out on. GOOGLE_API_BASE_URL points the clients
+# at a local stub (python -m app.tools.gemini_stub) for testing.
+#
+# The default, GOOGLE_HTTP_TRANSPORT=grpc, keeps the LangChain clients.
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_HTTP_TRANSPORT = os.getenv("GOOGLE_HTTP_TRANSPORT", "grpc").lower()
+GOOGLE_API_BASE_URL = os.getenv("GOOGLE_API_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+GOOGLE_API_VERSION = os.getenv("GOOGLE_API_VERSION", "v1beta")
+GOOGLE_HTTP_POOL_SIZE = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "10"))
+# Idle keep-alive connections are closed after this many seconds
+GOOGLE_HTTP_KEEPALIVE_SECONDS = float(os.getenv("GOOGLE_HTTP_KEEPALIVE_SECONDS", "120"))
+GOOGLE_HTTP_CONNECT_TIMEOUT = float(os.getenv("GOOGLE_HTTP_CONNECT_TIMEOUT", "5"))
+GOOGLE_HTTP_READ_TIMEOUT = float(os.getenv("GOOGLE_HTTP_READ_TIMEOUT", os.getenv("LLM_TIMEOUT", "20")))
+GOOGLE_HTTP_RETRIES = int(os.getenv("GOOGLE_HTTP_RETRIES", os.getenv("LLM_MAX_RETRIES", "2")))
+GOOGLE_HTTP_BACKOFF_SECONDS = float(os.getenv("GOOGLE_HTTP_BACKOFF_SECONDS", "0.5"))
+GOOGLE_HTTP_BACKOFF_MAX_SECONDS = float(os.getenv("GOOGLE_HTTP_BACKOFF_MAX_SECONDS", "8"))
+# HTTP/2 needs the `h2` package (in requirements.txt); without it the pool speaks HTTP/1.1 keep-alive
+GOOGLE_HTTP2 = os.getenv("GOOGLE_HTTP2", "1") == "1"
+
+if GOOGLE_HTTP_TRANSPORT != "pooled":
+    # Imported with this module, so a preloading gunicorn master shares it with the workers
+    from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+EMBED_BATCH_SIZE = 100  # batchEmbedContents limit
+
+
+class GoogleAPIError(RuntimeError):
+    """Raised for a non-retryable error response, or when the retries are exhausted."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PooledTransport:
+    def __init__(self, base_url: str = GOOGLE_API_BASE_URL, api_key: Optional[str] = None,
+                 pool_size: int = GOOGLE_HTTP_POOL_SIZE, connect_timeout: float = GOOGLE_HTTP_CONNECT_TIMEOUT,
+                 read_timeout: float = GOOGLE_HTTP_READ_TIMEOUT, retries: int = GOOGLE_HTTP_RETRIES,
+                 backoff: float = GOOGLE_HTTP_BACKOFF_SECONDS, backoff_max: float = GOOGLE_HTTP_BACKOFF_MAX_SECONDS,
+                 http2: bool = GOOGLE_HTTP2):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.http2_enabled = http2 and _http2_available()
+        if http2 and not self.http2_enabled:
+            logger.info("h2 not installed; Google HTTP transport uses HTTP/1.1 keep-alive")
+        self.client = httpx.Client(
+            base_url=base_url,
+            http2=self.http2_enabled,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                                keepalive_expiry=GOOGLE_HTTP_KEEPALIVE_SECONDS),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout),
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.http_versions: Dict[str, int] = {}
+
+    def _trace(self, event_name: str, info: Dict[str, Any]):
+        # httpcore trace events; new connections only, reused ones skip them
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections += 1
+        elif event_name == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def _backoff_seconds(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # Full jitter: concurrent clients that failed together retry apart
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    def post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        headers = {"x-goog-api-key": self.api_key or os.getenv("GOOGLE_API_KEY", "")}
+        for attempt in range(self.retries + 1):
+            response = None
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self.client.post(path, json=payload, headers=headers, extensions={"trace": self._trace})
+                with self._lock:
+                    self.http_versions[response.http_version] = self.http_versions.get(response.http_version, 0) + 1
+                if response.status_code < 400:
+                    return response.json()
+                error = GoogleAPIError(f"{path}: HTTP {response.status_code}: {response.text[:200]}",
+                                       response.status_code)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    break
+            except httpx.TransportError as e:
+                error = GoogleAPIError(f"{path}: {type(e).__name__}: {e}")
+            if attempt < self.retries:
+                with self._lock:
+                    self.retried += 1
+                delay = self._backoff_seconds(attempt, response)
+                logger.warning(f"{error}; retry {attempt + 1}/{self.retries} in {delay:.2f}s")
+                time.sleep(delay)
+        with self._lock:
+            self.failures += 1
+        raise error
+
+    def close(self):
+        self.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "base_url": self.base_url,
+                # Enabled only offers HTTP/2; the server picks the protocol (ALPN, TLS only)
+                "http2_enabled": self.http2_enabled,
+                "protocol": max(self.http_versions, key=self.http_versions.get) if self.http_versions else None,
+                "requests": self.requests,
+                "retries": self.retried,
+                "failures": self.failures,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                # Share of requests that went out on an already open connection
+                "connection_reuse": round(1 - self.connections / self.requests, 3) if self.requests else 0.0,
+                "http_versions": dict(self.http_versions),
+            }
+
+
+_transport_instance = None
+_transport_pid = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> PooledTransport:
+    """The process's shared transport; a forked worker builds its own (sockets are not fork-safe)."""
+    global _transport_instance, _transport_pid
+    with _transport_lock:
+        if _transport_instance is None or _transport_pid != os.getpid():
+            _transport_instance = PooledTransport()
+            _transport_pid = os.getpid()
+        return _transport_instance
+
+
+def get_transport_stats() -> Dict[str, Any]:
+    if _transport_instance is None or _transport_pid != os.getpid():
+        return {"transport": GOOGLE_HTTP_TRANSPORT}
+    return {"transport": GOOGLE_HTTP_TRANSPORT, **_transport_instance.stats()}
+
+
+def _model_path(model: str) -> str:
+    return model if model.startswith(("models/", "tunedModels/")) else f"models/{model}"
+
+
+class GoogleRestEmbeddings(Embeddings):
+    """GoogleGenerativeAIEmbeddings over the shared pooled transport."""
+
+    def __init__(self, model: str = "models/embedding-001", transport: Optional[PooledTransport] = None):
+        self.model = _model_path(model)
+        self._transport = transport
+
+    @property
+    def transport(self) -> PooledTransport:
+        return self._transport or get_transport()
+
+    def embed_query(self, text: str) -> List[float]:
+        result = self.transport.post(f"/{GOOGLE_API_VERSION}/{self.model}:embedContent", {
+            "model": self.model,
+            "content": {"parts": [{"text": text}]},
+            "taskType": "RETRIEVAL_QUERY",
+        })
+        return result["embedding"]["values"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            result = self.transport.post(f"/{GOOGLE_API_VERSION}/{self.model}:batchEmbedContents", {
+                "requests": [{
+                    "model": self.model,
+                    "content": {"parts": [{"text": text}]},
+                    "taskType": "RETRIEVAL_DOCUMENT",
+                } for text in texts[start:start + EMBED_BATCH_SIZE]],
+            })
+            vectors.extend(embedding["values"] for embedding in result["embeddings"])
+        return vectors
+
+
+class GoogleRestChatModel:
+    """ChatGoogleGenerativeAI.invoke() over the shared pooled transport."""
+
+    def __init__(self, model: str = "gemini-1.5-flash", temperature: float = 0.3,
+                 transport: Optional[PooledTransport] = None):
+        self.model = _model_path(model)
+        self.temperature = temperature
+        self._transport = transport
+
+    @property
+    def transport(self) -> PooledTransport:
+        return self._transport or get_transport()
+
+    @staticmethod
+    def _payload(messages) -> Dict[str, Any]:
+        if isinstance(messages, str):
+            messages = [HumanMessage(content=messages)]
+        system = [m.content for m in messages if isinstance(m, SystemMessage)]
+        contents = [
+            {"role": "model" if isinstance(m, AIMessage) else "user", "parts": [{"text": m.content}]}
+            for m in messages if isinstance(m, BaseMessage) and not isinstance(m, SystemMessage)
+        ]
+        payload = {"contents": contents}
+        if system:
+            payload["systemInstruction"] = {"parts": [{"text": "\n\n".join(system)}]}
+        return payload
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        payload = self._payload(messages)
+        payload["generationConfig"] = {"temperature": self.temperature}
+        result = self.transport.post(f"/{GOOGLE_API_VERSION}/{self.model}:generateContent", payload)
+        candidates = result.get("candidates") or []
+        if not candidates:
+            raise GoogleAPIError(f"no candidates returned: {result.get('promptFeedback', {})}")
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return AIMessage(content="".join(part.get("text", "") for part in parts),
+                         response_metadata={"finish_reason": candidates[0].get("finishReason")})
+
+
+def make_embeddings(model: str = "models/embedding-001") -> Embeddings:
+    if GOOGLE_HTTP_TRANSPORT == "pooled":
+        return GoogleRestEmbeddings(model)
+    return GoogleGenerativeAIEmbeddings(model=model)
+
+
+def make_chat_model(model: str = "gemini-1.5-flash", temperature: float = 0.3,
+                    max_retries: int = GOOGLE_HTTP_RETRIES, timeout: float = GOOGLE_HTTP_READ_TIMEOUT):
+    if GOOGLE_HTTP_TRANSPORT == "pooled":
+        # Retries and timeouts are the transport's (GOOGLE_HTTP_RETRIES, GOOGLE_HTTP_READ_TIMEOUT)
+        return GoogleRestChatModel(model, temperature)
+    return ChatGoogleGenerativeAI(model=model, temperature=temperature, max_retries=max_retries, timeout=timeout)
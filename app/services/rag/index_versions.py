@@ -0,0 +1,109 @@
+# app/services/rag/index_versions.py
+# Versioned knowledge base directories.
+#
+# ingest.py writes each refresh into its own directory under
+# ChromaDB_Parkinson_Data/versions/ and then points CURRENT at it. The app
+# resolves the base path through CURRENT, so a refresh (or a rollback: point
+# CURRENT back at an older version) takes effect on the next start. Without a
+# CURRENT file the base directory itself is the index, as before.
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import List, Optional
+
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+VERSION_MANIFEST_FILE = "ingest_manifest.json"
+# Present while a version is being built; removed when it is published
+INCOMPLETE_MARKER = ".incomplete"
+
+
+def resolve_chromadb_path(base_path) -> Path:
+    """The directory holding the current index: the published version if any, else `base_path`."""
+    base_path = Path(base_path)
+    try:
+        name = (base_path / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return base_path
+    version_path = base_path / VERSIONS_DIR / name
+    return version_path if version_path.is_dir() else base_path
+
+
+def current_version(base_path) -> Optional[str]:
+    try:
+        return (Path(base_path) / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(base_path) -> List[str]:
+    versions_path = Path(base_path) / VERSIONS_DIR
+    if not versions_path.is_dir():
+        return []
+    return sorted(p.name for p in versions_path.iterdir() if p.is_dir())
+
+
+def find_incomplete_version(base_path) -> Optional[Path]:
+    """The newest unpublished version left behind by an interrupted ingestion, if any."""
+    for name in reversed(list_versions(base_path)):
+        path = Path(base_path) / VERSIONS_DIR / name
+        if (path / INCOMPLETE_MARKER).exists():
+            return path
+    return None
+
+
+def create_version(base_path) -> Path:
+    """
+    Creates the next version directory as a copy of the current index, marked
+    incomplete. Chroma files are copied as-is, so unchanged chunks keep their
+    embeddings without any API call.
+    """
+    base_path = Path(base_path)
+    source = resolve_chromadb_path(base_path)
+    existing = list_versions(base_path)
+    number = int(existing[-1].split("-")[0][1:]) + 1 if existing else 1
+    name = f"v{number:04d}-{time.strftime('%Y%m%d%H%M%S')}"
+    version_path = base_path / VERSIONS_DIR / name
+
+    if source == base_path:
+        # Legacy layout: the index lives directly in the base directory
+        ignore = shutil.ignore_patterns(VERSIONS_DIR, CURRENT_FILE, "numpy_index*", "*.json")
+    else:
+        ignore = shutil.ignore_patterns(VERSION_MANIFEST_FILE, "numpy_index*")
+    if (source / "chroma.sqlite3").exists():
+        shutil.copytree(source, version_path, ignore=ignore)
+    else:
+        version_path.mkdir(parents=True)
+    (version_path / INCOMPLETE_MARKER).touch()
+    return version_path
+
+
+def publish_version(base_path, version_path: Path, manifest: dict) -> None:
+    """Writes the version manifest and atomically points CURRENT at the version."""
+    base_path = Path(base_path)
+    with open(version_path / VERSION_MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    (version_path / INCOMPLETE_MARKER).unlink(missing_ok=True)
+
+    temp_path = base_path / f".{CURRENT_FILE}.{os.getpid()}.tmp"
+    temp_path.write_text(version_path.name, encoding="utf-8")
+    os.replace(temp_path, base_path / CURRENT_FILE)
+
+
+def prune_versions(base_path, keep: int) -> List[str]:
+    """Deletes all but the newest `keep` published versions (never the current one)."""
+    current = current_version(base_path)
+    published = [
+        name for name in list_versions(base_path)
+        if not (Path(base_path) / VERSIONS_DIR / name / INCOMPLETE_MARKER).exists()
+    ]
+    removed = []
+    for name in published[:-keep] if keep > 0 else []:
+        if name == current:
+            continue
+        shutil.rmtree(Path(base_path) / VERSIONS_DIR / name)
+        removed.append(name)
+    return removed
@@ -0,0 +1,507 @@
+# app/services/rag/ingest.py
+# Incremental knowledge base ingestion from the crawler output.
+#
+# Replaces the one-shot build in fyi_rag_notebooks/ChromaBD.ipynb (same
+# cleaning, 1500-char chunks and media documents). Every chunk carries a
+# content_hash of its text; a refresh only embeds chunks whose text was never
+# embedded before, deletes chunks that disappeared from the crawl and
+# updates metadata in place for the rest. Embedding calls run in concurrent,
+# rate-limited batches and each finished batch is written straight into the
+# new version's collection, so re-running after a crash resumes where it
+# stopped. Each run produces a new directory under versions/ (see
+# index_versions.py) that is published only when complete. Before chunking,
+# per-site boilerplate lines are stripped and near-duplicate chunks dropped
+# (dedupe.py); the shrink is recorded in the version manifest.
+#
+#   python -m app.services.rag.ingest --crawl parkinsons_full_crawl.json
+#   python -m app.services.rag.ingest --crawl parkinsons_full_crawl.json --dry-run
+#   python -m app.services.rag.ingest --crawl parkinsons_crawl.jsonl
+#   python -m app.services.rag.ingest --crawl parkinsons_crawl.jsonl --no-dedupe --no-strip-boilerplate
+
+import argparse
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain.schema import Document
+
+from .dedupe import (
+    NEAR_DUPLICATE_THRESHOLD, find_boilerplate_lines, remove_near_duplicates, shrink_report,
+    strip_boilerplate as strip_boilerplate_text,
+)
+from .export_index import DEFAULT_CHROMADB_PATH, DEFAULT_COLLECTION, read_chroma_collection
+from .index_versions import (
+    create_version, current_version, find_incomplete_version, prune_versions, publish_version,
+    resolve_chromadb_path,
+)
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 200
+MIN_TEXT_LENGTH = 50
+MIN_CHUNK_LENGTH = 100
+# Chroma add/update/delete calls are split into batches of this size
+WRITE_BATCH_SIZE = 1000
+MAX_RETRIES = 5
+
+# =============================================================================
+# Text cleaning and chunking (as in ChromaBD.ipynb)
+# =============================================================================
+
+NAV_PATTERNS = [
+    r'Skip to main content',
+    r'Skip to navigation',
+    r'Back to top',
+    r'Contact Us',
+    r'Privacy Policy',
+    r'Terms of Service',
+    r'Copyright ©.*',
+    r'All rights reserved.*'
+]
+
+
+def clean_text(text: str) -> str:
+    if not text or not isinstance(text, str):
+        return ""
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    text = re.sub(r"(?<!\n)\n(?!\n)", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = re.sub(r'\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    text = re.sub(r'\*{3,}', '***', text)
+    text = re.sub(r'_{3,}', '___', text)
+    text = re.sub(r' {3,}', ' ', text)
+    for pattern in NAV_PATTERNS:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    return text.strip()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source_url: str, index: int, text_hash: str) -> str:
+    """Stable id: the same text at the same position of the same page keeps its id across crawls."""
+    return hashlib.sha256(f"{source_url}\n{index}\n{text_hash}".encode("utf-8")).hexdigest()[:32]
+
+
+def page_documents(org_name: str, org_data: Dict, url: str, page_data: Dict, splitter,
+                   boilerplate: frozenset = frozenset()) -> List[Document]:
+    text = clean_text(strip_boilerplate_text(page_data.get('text', ''), boilerplate))
+    if len(text) < MIN_TEXT_LENGTH:
+        return []
+
+    page_metadata = page_data.get('metadata', {})
+    metadata = {
+        'organization': org_name,
+        'source_url': url,
+        'title': page_metadata.get('title', ''),
+        'description': page_metadata.get('description', ''),
+        'keywords': page_metadata.get('keywords', ''),
+        'crawl_depth': page_data.get('depth', 0),
+        'crawled_at': page_data.get('crawled_at', ''),
+        'base_url': org_data.get('base_url', ''),
+        'content_type': 'web_page'
+    }
+
+    chunks = splitter.split_text(text)
+    docs = []
+    for i, chunk in enumerate(chunks):
+        if len(chunk.strip()) < MIN_CHUNK_LENGTH:
+            continue
+        text_hash = content_hash(chunk)
+        docs.append(Document(
+            page_content=chunk,
+            metadata={**metadata, 'chunk_id': i, 'chunk_length': len(chunk),
+                      'total_chunks': len(chunks), 'content_hash': text_hash},
+            id=chunk_id(url, i, text_hash),
+        ))
+    return docs
+
+
+def media_documents(org_name: str, org_data: Dict) -> List[Document]:
+    docs = []
+    media_content = org_data.get('media_content', {})
+    for content_type, label, media_type, items in (
+            ('video', 'Video', 'video', media_content.get('videos', [])),
+            ('podcast', 'Podcast', 'audio', media_content.get('podcasts', []))):
+        for item in items:
+            parts = []
+            if item.get('title'):
+                parts.append(f"{label} Title: {item['title']}")
+            if item.get('description'):
+                parts.append(f"Description: {item['description']}")
+            parts.append(f"{label} URL: {item.get('url', 'N/A')}")
+            parts.append(f"Source Page: {item.get('source_page', 'N/A')}")
+            content = "\n".join(parts)
+            if len(content.strip()) <= MIN_TEXT_LENGTH:
+                continue
+
+            text_hash = content_hash(content)
+            docs.append(Document(
+                page_content=content,
+                metadata={
+                    'organization': org_name,
+                    'content_type': content_type,
+                    'media_type': media_type,
+                    'title': item.get('title', f'Untitled {label}'),
+                    'description': item.get('description', ''),
+                    'media_url': item.get('url', ''),
+                    'source_page': item.get('source_page', ''),
+                    'base_url': org_data.get('base_url', ''),
+                    'source_url': item.get('url', ''),
+                    'content_hash': text_hash,
+                },
+                id=chunk_id(item.get('url', ''), 0, text_hash),
+            ))
+    return docs
+
+
+def crawl_documents(crawl: Dict[str, Any], strip_boilerplate: bool = True,
+                    dedupe_threshold: Optional[float] = NEAR_DUPLICATE_THRESHOLD,
+                    stats: Optional[Dict[str, int]] = None) -> List[Document]:
+    """
+    All chunks of a crawl output ({org: {base_url, pages_content, media_content}}), deduplicated by id.
+    Lines repeated across an organization's pages are stripped first, and web page
+    chunks that are near-duplicates of an earlier one are dropped unless
+    dedupe_threshold is None. stats, if given, receives character and drop counts.
+    """
+    from langchain.text_splitter import MarkdownTextSplitter
+    splitter = MarkdownTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    stats = stats if stats is not None else {}
+    stats.update(raw_chars=0, stripped_chars=0, boilerplate_lines=0, near_duplicates_dropped=0)
+
+    docs = {}
+    for org_name, org_data in crawl.items():
+        pages = org_data.get('pages_content', {})
+        boilerplate = frozenset()
+        if strip_boilerplate:
+            boilerplate = frozenset(find_boilerplate_lines(page.get('text', '') for page in pages.values()))
+            stats["boilerplate_lines"] += len(boilerplate)
+        for url, page_data in pages.items():
+            raw = page_data.get('text', '') or ''
+            stats["raw_chars"] += len(raw)
+            stats["stripped_chars"] += len(strip_boilerplate_text(raw, boilerplate))
+            for doc in page_documents(org_name, org_data, url, page_data, splitter, boilerplate):
+                docs[doc.id] = doc
+        for doc in media_documents(org_name, org_data):
+            docs[doc.id] = doc
+
+    docs = list(docs.values())
+    if dedupe_threshold is not None:
+        docs, dropped = remove_near_duplicates(docs, dedupe_threshold)
+        stats["near_duplicates_dropped"] = len(dropped)
+    return docs
+
+
+def load_crawl(path: Path) -> Dict[str, Any]:
+    """
+    Reads crawler output: the notebook's JSON ({org: {...}}) or crawler.py's
+    JSONL page/media records, which are regrouped into the same shape.
+    """
+    path = Path(path)
+    if path.suffix != ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    crawl: Dict[str, Any] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            org = crawl.setdefault(record["organization"], {
+                "base_url": record.get("base_url", ""),
+                "pages_content": {},
+                "media_content": {"videos": [], "podcasts": []},
+            })
+            if record["type"] == "page":
+                org["pages_content"][record["url"]] = {
+                    "text": record["text"], "metadata": record["metadata"],
+                    "depth": record["depth"], "crawled_at": record["crawled_at"],
+                }
+            elif record["type"] == "media":
+                key = "videos" if record["media_type"] == "video" else "podcasts"
+                org["media_content"][key].append({
+                    "type": record["media_type"], "url": record["url"], "title": record["title"],
+                    "description": record["description"], "source_page": record["source_page"],
+                })
+    return crawl
+
+
+# =============================================================================
+# Planning
+# =============================================================================
+
+def plan_ingestion(docs: List[Document], existing: Dict[str, list]) -> Dict[str, Any]:
+    """
+    Diffs the crawl chunks against the existing collection:
+      - unchanged: same id (hence same text) already stored
+      - update:    same id, metadata changed (e.g. crawled_at)
+      - reuse:     new id whose text was embedded before; the stored embedding is copied
+      - embed:     text never embedded
+      - delete:    stored ids not in the crawl anymore
+    Collections built before content hashes existed are hashed from their stored text.
+    """
+    stored = {doc_id: i for i, doc_id in enumerate(existing["ids"])}
+    embedding_by_hash = {}
+    for i, (text, metadata) in enumerate(zip(existing["documents"], existing["metadatas"])):
+        text_hash = (metadata or {}).get('content_hash') or content_hash(text or "")
+        embedding_by_hash.setdefault(text_hash, i)
+
+    plan = {"unchanged": [], "update": [], "reuse": [], "embed": [], "delete": []}
+    wanted = set()
+    embedding_planned = set()
+    for doc in docs:
+        wanted.add(doc.id)
+        row = stored.get(doc.id)
+        if row is not None:
+            if existing["metadatas"][row] == doc.metadata:
+                plan["unchanged"].append(doc)
+            else:
+                plan["update"].append(doc)
+            continue
+        text_hash = doc.metadata['content_hash']
+        if text_hash in embedding_by_hash:
+            plan["reuse"].append((doc, existing["embeddings"][embedding_by_hash[text_hash]]))
+        elif text_hash in embedding_planned:
+            # Same text in several chunks: embedded once, then reused
+            plan["reuse"].append((doc, None))
+        else:
+            embedding_planned.add(text_hash)
+            plan["embed"].append(doc)
+
+    plan["delete"] = [doc_id for doc_id in existing["ids"] if doc_id not in wanted]
+    return plan
+
+
+def plan_summary(plan: Dict[str, Any]) -> Dict[str, int]:
+    return {key: len(value) for key, value in plan.items()}
+
+
+# =============================================================================
+# Rate-limited concurrent embedding
+# =============================================================================
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls to at most `per_minute` per minute."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def embed_batch(embedding_function, texts: List[str], limiter: RateLimiter) -> List[List[float]]:
+    delay = 5.0
+    for attempt in range(MAX_RETRIES):
+        limiter.acquire()
+        try:
+            return embedding_function.embed_documents(texts)
+        except Exception as e:
+            if attempt == MAX_RETRIES - 1:
+                raise
+            rate_limited = "429" in str(e) or "RATE_LIMIT" in str(e).upper() or "RESOURCE_EXHAUSTED" in str(e)
+            logger.warning(f"Embedding batch failed ({'rate limited' if rate_limited else e}), "
+                           f"retrying in {delay:.0f}s")
+            time.sleep(delay)
+            delay *= 2
+
+
+def _write_batches(write, docs_with_embeddings):
+    for start in range(0, len(docs_with_embeddings), WRITE_BATCH_SIZE):
+        batch = docs_with_embeddings[start:start + WRITE_BATCH_SIZE]
+        write(
+            ids=[doc.id for doc, _ in batch],
+            embeddings=[list(embedding) for _, embedding in batch],
+            documents=[doc.page_content for doc, _ in batch],
+            metadatas=[doc.metadata for doc, _ in batch],
+        )
+
+
+def apply_plan(collection, plan: Dict[str, Any], embedding_function, batch_size: int,
+               concurrency: int, requests_per_minute: float) -> Dict[str, Any]:
+    """Applies a plan to `collection`. Embedded batches are written as they finish."""
+    # Reused embeddings are copied before anything is deleted, so an
+    # interrupted run never loses an embedding it could have reused
+    _write_batches(collection.add, [(doc, emb) for doc, emb in plan["reuse"] if emb is not None])
+    for start in range(0, len(plan["update"]), WRITE_BATCH_SIZE):
+        batch = plan["update"][start:start + WRITE_BATCH_SIZE]
+        collection.update(ids=[doc.id for doc in batch], metadatas=[doc.metadata for doc in batch])
+    for start in range(0, len(plan["delete"]), WRITE_BATCH_SIZE):
+        collection.delete(ids=plan["delete"][start:start + WRITE_BATCH_SIZE])
+
+    embedded_by_hash = {}
+    batches = [plan["embed"][i:i + batch_size] for i in range(0, len(plan["embed"]), batch_size)]
+    limiter = RateLimiter(requests_per_minute)
+    failed = 0
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="embed") as executor:
+        futures = {
+            executor.submit(embed_batch, embedding_function, [doc.page_content for doc in batch], limiter): batch
+            for batch in batches
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            batch = futures[future]
+            try:
+                embeddings = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"Embedding batch of {len(batch)} failed permanently: {e}")
+                continue
+            # Written immediately: the collection is the checkpoint a re-run resumes from
+            _write_batches(collection.add, list(zip(batch, embeddings)))
+            for doc, embedding in zip(batch, embeddings):
+                embedded_by_hash[doc.metadata['content_hash']] = embedding
+            logger.info(f"Embedded batch {done}/{len(batches)} ({len(batch)} chunks)")
+
+    duplicates = [(doc, embedded_by_hash[doc.metadata['content_hash']])
+                  for doc, emb in plan["reuse"] if emb is None and doc.metadata['content_hash'] in embedded_by_hash]
+    _write_batches(collection.add, duplicates)
+
+    return {
+        "embedding_requests": len(batches),
+        "failed_batches": failed,
+        "embedding_seconds": round(time.perf_counter() - start_time, 2),
+    }
+
+
+# =============================================================================
+# Entry point
+# =============================================================================
+
+def run_ingestion(crawl_path: Path, base_path: Path = DEFAULT_CHROMADB_PATH,
+                  collection_name: str = DEFAULT_COLLECTION, embedding_function=None,
+                  batch_size: int = 100, concurrency: int = 4, requests_per_minute: float = 60,
+                  dry_run: bool = False, export_numpy: bool = False, keep_versions: int = 3,
+                  strip_boilerplate: bool = True,
+                  dedupe_threshold: Optional[float] = NEAR_DUPLICATE_THRESHOLD) -> Dict[str, Any]:
+    import chromadb
+
+    start = time.perf_counter()
+    with open(crawl_path, "rb") as f:
+        crawl_sha256 = hashlib.sha256(f.read()).hexdigest()
+    crawl = load_crawl(crawl_path)
+    cleanup_stats = {}
+    docs = crawl_documents(crawl, strip_boilerplate, dedupe_threshold, cleanup_stats)
+    # Chunking is cheap next to embedding, so measure the shrink against an uncleaned pass
+    cleanup = {
+        **shrink_report(crawl_documents(crawl, False, None), docs,
+                        cleanup_stats["raw_chars"], cleanup_stats["stripped_chars"]),
+        "boilerplate_lines": cleanup_stats["boilerplate_lines"],
+        "near_duplicates_dropped": cleanup_stats["near_duplicates_dropped"],
+    }
+    logger.info(f"Crawl {crawl_path}: {len(docs)} chunks, cleanup {cleanup}")
+
+    resumed = find_incomplete_version(base_path)
+    if resumed:
+        target = resumed
+    elif dry_run:
+        target = resolve_chromadb_path(base_path)
+    else:
+        target = create_version(base_path)
+    logger.info(f"{'Resuming' if resumed else 'Diffing against'} {target}")
+    existing = _read_existing(target, collection_name)
+
+    plan = plan_ingestion(docs, existing)
+    summary = plan_summary(plan)
+    logger.info(f"Plan: {summary}")
+    if dry_run:
+        return {"plan": summary, "cleanup": cleanup, "dry_run": True}
+
+    if embedding_function is None:
+        from .google_http import make_embeddings
+        embedding_function = make_embeddings("models/embedding-001")
+
+    collection = chromadb.PersistentClient(path=str(target)).get_or_create_collection(collection_name)
+    stats = apply_plan(collection, plan, embedding_function, batch_size, concurrency, requests_per_minute)
+    if stats["failed_batches"]:
+        raise RuntimeError(f"{stats['failed_batches']} embedding batches failed; re-run to resume {target.name}")
+
+    manifest = {
+        "version": target.name,
+        "previous_version": current_version(base_path),
+        "crawl_file": str(crawl_path),
+        "crawl_sha256": crawl_sha256,
+        "collection": collection_name,
+        "documents": collection.count(),
+        "plan": summary,
+        "cleanup": cleanup,
+        "resumed": resumed is not None,
+        **stats,
+        "seconds": round(time.perf_counter() - start, 2),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+    if export_numpy:
+        from .export_index import write_numpy_index
+        write_numpy_index(read_chroma_collection(target, collection_name), target / "numpy_index",
+                          source=f"{target}:{collection_name}")
+
+    publish_version(base_path, target, manifest)
+    manifest["pruned_versions"] = prune_versions(base_path, keep_versions)
+    return manifest
+
+
+def _read_existing(path: Path, collection_name: str) -> Dict[str, list]:
+    if (path / "chroma.sqlite3").exists():
+        try:
+            return read_chroma_collection(path, collection_name)
+        except Exception as e:
+            logger.info(f"No existing collection {collection_name} in {path} ({e})")
+    return {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Incrementally ingest crawler output into a new index version")
+    parser.add_argument("--crawl", required=True,
+                        help="Crawler output: parkinsons_full_crawl.json or crawler.py's .jsonl")
+    parser.add_argument("--chromadb-path", default=str(DEFAULT_CHROMADB_PATH), help="Base index directory")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--batch-size", type=int, default=100, help="Chunks per embedding request")
+    parser.add_argument("--concurrency", type=int, default=4, help="Embedding requests in flight")
+    parser.add_argument("--requests-per-minute", type=float, default=60)
+    parser.add_argument("--keep-versions", type=int, default=3)
+    parser.add_argument("--export-numpy", action="store_true", help="Also write the NumPy index into the version")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would change")
+    parser.add_argument("--no-strip-boilerplate", action="store_true",
+                        help="Keep lines repeated across a site's pages (navigation, footers)")
+    parser.add_argument("--no-dedupe", action="store_true", help="Keep near-duplicate chunks")
+    parser.add_argument("--dedupe-threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD,
+                        help="Estimated Jaccard similarity above which a chunk is a near-duplicate")
+    args = parser.parse_args()
+
+    result = run_ingestion(
+        Path(args.crawl), Path(args.chromadb_path), args.collection,
+        batch_size=args.batch_size, concurrency=args.concurrency,
+        requests_per_minute=args.requests_per_minute, dry_run=args.dry_run,
+        export_numpy=args.export_numpy, keep_versions=args.keep_versions,
+        strip_boilerplate=not args.no_strip_boilerplate,
+        dedupe_threshold=None if args.no_dedupe else args.dedupe_threshold,
+    )
+    cleanup = result["cleanup"]
+    print(f"🧹 Cleanup: {cleanup['chunks_before']} → {cleanup['chunks_after']} chunks "
+          f"(-{cleanup['chunks_removed_pct']}%), {cleanup['chars_before']} → {cleanup['chars_after']} chars "
+          f"(-{cleanup['chars_removed_pct']}%), {cleanup['near_duplicates_dropped']} near-duplicates dropped")
+    if result.get("dry_run"):
+        print(f"📋 Dry run: {result['plan']}")
+    else:
+        print(f"✅ Published {result['version']}: {result['documents']} chunks, plan {result['plan']}, "
+              f"{result['embedding_requests']} embedding requests in {result['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# app/services/rag/lexical_index.py
+# In-memory BM25 index over the knowledge base texts and titles.
+#
+# Most retriever queries are plain keywords ("exercise", "pain medication"),
+# which a lexical index answers without an embedding round trip. Postings are
+# flat NumPy arrays with the BM25 term weight precomputed per (term, doc), so a
+# query is a few array additions over the matching postings.
+#
+#   python -m app.services.rag.lexical_index --source numpy
+
+import argparse
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from .partitions import PARTITION_KEY, unique_documents
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Title tokens are counted this many times, so title matches rank higher
+TITLE_WEIGHT = 3
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i if in into is it its of on or our "
+    "that the their them they this to was we what when where which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 over document texts plus titles, with content_type partition filtering."""
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[dict]):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = [m or {} for m in metadatas]
+
+        vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, term_counts = [], [], []
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc, (text, metadata) in enumerate(zip(texts, self.metadatas)):
+            counts: Dict[int, int] = {}
+            tokens = tokenize(text) + tokenize(metadata.get("title", "")) * TITLE_WEIGHT
+            for token in tokens:
+                term = vocabulary.setdefault(token, len(vocabulary))
+                counts[term] = counts.get(term, 0) + 1
+            lengths[doc] = len(tokens)
+            term_ids.extend(counts.keys())
+            doc_ids.extend([doc] * len(counts))
+            term_counts.extend(counts.values())
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self.vocabulary = vocabulary
+        self.posting_docs = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.posting_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=self.posting_offsets[1:])
+
+        # Length-normalized BM25 term-frequency component, so scoring only adds weights
+        tf = np.asarray(term_counts, dtype=np.float32)[order]
+        avg_length = float(lengths.mean()) if len(lengths) else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[self.posting_docs] / max(avg_length, 1.0))
+        self.posting_weights = (tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+
+        n_docs = len(texts)
+        df = np.diff(self.posting_offsets).astype(np.float32)
+        self.idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        partition_values = [m.get(PARTITION_KEY, "unknown") for m in self.metadatas]
+        self.partitions = {
+            content_type: np.array([v == content_type for v in partition_values], dtype=bool)
+            for content_type in set(partition_values)
+        }
+        self._partition_masks: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _partition_mask(self, content_types: List[str]) -> np.ndarray:
+        key = tuple(sorted(content_types))
+        mask = self._partition_masks.get(key)
+        if mask is None:
+            mask = np.zeros(len(self), dtype=bool)
+            for content_type in key:
+                if content_type in self.partitions:
+                    mask |= self.partitions[content_type]
+            self._partition_masks[key] = mask
+        return mask
+
+    def score(self, query: str, content_types: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Matching doc ids and their BM25 scores (unsorted)."""
+        terms = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+        if not terms:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in terms:
+            start, end = self.posting_offsets[term], self.posting_offsets[term + 1]
+            # Doc ids are unique within a posting list, so plain fancy-index addition is safe
+            scores[self.posting_docs[start:end]] += self.idf[term] * self.posting_weights[start:end]
+
+        if content_types is not None:
+            scores[~self._partition_mask(content_types)] = 0
+        docs = np.flatnonzero(scores)
+        return docs, scores[docs]
+
+    def search_with_score(self, query: str, k: int, content_types: Optional[List[str]] = None,
+                          unique_by: Optional[str] = None) -> List[Tuple[Document, float]]:
+        docs, scores = self.score(query, content_types)
+        # Rank only the best few times k matches; widen if deduplication leaves fewer than k
+        window = k * 4
+        while True:
+            if window < len(scores):
+                top = np.argpartition(-scores, window - 1)[:window]
+                top = top[np.argsort(-scores[top], kind="stable")]
+            else:
+                top = np.argsort(-scores, kind="stable")
+
+            results = []
+            seen = set()
+            for i in top.tolist():
+                doc = int(docs[i])
+                metadata = self.metadatas[doc]
+                if unique_by is not None:
+                    value = metadata.get(unique_by)
+                    if value is not None and value in seen:
+                        continue
+                    seen.add(value)
+                results.append((doc, float(scores[i])))
+                if len(results) >= k:
+                    break
+            if len(results) >= k or window >= len(scores):
+                break
+            window *= 4
+
+        return [(Document(page_content=self.texts[doc], metadata=dict(self.metadatas[doc]), id=self.ids[doc]), score)
+                for doc, score in results]
+
+    def search(self, query: str, k: int, content_types: Optional[List[str]] = None,
+               unique_by: Optional[str] = None) -> List[Document]:
+        return [doc for doc, _ in self.search_with_score(query, k, content_types, unique_by)]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int, unique_by: Optional[str] = None,
+                           rrf_k: int = 60) -> List[Document]:
+    """
+    Fuses ranked result lists (e.g. lexical and vector) by reciprocal rank:
+    score = sum(1 / (rrf_k + rank)). Rank-based, so BM25 and L2 scores need
+    no calibration against each other.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(key, doc)
+    fused = [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
+    return unique_documents(fused, unique_by)[:k]
+
+
+def build_from_numpy_index(index) -> LexicalIndex:
+    return LexicalIndex(
+        list(index.ids),
+        [index.document(row) for row in range(len(index))],
+        [index.metadata(row) for row in range(len(index))],
+    )
+
+
+def build_from_chroma(chromadb_path: Path, collection_name: str) -> LexicalIndex:
+    from .export_index import read_chroma_collection
+    data = read_chroma_collection(chromadb_path, collection_name, include=("documents", "metadatas"))
+    return LexicalIndex(data["ids"], [doc or "" for doc in data["documents"]], data["metadatas"])
+
+
+_loaded_indexes: Dict[str, LexicalIndex] = {}
+
+def load_lexical_index(chromadb_path, collection_name: str = "parkinsons_complete_kb",
+                       numpy_index=None) -> LexicalIndex:
+    """
+    Builds (once per process) the BM25 index, from the NumPy index when one is
+    loaded (no database reads), otherwise from the Chroma collection.
+    """
+    key = str(numpy_index.path.resolve()) if numpy_index is not None else f"{Path(chromadb_path).resolve()}:{collection_name}"
+    if key not in _loaded_indexes:
+        start = time.perf_counter()
+        if numpy_index is not None:
+            index = build_from_numpy_index(numpy_index)
+        else:
+            index = build_from_chroma(Path(chromadb_path), collection_name)
+        _loaded_indexes[key] = index
+        logger.info(f"Built BM25 index over {len(index)} docs ({len(index.vocabulary)} terms) "
+                    f"in {time.perf_counter() - start:.2f}s")
+    return _loaded_indexes[key]
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    from .export_index import DEFAULT_CHROMADB_PATH, DEFAULT_COLLECTION
+    from .index_versions import resolve_chromadb_path
+    from .numpy_store import current_numpy_index_path, load_numpy_index
+    from .rag_service import MEDIA_TYPES, WEB_PAGE_TYPES, SimplifiedPainFocusedRAGRetriever
+
+    parser = argparse.ArgumentParser(description="Build the BM25 index and time the retriever's queries")
+    parser.add_argument("--source", choices=["numpy", "chroma"], default="numpy")
+    parser.add_argument("--chromadb-path", default=str(resolve_chromadb_path(DEFAULT_CHROMADB_PATH)))
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--numpy-index", default=str(current_numpy_index_path()))
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    numpy_index = load_numpy_index(args.numpy_index) if args.source == "numpy" else None
+    index = load_lexical_index(args.chromadb_path, args.collection, numpy_index)
+
+    queries = sorted({q for qs in SimplifiedPainFocusedRAGRetriever(None).severity_queries.values() for q in qs})
+    print(f"{'query':<28} {'web µs':>8} {'media µs':>9}  top web page")
+    for query in queries:
+        timings = []
+        for content_types, text, unique_by in ((WEB_PAGE_TYPES, query, "source_url"),
+                                               (MEDIA_TYPES, f"{query} video podcast", "media_url")):
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                docs = index.search(text, args.k, content_types, unique_by)
+            timings.append((time.perf_counter() - start) / args.runs * 1e6)
+            if content_types is WEB_PAGE_TYPES:
+                top = docs[0].metadata.get("title", "")[:40] if docs else "-"
+        print(f"{query:<28} {timings[0]:>8.0f} {timings[1]:>9.0f}  {top}")
+
+
+if __name__ == "__main__":
+    main()
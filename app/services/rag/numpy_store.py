@@ -0,0 +1,364 @@
+# app/services/rag/numpy_store.py
+# In-process exact vector search over a memory-mapped NumPy export of the
+# Chroma collection (see export_index.py). The knowledge base is small enough
+# (~7.3k chunks) that one matrix-vector product is faster than going through the
+# Chroma client, SQLite metadata reads and HNSW.
+#
+# With NUMPY_INDEX_QUANTIZATION=int8|pq the scan runs over compressed codes
+# (see quantization.py) and only the top candidates are re-ranked against the
+# full-precision matrix.
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.vectorstores import VectorStore
+
+from .index_versions import resolve_chromadb_path
+from .quantization import QUANTIZATION_METHODS, load_quantizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NUMPY_INDEX_PATH = Path(__file__).parent / "ChromaDB_Parkinson_Data" / "numpy_index"
+
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+NORMS_FILE = "norms.npy"
+DOCUMENTS_FILE = "documents.bin"
+DOCUMENT_OFFSETS_FILE = "document_offsets.npy"
+METADATA_FILE = "metadata.json"
+METADATA_CODES_FILE = "metadata_codes.npy"
+
+# Rows scored per block when the matrix is float16, to bound the float32 temporary
+SCORE_BLOCK_ROWS = 4096
+
+# Approximate scan over quantized codes: "", "int8" or "pq"
+NUMPY_INDEX_QUANTIZATION = os.getenv("NUMPY_INDEX_QUANTIZATION", "")
+# Candidates re-ranked at full precision, as a multiple of k
+NUMPY_INDEX_RERANK_FACTOR = int(os.getenv("NUMPY_INDEX_RERANK_FACTOR", "10"))
+
+# Metadata keys the index is pre-partitioned by (see NumpyIndex.partition_rows)
+PARTITION_KEY = "content_type"
+FACET_KEY = "organization"
+
+_COMPARISONS = {
+    "$eq": lambda value, arg: value == arg,
+    "$ne": lambda value, arg: value != arg,
+    "$in": lambda value, arg: value in arg,
+    "$nin": lambda value, arg: value not in arg,
+    "$gt": lambda value, arg: value > arg,
+    "$gte": lambda value, arg: value >= arg,
+    "$lt": lambda value, arg: value < arg,
+    "$lte": lambda value, arg: value <= arg,
+}
+
+
+class NumpyIndex:
+    """
+    Read-only, memory-mapped index data: embedding matrix, squared norms,
+    document texts and dictionary-encoded metadata columns.
+
+    Everything large is mapped with mmap_mode="r", so the pages are shared by
+    all processes (and by forked workers when loaded before fork).
+    """
+
+    def __init__(self, path: Path, quantization: str = "", rerank_factor: int = NUMPY_INDEX_RERANK_FACTOR):
+        self.path = Path(path)
+        with open(self.path / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        with open(self.path / METADATA_FILE, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        self.embeddings = np.load(self.path / EMBEDDINGS_FILE, mmap_mode="r")
+        self.norms = np.load(self.path / NORMS_FILE, mmap_mode="r")
+        self.document_offsets = np.load(self.path / DOCUMENT_OFFSETS_FILE, mmap_mode="r")
+        self.documents = np.memmap(self.path / DOCUMENTS_FILE, dtype=np.uint8, mode="r") \
+            if os.path.getsize(self.path / DOCUMENTS_FILE) else np.zeros(0, dtype=np.uint8)
+        self.metadata_codes = np.load(self.path / METADATA_CODES_FILE, mmap_mode="r")
+
+        self.ids: List[str] = metadata["ids"]
+        self.columns: List[str] = metadata["columns"]
+        self.column_values: Dict[str, list] = metadata["values"]
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+        self._build_partitions()
+
+        self.quantization = quantization or None
+        self.rerank_factor = max(1, rerank_factor)
+        self.quantizer = None
+        if self.quantization:
+            if self.quantization not in QUANTIZATION_METHODS:
+                raise ValueError(f"Unknown quantization method: {self.quantization}")
+            self.quantizer = load_quantizer(self.path, self.quantization)
+
+    def _build_partitions(self):
+        """
+        Precomputes the row ids of each content_type partition and of each
+        (content_type, organization) facet, so partition searches only score
+        the rows they can return instead of filtering the whole matrix.
+        """
+        self.partitions: Dict[str, np.ndarray] = {}
+        self.facets: Dict[Tuple[str, str], np.ndarray] = {}
+
+        partition_codes = self.column_codes(PARTITION_KEY)
+        if partition_codes is None:
+            return
+        facet_codes = self.column_codes(FACET_KEY)
+        partition_codes = np.asarray(partition_codes)
+
+        for code, content_type in enumerate(self.column_values[PARTITION_KEY]):
+            rows = np.flatnonzero(partition_codes == code)
+            self.partitions[content_type] = rows
+            if facet_codes is None:
+                continue
+            row_facets = np.asarray(facet_codes)[rows]
+            for facet_code, organization in enumerate(self.column_values[FACET_KEY]):
+                facet_rows = rows[row_facets == facet_code]
+                if len(facet_rows):
+                    self.facets[(content_type, organization)] = facet_rows
+
+    def partition_rows(self, content_types: List[str], organizations: Optional[List[str]] = None) -> np.ndarray:
+        """Sorted row ids of the given content_type partitions, optionally narrowed to organizations."""
+        if organizations is None:
+            parts = [self.partitions[ct] for ct in content_types if ct in self.partitions]
+        else:
+            parts = [self.facets[(ct, org)] for ct in content_types for org in organizations if (ct, org) in self.facets]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+    def facet_counts(self, content_type: str) -> Dict[str, int]:
+        """Number of chunks per organization within a content_type partition."""
+        return {org: len(rows) for (ct, org), rows in self.facets.items() if ct == content_type}
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1]
+
+    def document(self, row: int) -> str:
+        start, end = int(self.document_offsets[row]), int(self.document_offsets[row + 1])
+        return bytes(self.documents[start:end]).decode("utf-8")
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        codes = self.metadata_codes[row]
+        return {
+            name: self.column_values[name][code]
+            for name, code in zip(self.columns, codes.tolist())
+            if code >= 0
+        }
+
+    def column_codes(self, name: str) -> Optional[np.ndarray]:
+        col = self._column_index.get(name)
+        return None if col is None else self.metadata_codes[:, col]
+
+    def filter_mask(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Evaluates a Chroma-style `where` filter to a boolean row mask.
+
+        Predicates are evaluated once per distinct column value, then broadcast to
+        rows through the dictionary codes. Rows missing the key never match.
+        """
+        if not where:
+            return None
+
+        masks = []
+        for key, condition in where.items():
+            if key == "$and":
+                masks.append(np.logical_and.reduce([self.filter_mask(c) for c in condition]))
+            elif key == "$or":
+                masks.append(np.logical_or.reduce([self.filter_mask(c) for c in condition]))
+            else:
+                masks.append(self._column_mask(key, condition))
+        return np.logical_and.reduce(masks) if len(masks) > 1 else masks[0]
+
+    def _column_mask(self, key: str, condition) -> np.ndarray:
+        codes = self.column_codes(key)
+        if codes is None:
+            return np.zeros(len(self), dtype=bool)
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        values = self.column_values[key]
+        value_ok = np.ones(len(values) + 1, dtype=bool)
+        for op, arg in condition.items():
+            if op not in _COMPARISONS:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            compare = _COMPARISONS[op]
+            for i, value in enumerate(values):
+                try:
+                    value_ok[i] &= compare(value, arg)
+                except TypeError:
+                    value_ok[i] = False
+        # Code -1 (key missing) indexes the trailing slot, which never matches
+        value_ok[-1] = False
+        return value_ok[codes]
+
+    def score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Squared L2 distances, the same space Chroma's default HNSW index uses."""
+        query = np.asarray(query, dtype=np.float32)
+        matrix = self.embeddings if rows is None else self.embeddings[rows]
+        norms = self.norms if rows is None else self.norms[rows]
+
+        if matrix.dtype == np.float32:
+            dots = matrix @ query
+        else:
+            dots = np.empty(matrix.shape[0], dtype=np.float32)
+            for start in range(0, matrix.shape[0], SCORE_BLOCK_ROWS):
+                block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+                dots[start:start + SCORE_BLOCK_ROWS] = block @ query
+
+        # Clamp the tiny negatives float rounding produces for exact matches
+        return np.maximum(norms - 2.0 * dots + float(query @ query), 0.0)
+
+    def search(self, query: np.ndarray, k: int, where: Optional[Dict[str, Any]] = None,
+               rows: Optional[np.ndarray] = None, unique_by: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k nearest rows. Returns (row ids, distances) sorted by ascending distance.
+
+        Exact unless the index is quantized: then the codes are scanned and
+        the best k * rerank_factor candidates are re-scored at full precision,
+        so the returned distances are always exact. `rows` restricts the search to a subset (e.g. a partition). With
+        `unique_by`, returns the k nearest rows with distinct values of that
+        metadata key (e.g. one chunk per source_url).
+        """
+        mask = self.filter_mask(where)
+        if mask is not None:
+            if rows is not None:
+                rows = rows[mask[rows]]
+            else:
+                rows = np.flatnonzero(mask)
+
+        n_candidates = len(self) if rows is None else len(rows)
+        if n_candidates == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        if self.quantizer is not None:
+            rows = self._rerank_candidates(query, rows, k * self.rerank_factor * (4 if unique_by else 1))
+        distances = self.score(query, rows)
+        if unique_by is not None:
+            top = self._top_unique(distances, rows, k, unique_by)
+        else:
+            top = self._top_k(distances, k)
+
+        row_ids = top if rows is None else rows[top]
+        return row_ids, distances[top]
+
+    def _rerank_candidates(self, query: np.ndarray, rows: Optional[np.ndarray], n: int) -> Optional[np.ndarray]:
+        """Sorted row ids of the n nearest rows by approximate (quantized) distance."""
+        n_rows = len(self) if rows is None else len(rows)
+        if n >= n_rows:
+            return rows
+        approximate = self.quantizer.distances(np.asarray(query, dtype=np.float32), rows)
+        top = np.argpartition(approximate, n - 1)[:n]
+        # Sorted so the full-precision rows are read from the mapping in file order
+        return np.sort(top if rows is None else rows[top])
+
+    @staticmethod
+    def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+        n = len(distances)
+        k = min(k, n)
+        top = np.argpartition(distances, k - 1)[:k] if k < n else np.arange(n)
+        return top[np.argsort(distances[top], kind="stable")]
+
+    def _top_unique(self, distances: np.ndarray, rows: Optional[np.ndarray], k: int, unique_by: str) -> np.ndarray:
+        codes = self.column_codes(unique_by)
+        if codes is None:
+            return self._top_k(distances, k)
+
+        # Look at a few times k nearest first; only sort everything if those
+        # do not contain k distinct values
+        window = k * 4
+        while True:
+            top = self._top_k(distances, window)
+            top_codes = np.asarray(codes[top if rows is None else rows[top]])
+            # Rows missing the key (-1) are each treated as distinct
+            top_codes = np.where(top_codes < 0, -1 - np.arange(len(top_codes)), top_codes)
+            _, first = np.unique(top_codes, return_index=True)
+            if len(first) >= k or window >= len(distances):
+                return top[np.sort(first)[:k]]
+            window *= 4
+
+
+def current_numpy_index_path() -> Path:
+    """DEFAULT_NUMPY_INDEX_PATH inside the published index version, if ingest.py has written one."""
+    return resolve_chromadb_path(DEFAULT_NUMPY_INDEX_PATH.parent) / DEFAULT_NUMPY_INDEX_PATH.name
+
+
+_loaded_indexes: Dict[str, NumpyIndex] = {}
+
+def load_numpy_index(path=DEFAULT_NUMPY_INDEX_PATH, quantization: str = NUMPY_INDEX_QUANTIZATION) -> NumpyIndex:
+    """Loads (once per process) the exported index at `path`."""
+    key = f"{Path(path).resolve()}:{quantization}"
+    if key not in _loaded_indexes:
+        _loaded_indexes[key] = NumpyIndex(Path(path), quantization)
+        index = _loaded_indexes[key]
+        logger.info(f"Loaded NumPy index from {path}: {len(index)} docs, dim={index.dim}, "
+                    f"dtype={index.embeddings.dtype}, quantization={quantization or 'none'}")
+    return _loaded_indexes[key]
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Read-only LangChain VectorStore over a NumpyIndex, a drop-in replacement for
+    the Chroma store used by the retriever (similarity_search with `filter`).
+    """
+
+    def __init__(self, index: NumpyIndex, embedding_function):
+        self.index = index
+        self._embedding_function = embedding_function
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        return np.asarray(self._embedding_function.embed_query(query), dtype=np.float32)
+
+    def _to_documents(self, row_ids: np.ndarray, distances: np.ndarray) -> List[Tuple[Document, float]]:
+        return [
+            (Document(page_content=self.index.document(row), metadata=self.index.metadata(row), id=self.index.ids[row]),
+             float(distance))
+            for row, distance in zip(row_ids.tolist(), distances.tolist())
+        ]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        row_ids, distances = self.index.search(np.asarray(embedding, dtype=np.float32), k, filter)
+        return self._to_documents(row_ids, distances)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4,
+                          filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def search_partition(self, query: str, content_types: List[str], k: int,
+                         organizations: Optional[List[str]] = None,
+                         unique_by: Optional[str] = None, embedding: Optional[List[float]] = None) -> List[Document]:
+        """Searches only the given content_type partitions (and organization facets); `embedding` skips embedding the query."""
+        rows = self.index.partition_rows(content_types, organizations)
+        query_vector = np.asarray(embedding, dtype=np.float32) if embedding is not None else self._embed_query(query)
+        row_ids, distances = self.index.search(query_vector, k, rows=rows, unique_by=unique_by)
+        return [doc for doc, _ in self._to_documents(row_ids, distances)]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("NumpyVectorStore is read-only; re-run export_index.py to update it")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding, metadatas: Optional[List[dict]] = None, **kwargs: Any):
+        raise NotImplementedError("NumpyVectorStore is built with export_index.py")
@@ -0,0 +1,156 @@
+# app/services/rag/partitions.py
+# Per-content_type sub-collections for the Chroma backend.
+#
+# The retriever searches web pages and media separately. With one collection,
+# media searches pay for a metadata filter over HNSW results and web searches
+# over-fetch k*5 results and discard everything that is not a web page. The
+# partition build copies each content_type into its own collection (reusing
+# the stored embeddings), so each search only walks the relevant graph.
+#
+#   python -m app.services.rag.partitions
+
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain.schema import Document
+
+from .export_index import DEFAULT_CHROMADB_PATH, DEFAULT_COLLECTION, read_chroma_collection
+from .index_versions import resolve_chromadb_path
+
+logger = logging.getLogger(__name__)
+
+PARTITION_KEY = "content_type"
+FACET_KEY = "organization"
+BATCH_SIZE = 1000
+
+
+def partition_collection_name(collection_name: str, content_type: str) -> str:
+    return f"{collection_name}__{content_type}"
+
+
+def build_partition_collections(chromadb_path: Path, collection_name: str = DEFAULT_COLLECTION) -> Dict[str, int]:
+    """
+    (Re)creates one collection per content_type from the main collection and
+    returns the number of chunks written to each.
+    """
+    import chromadb
+
+    data = read_chroma_collection(chromadb_path, collection_name)
+    client = chromadb.PersistentClient(path=str(chromadb_path))
+
+    rows_by_type: Dict[str, List[int]] = {}
+    for row, metadata in enumerate(data["metadatas"]):
+        content_type = (metadata or {}).get(PARTITION_KEY, "unknown")
+        rows_by_type.setdefault(content_type, []).append(row)
+
+    counts = {}
+    for content_type, rows in rows_by_type.items():
+        name = partition_collection_name(collection_name, content_type)
+        try:
+            client.delete_collection(name)
+        except Exception:
+            pass
+        collection = client.create_collection(name)
+
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            collection.add(
+                ids=[data["ids"][i] for i in batch],
+                embeddings=[data["embeddings"][i] for i in batch],
+                documents=[data["documents"][i] for i in batch],
+                metadatas=[data["metadatas"][i] for i in batch],
+            )
+        counts[content_type] = len(rows)
+        logger.info(f"Built partition {name}: {len(rows)} chunks")
+
+    return counts
+
+
+class ChromaPartitionedStore:
+    """
+    Chroma store with per-content_type partition collections. Exposes the same
+    search_partition() as NumpyVectorStore; everything else is delegated to the
+    main store, so it can be used wherever the plain Chroma store is.
+    """
+
+    def __init__(self, base_store, chromadb_path: str, collection_name: str = DEFAULT_COLLECTION):
+        import chromadb
+
+        self.base_store = base_store
+        self.embedding_function = base_store.embeddings
+        client = chromadb.PersistentClient(path=str(chromadb_path))
+        existing = {c.name if hasattr(c, "name") else c for c in client.list_collections()}
+        prefix = partition_collection_name(collection_name, "")
+        self.partitions = {
+            name[len(prefix):]: client.get_collection(name)
+            for name in existing if name.startswith(prefix)
+        }
+
+    def __getattr__(self, name):
+        return getattr(self.base_store, name)
+
+    def search_partition(self, query: str, content_types: List[str], k: int,
+                         organizations: Optional[List[str]] = None,
+                         unique_by: Optional[str] = None, embedding: Optional[List[float]] = None) -> List[Document]:
+        query_embedding = embedding if embedding is not None else self.embedding_function.embed_query(query)
+        where = {FACET_KEY: {"$in": organizations}} if organizations else None
+        collections = [self.partitions[ct] for ct in content_types if ct in self.partitions]
+        if not collections:
+            return []
+
+        # HNSW cannot dedupe while searching, so widen the fetch only when
+        # duplicates leave fewer than k distinct results
+        n_results = k
+        while True:
+            hits = []
+            exhausted = True
+            for collection in collections:
+                result = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    where=where,
+                    include=["documents", "metadatas", "distances"],
+                )
+                ids = result["ids"][0]
+                exhausted &= len(ids) < n_results
+                for doc_id, text, metadata, distance in zip(
+                        ids, result["documents"][0], result["metadatas"][0], result["distances"][0]):
+                    hits.append((distance, Document(page_content=text or "", metadata=metadata or {}, id=doc_id)))
+            hits.sort(key=lambda hit: hit[0])
+
+            docs = unique_documents([doc for _, doc in hits], unique_by)
+            if len(docs) >= k or exhausted:
+                return docs[:k]
+            n_results *= 2
+
+
+def unique_documents(docs: List[Document], unique_by: Optional[str]) -> List[Document]:
+    if unique_by is None:
+        return docs
+    seen = set()
+    unique = []
+    for doc in docs:
+        value = doc.metadata.get(unique_by)
+        if value is not None and value in seen:
+            continue
+        seen.add(value)
+        unique.append(doc)
+    return unique
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build per-content_type partition collections")
+    parser.add_argument("--chromadb-path", default=str(resolve_chromadb_path(DEFAULT_CHROMADB_PATH)))
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    args = parser.parse_args()
+
+    counts = build_partition_collections(resolve_chromadb_path(args.chromadb_path), args.collection)
+    for content_type, count in sorted(counts.items()):
+        print(f"✅ {partition_collection_name(args.collection, content_type)}: {count} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# app/services/rag/quantization.py
+# Compressed embedding codes for the NumPy index.
+#
+# The quantized codes are what stays resident and is scanned on every query;
+# the full-precision matrix stays on disk (memory-mapped) and only the rows of
+# the top candidates are read back to re-rank them exactly.
+#
+#   int8: one signed byte per dimension with a per-dimension scale (4x smaller)
+#   pq:   product quantization, one byte per subspace of `dim / subspaces`
+#         dimensions (e.g. 768 dims / 96 subspaces = 32x smaller)
+#
+#   python -m app.services.rag.quantization --method pq --subspaces 96
+
+import argparse
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INT8_CODES_FILE = "int8_codes.npy"
+INT8_SCALE_FILE = "int8_scale.npy"
+PQ_CODES_FILE = "pq_codes.npy"
+PQ_CODEBOOKS_FILE = "pq_codebooks.npy"
+
+QUANTIZATION_METHODS = ("int8", "pq")
+
+# Rows dequantized per block while scanning int8 codes
+SCAN_BLOCK_ROWS = 4096
+
+
+class Int8Quantizer:
+    """Symmetric per-dimension scalar quantization to int8."""
+
+    def __init__(self, codes: np.ndarray, scale: np.ndarray):
+        self.codes = codes
+        self.scale = np.asarray(scale, dtype=np.float32)
+        decoded_norms = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], SCAN_BLOCK_ROWS):
+            block = np.asarray(codes[start:start + SCAN_BLOCK_ROWS], dtype=np.float32) * self.scale
+            decoded_norms[start:start + SCAN_BLOCK_ROWS] = np.einsum("ij,ij->i", block, block)
+        self.decoded_norms = decoded_norms
+
+    @classmethod
+    def train(cls, embeddings: np.ndarray):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        scale = np.abs(embeddings).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint(embeddings / scale), -127, 127).astype(np.int8)
+        return cls(codes, scale)
+
+    def save(self, path: Path):
+        np.save(path / INT8_CODES_FILE, self.codes)
+        np.save(path / INT8_SCALE_FILE, self.scale)
+
+    @classmethod
+    def load(cls, path: Path):
+        return cls(np.load(path / INT8_CODES_FILE, mmap_mode="r"), np.load(path / INT8_SCALE_FILE))
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scale.nbytes + self.decoded_norms.nbytes
+
+    def distances(self, query: np.ndarray, rows=None) -> np.ndarray:
+        """Approximate squared L2 distances to the (decoded) codes."""
+        codes = self.codes if rows is None else self.codes[rows]
+        norms = self.decoded_norms if rows is None else self.decoded_norms[rows]
+        scaled_query = query * self.scale
+        dots = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], SCAN_BLOCK_ROWS):
+            block = np.asarray(codes[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            dots[start:start + SCAN_BLOCK_ROWS] = block @ scaled_query
+        return norms - 2.0 * dots + float(query @ query)
+
+
+class ProductQuantizer:
+    """Product quantization with 256 centroids (one uint8 code) per subspace."""
+
+    def __init__(self, codes: np.ndarray, codebooks: np.ndarray):
+        # Codes are stored subspace-major, (subspaces, n), so each table lookup reads a contiguous row
+        self.codes = codes
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)  # (subspaces, 256, sub_dim)
+        self.subspaces, _, self.sub_dim = self.codebooks.shape
+        self.codebook_norms = np.einsum("smd,smd->sm", self.codebooks, self.codebooks)
+
+    @classmethod
+    def train(cls, embeddings: np.ndarray, subspaces: int = 96, iterations: int = 20, seed: int = 0):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        n, dim = embeddings.shape
+        if dim % subspaces:
+            raise ValueError(f"Embedding dim {dim} is not divisible by {subspaces} subspaces")
+        sub_dim = dim // subspaces
+        centroids = min(256, n)
+        rng = np.random.default_rng(seed)
+
+        codebooks = np.zeros((subspaces, 256, sub_dim), dtype=np.float32)
+        codes = np.zeros((subspaces, n), dtype=np.uint8)
+        for s in range(subspaces):
+            x = embeddings[:, s * sub_dim:(s + 1) * sub_dim]
+            codebook, assignment = _kmeans(x, centroids, iterations, rng)
+            codebooks[s, :centroids] = codebook
+            codes[s] = assignment
+        return cls(codes, codebooks)
+
+    def save(self, path: Path):
+        np.save(path / PQ_CODES_FILE, self.codes)
+        np.save(path / PQ_CODEBOOKS_FILE, self.codebooks)
+
+    @classmethod
+    def load(cls, path: Path):
+        return cls(np.load(path / PQ_CODES_FILE, mmap_mode="r"), np.load(path / PQ_CODEBOOKS_FILE))
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.codebooks.nbytes + self.codebook_norms.nbytes
+
+    def distances(self, query: np.ndarray, rows=None) -> np.ndarray:
+        """Asymmetric distances: exact query against the quantized rows, via lookup tables."""
+        codes = self.codes if rows is None else self.codes[:, rows]
+        sub_queries = query.reshape(self.subspaces, self.sub_dim)
+        # (subspaces, 256) squared distances from each query slice to each centroid
+        tables = (self.codebook_norms - 2.0 * np.einsum("smd,sd->sm", self.codebooks, sub_queries)
+                  + np.einsum("sd,sd->s", sub_queries, sub_queries)[:, None])
+        distances = np.zeros(codes.shape[1], dtype=np.float32)
+        for s in range(self.subspaces):
+            distances += tables[s].take(codes[s])
+        return distances
+
+
+def _kmeans(x: np.ndarray, k: int, iterations: int, rng) -> tuple:
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    x_norms = np.einsum("ij,ij->i", x, x)[:, None]
+    assignment = np.zeros(len(x), dtype=np.int64)
+    for _ in range(iterations):
+        distances = x_norms - 2.0 * x @ centroids.T + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+        assignment = distances.argmin(axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, x)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        # Re-seed empty clusters on random points
+        if not nonempty.all():
+            centroids[~nonempty] = x[rng.choice(len(x), size=(~nonempty).sum(), replace=False)]
+    return centroids, assignment.astype(np.uint8)
+
+
+def load_quantizer(path: Path, method: str):
+    if method == "int8":
+        return Int8Quantizer.load(path)
+    if method == "pq":
+        return ProductQuantizer.load(path)
+    raise ValueError(f"Unknown quantization method: {method}")
+
+
+def build_quantizer(path: Path, method: str, subspaces: int = 96):
+    """Trains a quantizer on an exported index's full-precision matrix and saves its codes next to it."""
+    from .numpy_store import EMBEDDINGS_FILE, MANIFEST_FILE
+
+    embeddings = np.load(path / EMBEDDINGS_FILE, mmap_mode="r")
+    if method == "int8":
+        quantizer = Int8Quantizer.train(embeddings)
+    elif method == "pq":
+        quantizer = ProductQuantizer.train(embeddings, subspaces=subspaces)
+    else:
+        raise ValueError(f"Unknown quantization method: {method}")
+    quantizer.save(path)
+
+    manifest_path = path / MANIFEST_FILE
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest.setdefault("quantization", {})[method] = {
+        "bytes": int(quantizer.nbytes),
+        **({"subspaces": subspaces} if method == "pq" else {}),
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    logger.info(f"Built {method} codes for {path}: {quantizer.nbytes / (1024 * 1024):.1f} MB "
+                f"(full precision: {embeddings.nbytes / (1024 * 1024):.1f} MB)")
+    return quantizer
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    from .numpy_store import current_numpy_index_path
+
+    parser = argparse.ArgumentParser(description="Build quantized codes for an exported NumPy index")
+    parser.add_argument("--index", default=str(current_numpy_index_path()))
+    parser.add_argument("--method", choices=QUANTIZATION_METHODS, required=True)
+    parser.add_argument("--subspaces", type=int, default=96, help="PQ subspaces (must divide the embedding dim)")
+    args = parser.parse_args()
+
+    quantizer = build_quantizer(Path(args.index), args.method, args.subspaces)
+    print(f"✅ {args.method} codes written to {args.index} ({quantizer.nbytes / (1024 * 1024):.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,72 @@ import os
 import json
 from typing import Dict, List, Optional
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
 
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain.schema import Document
 
+from .context_builder import build_context, context_budget
+from .google_http import make_chat_model, make_embeddings
+from .index_versions import resolve_chromadb_path
+from .lexical_index import reciprocal_rank_fusion
+from .partitions import unique_documents
+from .resilience import (
+    CircuitOpenError, GuardedChatModel, GuardedEmbeddings, RateLimitedError, embedding_guard, llm_guard,
+)
+from .semantic_cache import SEMANTIC_CACHE, SemanticCache, normalize_question
+from .single_flight import SingleFlight
+from .symptoms import (
+    SYMPTOM_INDEX_DIR, SYMPTOM_INDEX_MEMORY_MB, SYMPTOM_PROFILES, LazyResourceCache, SymptomCareTipManager,
+    SymptomResources, get_symptom_profile, index_bytes,
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# "chroma" (persistent client) or "numpy" (in-process exact search over the
+# memory-mapped export written by export_index.py)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma").lower()
+NUMPY_INDEX_PATH = os.getenv("NUMPY_INDEX_PATH")
+# Search per-content_type partition collections (built by partitions.py) with
+# the Chroma backend. The NumPy backend is always partitioned.
+VECTOR_STORE_PARTITIONS = os.getenv("VECTOR_STORE_PARTITIONS", "0") == "1"
+
+# "vector" (embedding search only), "hybrid" (BM25 + vector, rank-fused) or
+# "lexical" (BM25 only, no embedding calls); see lexical_index.py
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector").lower()
+# In hybrid mode, serve the lexical results alone when the vector search takes
+# longer than this many seconds (0 = wait) or fails
+VECTOR_SEARCH_TIMEOUT = float(os.getenv("VECTOR_SEARCH_TIMEOUT", "0"))
+
+# Web articles retrieved for the prompt context (0 = media only, the context
+# then falls back to a fixed sentence); the context is packed into the
+# per-severity token budget of context_builder.py
+RAG_CONTEXT_ARTICLES = int(os.getenv("RAG_CONTEXT_ARTICLES", "0"))
+
+# Bump when the prompt template changes: concurrent calls are only coalesced
+# (see single_flight.py) when they would send the same prompt
+PROMPT_VERSION = "pain-v1"
+# Concurrent calls with the same (severity, symptom, prompt version) share one computation
+RAG_SINGLE_FLIGHT = os.getenv("RAG_SINGLE_FLIGHT", "1") == "1"
+
+# Gemini client retries and per-request timeout; the breakers in resilience.py
+# decide when to stop calling altogether
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+# Retrieve the media for every severity in the background at startup, so the
+# degraded answer has media even if the embedding API is down from the start
+RAG_PREFETCH_MEDIA = os.getenv("RAG_PREFETCH_MEDIA", "1") == "1"
+
+# Web articles retrieved as context for a free-text question
+RAG_QUESTION_ARTICLES = int(os.getenv("RAG_QUESTION_ARTICLES", "3"))
+
+WEB_PAGE_TYPES = ["web_page"]
+MEDIA_TYPES = ["video", "podcast"]
+
 class PainCaretipManager:
     def __init__(self):
         self.pain_care_tips = {
@@ -76,8 +132,11 @@ class PainCaretipManager:
 class SimplifiedPainFocusedRAGRetriever:
     """SIMPLIFIED: No complex scoring, minimal filtering"""
 
-    def __init__(self, vector_store):
+    def __init__(self, vector_store, lexical_index=None, retrieval_mode: str = "vector"):
         self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.retrieval_mode = retrieval_mode if lexical_index is not None else "vector"
+        self._vector_executor = None
         
         # Severity-specific queries
         self.severity_queries = {
@@ -96,6 +155,50 @@ class SimplifiedPainFocusedRAGRetriever:
         # Simple check: web_page type and no media URL
         return content_type == 'web_page' and not media_url
 
+    def _supports_partitions(self) -> bool:
+        return self.retrieval_mode != "vector" or hasattr(self.vector_store, "search_partition")
+
+    def _vector_partition_search(self, query: str, content_types: List[str], k: int, unique_by: str,
+                                 embedding: Optional[List[float]] = None) -> List[Document]:
+        if hasattr(self.vector_store, "search_partition"):
+            return self.vector_store.search_partition(query, content_types, k=k, unique_by=unique_by,
+                                                      embedding=embedding)
+        content_filter = {"content_type": {"$in": content_types}}
+        if embedding is not None:
+            results = self.vector_store.similarity_search_by_vector(embedding, k=k*5, filter=content_filter)
+        else:
+            results = self.vector_store.similarity_search(query, k=k*5, filter=content_filter)
+        return unique_documents(results, unique_by)[:k]
+
+    def search_partition(self, query: str, content_types: List[str], k: int, unique_by: str,
+                         embedding: Optional[List[float]] = None) -> List[Document]:
+        """k distinct results from the given content_types, using the configured retrieval mode.
+        Pass the query's `embedding` when the caller already has it."""
+        if self.retrieval_mode == "vector":
+            return self._vector_partition_search(query, content_types, k, unique_by, embedding)
+
+        lexical = self.lexical_index.search(query, k*2, content_types, unique_by)
+        if self.retrieval_mode == "lexical":
+            return lexical[:k]
+
+        try:
+            if VECTOR_SEARCH_TIMEOUT > 0:
+                if self._vector_executor is None:
+                    self._vector_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vector-search")
+                future = self._vector_executor.submit(self._vector_partition_search, query, content_types, k*2,
+                                                      unique_by, embedding)
+                vector = future.result(timeout=VECTOR_SEARCH_TIMEOUT)
+            else:
+                vector = self._vector_partition_search(query, content_types, k*2, unique_by, embedding)
+        except FutureTimeoutError:
+            logger.warning(f"Vector search for '{query}' exceeded {VECTOR_SEARCH_TIMEOUT}s, using lexical results")
+            return lexical[:k]
+        except Exception as e:
+            logger.warning(f"Vector search for '{query}' failed ({e}), using lexical results")
+            return lexical[:k]
+
+        return reciprocal_rank_fusion([lexical, vector], k, unique_by)
+
     def _is_media_content(self, metadata) -> bool:
         """Check if content is media"""
         content_type = metadata.get('content_type', '')
@@ -113,8 +216,12 @@ class SimplifiedPainFocusedRAGRetriever:
             
             for query in queries:
                 try:
-                    # Get search results
-                    results = self.vector_store.similarity_search(query, k=k*5)
+                    # Get search results: the web page partition returns exactly k
+                    # distinct pages, the shared index needs over-fetching
+                    if self._supports_partitions():
+                        results = self.search_partition(query, WEB_PAGE_TYPES, k=k, unique_by='source_url')
+                    else:
+                        results = self.vector_store.similarity_search(query, k=k*5)
                     
                     for doc in results:
                         url = doc.metadata.get('source_url', '')
@@ -145,7 +252,10 @@ class SimplifiedPainFocusedRAGRetriever:
             if len(all_articles) == 0:
                 logger.info("No articles found with specific queries, trying basic search...")
                 try:
-                    basic_results = self.vector_store.similarity_search("parkinson", k=k*10)
+                    if self._supports_partitions():
+                        basic_results = self.search_partition("parkinson", WEB_PAGE_TYPES, k=k*2, unique_by='source_url')
+                    else:
+                        basic_results = self.vector_store.similarity_search("parkinson", k=k*10)
                     
                     for doc in basic_results:
                         url = doc.metadata.get('source_url', '')
@@ -204,11 +314,14 @@ class SimplifiedPainFocusedRAGRetriever:
                 try:
                     # Add media-specific terms
                     media_query = f"{query} video podcast"
-                    results = self.vector_store.similarity_search(
-                        media_query,
-                        k=k*5,
-                        filter={"content_type": {"$in": ["video", "podcast"]}}
-                    )
+                    if self._supports_partitions():
+                        results = self.search_partition(media_query, MEDIA_TYPES, k=k, unique_by='media_url')
+                    else:
+                        results = self.vector_store.similarity_search(
+                            media_query,
+                            k=k*5,
+                            filter={"content_type": {"$in": MEDIA_TYPES}}
+                        )
 
                     for doc in results:
                         if not self._is_media_content(doc.metadata):
@@ -263,6 +376,33 @@ class SimplifiedPainFocusedRAGRetriever:
             return []
 
 
+def degraded_result(severity_score: int, care_tip_data: Dict, reason: str,
+                    media_resources: List[Dict], symptom: str = 'pain') -> Dict:
+    """Care-tip result carrying only the predefined tip and the given media."""
+    return {
+        'symptom': symptom,
+        'severity_score': severity_score,
+        'care_level': care_tip_data['care_level'],
+        'escalation_needed': care_tip_data['escalation_needed'],
+        'predefined_tip': care_tip_data['tip'],
+        'ai_enhanced_tip': "",
+        'sources': [],
+        'media_resources': media_resources,
+        'tone_info': {
+            'tone_style': care_tip_data.get('tone', 'supportive'),
+            'focus_area': care_tip_data.get('focus', 'pain_management')
+        },
+        'retrieval_info': {
+            'degraded': True,
+            'degraded_reason': reason,
+            'total_pain_docs_found': 0,
+            'total_pain_media_found': len(media_resources)
+        },
+        'degraded': True,
+        'success': True
+    }
+
+
 class EnhancedPainFocusedCareRAG:
     """RAG system with simplified filtering"""
 
@@ -270,24 +410,33 @@ class EnhancedPainFocusedCareRAG:
         self.chromadb_path = chromadb_path
         self.google_api_key = google_api_key
         self.pain_care_manager = PainCaretipManager()
+        # Last successful media retrieval per severity, served in degraded mode
+        self._media_by_severity: Dict[int, List[Dict]] = {}
+        # Other symptoms' indexes and tips, loaded on first use (see symptoms.py)
+        self.symptom_resources = LazyResourceCache(self._load_symptom_resources, SYMPTOM_INDEX_MEMORY_MB * 2**20)
+        # Answers to free-text questions, reused for similar questions
+        self.answer_cache = SemanticCache()
         self._initialize_system()
+        if RAG_PREFETCH_MEDIA:
+            threading.Thread(target=self.prefetch_media, daemon=True, name="rag-media-prefetch").start()
 
     def _initialize_system(self):
         try:
             os.environ["GOOGLE_API_KEY"] = self.google_api_key
             
-            embedding_function = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-            self.vector_store = Chroma(
-                collection_name="parkinsons_complete_kb",
-                embedding_function=embedding_function,
-                persist_directory=self.chromadb_path
-            )
+            self.embedding_function = GuardedEmbeddings(make_embeddings("models/embedding-001"), embedding_guard)
+            self.vector_store = self._create_vector_store(self.embedding_function)
             
             # Use SIMPLIFIED retriever
-            self.retriever = SimplifiedPainFocusedRAGRetriever(self.vector_store)
+            self.retriever = SimplifiedPainFocusedRAGRetriever(
+                self.vector_store, self._create_lexical_index(), RETRIEVAL_MODE)
             
-            self.llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3)
+            self.llm = GuardedChatModel(
+                make_chat_model("gemini-1.5-flash", temperature=0.3, max_retries=LLM_MAX_RETRIES, timeout=LLM_TIMEOUT),
+                llm_guard)
             self.prompt_template = self._create_enhanced_pain_prompt_template()
+            self.symptom_prompt_template = self._create_symptom_prompt_template()
+            self.question_prompt_template = self._create_question_prompt_template()
             
             logger.info("Enhanced pain-focused RAG system initialized successfully")
             
@@ -295,6 +444,32 @@ class EnhancedPainFocusedCareRAG:
             logger.error(f"Failed to initialize enhanced pain-focused RAG system: {str(e)}")
             raise
 
+    def _create_vector_store(self, embedding_function):
+        if VECTOR_STORE_BACKEND == "numpy":
+            from .numpy_store import NumpyVectorStore, load_numpy_index
+            index_path = NUMPY_INDEX_PATH or os.path.join(self.chromadb_path, "numpy_index")
+            logger.info(f"Using in-process NumPy vector store: {index_path}")
+            return NumpyVectorStore(load_numpy_index(index_path), embedding_function)
+
+        vector_store = Chroma(
+            collection_name="parkinsons_complete_kb",
+            embedding_function=embedding_function,
+            persist_directory=self.chromadb_path
+        )
+        if VECTOR_STORE_PARTITIONS:
+            from .partitions import ChromaPartitionedStore
+            vector_store = ChromaPartitionedStore(vector_store, self.chromadb_path)
+            logger.info(f"Using Chroma partitions: {sorted(vector_store.partitions)}")
+        return vector_store
+
+    def _create_lexical_index(self):
+        if RETRIEVAL_MODE not in ("hybrid", "lexical"):
+            return None
+        from .lexical_index import load_lexical_index
+        numpy_index = getattr(self.vector_store, "index", None)
+        logger.info(f"Using {RETRIEVAL_MODE} retrieval")
+        return load_lexical_index(self.chromadb_path, numpy_index=numpy_index)
+
     def _create_enhanced_pain_prompt_template(self):
         system_template = """You are a specialized Parkinson's disease pain management assistant. Provide additional guidance that complements the predefined pain care tip.
 
@@ -321,81 +496,116 @@ Predefined Pain Care Tip:
             HumanMessagePromptTemplate.from_template(human_template)
         ])
 
+    def _create_symptom_prompt_template(self):
+        system_template = """You are a specialized Parkinson's disease care assistant for {symptom_name}. Provide additional guidance that complements the predefined care tip.
+
+Use the knowledge base context to add NEW information about {symptom_name} not already mentioned in the predefined tip. Do not suggest changing medication without the healthcare team.
+
+TONE MATCHING - Match the exact tone:
+- gentle_encouragement: "Research shows gentle approaches...", "Studies indicate..."
+- practical_supportive: "Specialists recommend...", "Evidence-based techniques include..."
+- solution_focused: "Research suggests...", "Clinical studies show..."
+- calm_professional: "Medical literature indicates...", "Experts advise..."
+
+FOCUS: {focus_area}
+
+Knowledge Base Context:
+{context}
+
+Predefined Care Tip:
+{care_tip}"""
+
+        human_template = """I have {symptom_name} severity {rating}/5. Add evidence-based guidance from the knowledge base that complements the predefined tip without repeating it."""
+
+        return ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(system_template),
+            HumanMessagePromptTemplate.from_template(human_template)
+        ])
+
+    def _create_question_prompt_template(self):
+        system_template = """You are a specialized Parkinson's disease care assistant. Answer the patient's question about {symptom_name} in a few short, practical paragraphs.
+
+Use the knowledge base context. If it does not answer the question, give general, safe guidance and suggest discussing it with the healthcare team. Do not suggest changing medication without the healthcare team.
+
+Knowledge Base Context:
+{context}"""
+
+        human_template = """{question}"""
+
+        return ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(system_template),
+            HumanMessagePromptTemplate.from_template(human_template)
+        ])
+
+    def _load_symptom_resources(self, symptom: str) -> SymptomResources:
+        """
+        A symptom's retriever: over its own exported index when one was built
+        (python -m app.services.rag.symptoms --build), else over the shared
+        store with the symptom's queries.
+        """
+        profile = SYMPTOM_PROFILES[symptom]
+        index_path = Path(self.chromadb_path) / SYMPTOM_INDEX_DIR / symptom
+        if (index_path / "manifest.json").exists() and RETRIEVAL_MODE != "lexical":
+            from .numpy_store import NumpyIndex, NumpyVectorStore
+            # Not load_numpy_index: its process-wide cache would keep evicted indexes mapped
+            vector_store = NumpyVectorStore(NumpyIndex(index_path), self.embedding_function)
+            retriever = SimplifiedPainFocusedRAGRetriever(vector_store)
+            memory_bytes, dedicated = index_bytes(index_path), True
+        else:
+            retriever = SimplifiedPainFocusedRAGRetriever(
+                self.vector_store, self.retriever.lexical_index, RETRIEVAL_MODE)
+            memory_bytes, dedicated = 0, False
+        retriever.severity_queries = profile.severity_queries
+        logger.info(f"Loaded {symptom} resources ({'dedicated index' if dedicated else 'shared store'}, "
+                    f"{memory_bytes / 2**20:.1f} MB)")
+        return SymptomResources(profile, SymptomCareTipManager(profile), retriever, memory_bytes, dedicated)
+
+    def prefetch_media(self):
+        for severity in range(1, 6):
+            if embedding_guard.breaker.is_open():
+                return
+            self._media_resources(severity)
+        logger.info(f"Prefetched media for severities {sorted(self._media_by_severity)}")
+
+    def _media_resources(self, severity: int, k: int = 2, retriever=None,
+                         media_cache: Optional[Dict[int, List[Dict]]] = None) -> List[Dict]:
+        """Media for the severity, falling back to the last successful retrieval."""
+        retriever = retriever or self.retriever
+        media_cache = self._media_by_severity if media_cache is None else media_cache
+        if not embedding_guard.breaker.is_open():
+            media = retriever.search_media_resources(severity, k=k)
+            if media:
+                media_cache[severity] = media
+                return media
+        return list(media_cache.get(severity, []))
+
+    def _degraded_response(self, severity_score: int, care_tip_data: Dict, reason: str,
+                           media_resources: Optional[List[Dict]] = None, symptom: str = 'pain') -> Dict:
+        """Predefined tip and pre-retrieved media, without calling Gemini."""
+        logger.warning(f"Degraded {symptom} care tip for severity {severity_score}: {reason}")
+        if media_resources is None:
+            media_resources = list(self._media_by_severity.get(severity_score, []))
+        return degraded_result(severity_score, care_tip_data, reason, media_resources, symptom)
+
     def get_refined_tip_with_rag(self, severity_score: int, symptom: str, user_id: str = "default") -> Dict:
         """Main function with simplified filtering"""
         try:
             logger.info(f"Processing {symptom} with severity {severity_score}")
             
             if symptom != "pain":
-                return self._fallback_for_non_pain(severity_score, symptom, user_id)
-            
+                profile = get_symptom_profile(symptom)
+                if profile is None:
+                    return self._fallback_for_non_pain(severity_score, symptom, user_id)
+                resources = self.symptom_resources.get(profile.name)
+                return self._generate_tip(
+                    profile.display_name, severity_score, resources.care_manager.get_care_tip(severity_score),
+                    resources.retriever, resources.media_by_severity, self.symptom_prompt_template,
+                    {'symptom_name': profile.display_name})
+
             # Get predefined tip
             care_tip_data = self.pain_care_manager.get_pain_care_tip(severity_score)
-
-            # Get SEPARATE web articles and media
-            # web_articles = self.retriever.search_web_articles(severity_score, k=3)
-            web_articles = []
-            media_resources = self.retriever.search_media_resources(severity_score, k=2)
-
-            logger.info(f"Retrieved {len(web_articles)} articles, {len(media_resources)} media for severity {severity_score}")
-
-            # Create context from articles only
-            if web_articles:
-                context_parts = []
-                for doc in web_articles:
-                    org = doc.metadata.get('organization', 'Unknown')
-                    title = doc.metadata.get('title', 'Unknown')
-                    
-                    content_preview = doc.page_content[:600]
-                    context_parts.append(f"Source: {org} - {title}\n{content_preview}...")
-                
-                context = "\n\n".join(context_parts)
-            else:
-                context = "Limited pain-specific information available."
-
-            # Generate AI response
-            formatted_prompt = self.prompt_template.format_messages(
-                context=context,
-                care_tip=care_tip_data['tip'],
-                rating=severity_score,
-                focus_area=care_tip_data.get('focus', 'pain_management')
-            )
-
-            ai_response = self.llm.invoke(formatted_prompt)
-
-            # Format sources (articles only)
-            sources = []
-            for doc in web_articles:
-                sources.append({
-                    'organization': doc.metadata.get('organization', 'Unknown'),
-                    'title': doc.metadata.get('title', 'No title'),
-                    'url': doc.metadata.get('source_url', ''),
-                    'content_type': 'web_page',
-                    'description': doc.metadata.get('description', ''),
-                    'query_source': doc.metadata.get('query_source', 'search')
-                })
-
-            return {
-                'symptom': 'pain',
-                'severity_score': severity_score,
-                'care_level': care_tip_data['care_level'],
-                'escalation_needed': care_tip_data['escalation_needed'],
-                'predefined_tip': care_tip_data['tip'],
-                'ai_enhanced_tip': ai_response.content,
-                'sources': sources,  # WEB ARTICLES ONLY
-                'media_resources': media_resources,  # MEDIA ONLY
-                'tone_info': {
-                    'tone_style': care_tip_data.get('tone', 'supportive'),
-                    'focus_area': care_tip_data.get('focus', 'pain_management')
-                },
-                'retrieval_info': {
-                    'enhanced_pain_search': True,
-                    'simplified_filtering': True,
-                    'total_pain_docs_found': len(web_articles),
-                    'total_pain_media_found': len(media_resources)
-                },
-                'success': True
-            }
+            return self._generate_tip('pain', severity_score, care_tip_data, self.retriever,
+                                      self._media_by_severity, self.prompt_template)
 
         except Exception as e:
             logger.error(f"Error in enhanced pain RAG: {str(e)}")
@@ -414,6 +624,150 @@ Predefined Pain Care Tip:
                 'success': False
             }
 
+    def _generate_tip(self, symptom: str, severity_score: int, care_tip_data: Dict, retriever,
+                      media_cache: Dict[int, List[Dict]], prompt_template, prompt_vars: Optional[Dict] = None) -> Dict:
+        """Predefined tip completed by Gemini from the symptom's retrieved articles."""
+        # Gemini is failing or slow: answer immediately instead of waiting on it
+        if llm_guard.breaker.is_open():
+            return self._degraded_response(severity_score, care_tip_data, "gemini_chat circuit open",
+                                           list(media_cache.get(severity_score, [])), symptom)
+
+        # Get SEPARATE web articles and media
+        web_articles = (retriever.search_web_articles(severity_score, k=RAG_CONTEXT_ARTICLES)
+                        if RAG_CONTEXT_ARTICLES > 0 and not embedding_guard.breaker.is_open() else [])
+        media_resources = self._media_resources(severity_score, k=2, retriever=retriever, media_cache=media_cache)
+
+        logger.info(f"Retrieved {len(web_articles)} articles, {len(media_resources)} media for severity {severity_score}")
+
+        # Create context from articles only, within the severity's token budget
+        built_context = build_context(
+            web_articles,
+            retriever.severity_queries.get(severity_score, [symptom]),
+            context_budget(severity_score),
+        )
+        context = built_context.text
+        logger.info(f"Context for severity {severity_score}: {built_context.tokens_used}/"
+                    f"{built_context.token_budget} tokens from {len(built_context.sources_used)} sources")
+
+        # Generate AI response
+        formatted_prompt = prompt_template.format_messages(
+            context=context,
+            care_tip=care_tip_data['tip'],
+            rating=severity_score,
+            focus_area=care_tip_data.get('focus', 'pain_management'),
+            **(prompt_vars or {})
+        )
+
+        try:
+            ai_response = self.llm.invoke(formatted_prompt)
+        except (CircuitOpenError, RateLimitedError) as e:
+            return self._degraded_response(severity_score, care_tip_data, str(e), media_resources, symptom)
+        except Exception as e:
+            return self._degraded_response(severity_score, care_tip_data,
+                                           f"gemini_chat failed: {type(e).__name__}: {e}", media_resources, symptom)
+
+        # Format sources (articles only)
+        sources = []
+        for doc in web_articles:
+            sources.append({
+                'organization': doc.metadata.get('organization', 'Unknown'),
+                'title': doc.metadata.get('title', 'No title'),
+                'url': doc.metadata.get('source_url', ''),
+                'content_type': 'web_page',
+                'description': doc.metadata.get('description', ''),
+                'query_source': doc.metadata.get('query_source', 'search')
+            })
+
+        return {
+            'symptom': symptom,
+            'severity_score': severity_score,
+            'care_level': care_tip_data['care_level'],
+            'escalation_needed': care_tip_data['escalation_needed'],
+            'predefined_tip': care_tip_data['tip'],
+            'ai_enhanced_tip': ai_response.content,
+            'sources': sources,  # WEB ARTICLES ONLY
+            'media_resources': media_resources,  # MEDIA ONLY
+            'tone_info': {
+                'tone_style': care_tip_data.get('tone', 'supportive'),
+                'focus_area': care_tip_data.get('focus', 'pain_management')
+            },
+            'retrieval_info': {
+                'enhanced_pain_search': True,
+                'simplified_filtering': True,
+                'total_pain_docs_found': len(web_articles),
+                'total_pain_media_found': len(media_resources),
+                **built_context.stats()
+            },
+            'success': True
+        }
+
+    def answer_question(self, question: str, symptom: str = "pain") -> Dict:
+        """
+        Answer to a free-text question. Served from the semantic cache when the
+        same or a similar question about the symptom was answered before;
+        otherwise retrieved and generated, then cached.
+        """
+        profile = get_symptom_profile(symptom)
+        namespace = profile.name if profile else "pain"
+        if SEMANTIC_CACHE:
+            cached = self.answer_cache.get_exact(namespace, question)
+            if cached:
+                return {**cached["answer"], 'cached': True, 'similarity': cached["similarity"]}
+
+        if llm_guard.breaker.is_open() or embedding_guard.breaker.is_open():
+            return {'question': question, 'success': False, 'degraded': True, 'error': "circuit open"}
+
+        try:
+            vector = self.embedding_function.embed_query(normalize_question(question))
+        except Exception as e:
+            return {'question': question, 'success': False, 'error': f"embedding failed: {type(e).__name__}: {e}"}
+        if SEMANTIC_CACHE:
+            cached = self.answer_cache.get(namespace, vector)
+            if cached:
+                logger.info(f"Semantic cache hit ({cached['similarity']}): '{question}' ~ '{cached['question']}'")
+                return {**cached["answer"], 'cached': True, 'similarity': cached["similarity"]}
+
+        retriever = self.symptom_resources.get(profile.name).retriever if profile else self.retriever
+        try:
+            # The question's embedding from the cache lookup is reused, not recomputed
+            if retriever._supports_partitions():
+                articles = retriever.search_partition(question, WEB_PAGE_TYPES, k=RAG_QUESTION_ARTICLES,
+                                                      unique_by='source_url', embedding=vector)
+            else:
+                results = retriever.vector_store.similarity_search_by_vector(vector, k=RAG_QUESTION_ARTICLES*5)
+                articles = unique_documents([doc for doc in results if retriever._is_web_article(doc.metadata)],
+                                            'source_url')[:RAG_QUESTION_ARTICLES]
+        except Exception as e:
+            logger.warning(f"Article search for question failed: {e}")
+            articles = []
+        built_context = build_context(articles, [question], context_budget(3))
+
+        formatted_prompt = self.question_prompt_template.format_messages(
+            symptom_name=profile.display_name if profile else "pain",
+            context=built_context.text,
+            question=question
+        )
+        try:
+            ai_response = self.llm.invoke(formatted_prompt)
+        except Exception as e:
+            return {'question': question, 'success': False, 'error': f"gemini_chat failed: {type(e).__name__}: {e}"}
+
+        answer = {
+            'question': question,
+            'symptom': namespace,
+            'answer': ai_response.content,
+            'sources': [{
+                'organization': doc.metadata.get('organization', 'Unknown'),
+                'title': doc.metadata.get('title', 'No title'),
+                'url': doc.metadata.get('source_url', ''),
+            } for doc in articles],
+            'retrieval_info': built_context.stats(),
+            'success': True
+        }
+        if SEMANTIC_CACHE:
+            self.answer_cache.put(namespace, question, vector, answer)
+        return {**answer, 'cached': False, 'similarity': None}
+
     def _fallback_for_non_pain(self, severity_score: int, symptom: str, user_id: str) -> Dict:
         return {
             'symptom': symptom,
@@ -442,20 +796,78 @@ def get_enhanced_pain_rag_instance(chromadb_path: str = None, google_api_key: st
     return _enhanced_pain_rag_instance
 
 
+_rag_single_flight = SingleFlight()
+
+
+def coalescing_key(severity_score, symptom: str) -> tuple:
+    try:
+        severity_score = int(severity_score)
+    except (TypeError, ValueError):
+        pass
+    return severity_score, (symptom or "").strip().lower(), PROMPT_VERSION
+
+
+def get_single_flight_stats() -> Dict[str, int]:
+    return _rag_single_flight.stats()
+
+
+def get_semantic_cache_stats() -> Dict:
+    """Free-text answer cache of this worker; empty before the RAG system is created."""
+    if _enhanced_pain_rag_instance is None:
+        return {}
+    return _enhanced_pain_rag_instance.answer_cache.stats()
+
+
+def answer_question(question: str, symptom: str = "pain") -> Dict:
+    """Answer to a free-text question, from the semantic answer cache when possible."""
+    try:
+        chromadb_path = resolve_chromadb_path(Path(__file__).parent / "ChromaDB_Parkinson_Data")
+        google_api_key = os.getenv("GOOGLE_API_KEY")
+        if not google_api_key:
+            raise ValueError("GOOGLE_API_KEY environment variable not set")
+        return get_enhanced_pain_rag_instance(str(chromadb_path), google_api_key).answer_question(question, symptom)
+    except Exception as e:
+        logger.error(f"Error answering question: {str(e)}")
+        return {'question': question, 'success': False, 'error': str(e)}
+
+
+def get_predefined_tip(severity_score: int, reason: str = "load shedding") -> Dict:
+    """Pain care tip without Gemini or retrieval: the predefined tip and the media already retrieved."""
+    if _enhanced_pain_rag_instance is not None:
+        rag_system = _enhanced_pain_rag_instance
+        return rag_system._degraded_response(
+            severity_score, rag_system.pain_care_manager.get_pain_care_tip(severity_score), reason)
+    # Loading the RAG system is exactly the work being shed
+    logger.warning(f"Predefined pain care tip for severity {severity_score}: {reason}")
+    return degraded_result(severity_score, PainCaretipManager().get_pain_care_tip(severity_score), reason, [])
+
+
+def get_symptom_resource_stats() -> Dict:
+    """Loaded symptom resources of this worker; empty before the RAG system is created."""
+    if _enhanced_pain_rag_instance is None:
+        return {}
+    return _enhanced_pain_rag_instance.symptom_resources.stats()
+
+
 def get_refined_tip_with_rag(severity_score: int, symptom: str, user_id: str = "default") -> Dict:
     """Simplified convenience function"""
     try:
         load_dotenv()
         
         current_dir = Path(__file__).parent
-        chromadb_path = current_dir / "ChromaDB_Parkinson_Data"
+        chromadb_path = resolve_chromadb_path(current_dir / "ChromaDB_Parkinson_Data")
         google_api_key = os.getenv("GOOGLE_API_KEY")
         
         if not google_api_key:
             raise ValueError("GOOGLE_API_KEY environment variable not set")
         
         rag_system = get_enhanced_pain_rag_instance(str(chromadb_path), google_api_key)
-        return rag_system.get_refined_tip_with_rag(severity_score, symptom, user_id)
+        if not RAG_SINGLE_FLIGHT:
+            return rag_system.get_refined_tip_with_rag(severity_score, symptom, user_id)
+        # The result does not depend on user_id, so callers in a burst share it;
+        # the leader computes with the normalized key values every waiter asked for
+        key = coalescing_key(severity_score, symptom)
+        return _rag_single_flight.do(key, lambda: rag_system.get_refined_tip_with_rag(key[0], key[1], user_id))
         
     except Exception as e:
         logger.error(f"Error in convenience function: {str(e)}")
@@ -491,7 +903,7 @@ def debug_web_page_search():
             return
         
         # Initialize vector store
-        embedding_function = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+        embedding_function = make_embeddings("models/embedding-001")
         vector_store = Chroma(
             collection_name="parkinsons_complete_kb",
             embedding_function=embedding_function,
@@ -0,0 +1,208 @@
+# app/services/rag/resilience.py
+# Rate limiting and circuit breaking around the Gemini embedding and chat clients.
+#
+# Each client gets a client-side token bucket (calls beyond the configured
+# rate wait briefly, then are rejected instead of queueing into a quota error)
+# and a circuit breaker: after BREAKER_FAILURE_THRESHOLD consecutive failures
+# or slow calls the breaker opens and calls fail fast for
+# BREAKER_RECOVERY_SECONDS; then a single half-open probe call decides whether
+# it closes again. While a breaker is open, rag_service.py serves the degraded
+# answer (predefined tip + pre-retrieved media) immediately.
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_REQUESTS_PER_MINUTE = float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "600"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "120"))
+# Longest a call waits for a rate limiter token before it is rejected
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "1.0"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RECOVERY_SECONDS = float(os.getenv("BREAKER_RECOVERY_SECONDS", "30"))
+# Successful calls slower than this count as failures for the breaker
+SLOW_CALL_SECONDS = float(os.getenv("SLOW_CALL_SECONDS", "10"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class RateLimitedError(RuntimeError):
+    """Raised when no rate limiter token became available within the wait limit."""
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, self.rate * 5)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.rejected = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait: float = RATE_LIMIT_MAX_WAIT) -> bool:
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate if self.rate > 0 else max_wait
+                if now + wait > deadline:
+                    self.rejected += 1
+                    return False
+            time.sleep(wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            self._refill(time.monotonic())
+            return {"tokens": round(self.tokens, 2), "capacity": self.capacity,
+                    "per_minute": self.rate * 60, "rejected": self.rejected}
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 recovery_seconds: float = BREAKER_RECOVERY_SECONDS, slow_call_seconds: float = SLOW_CALL_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.last_error = ""
+        self.lock = threading.Lock()
+        self.rejected = 0
+
+    def _current_state(self) -> str:
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.recovery_seconds:
+            self.state = HALF_OPEN
+        return self.state
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected (open, or half-open with the probe taken)."""
+        with self.lock:
+            state = self._current_state()
+            return state == OPEN or (state == HALF_OPEN and self.probe_in_flight)
+
+    def before_call(self):
+        with self.lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self.probe_in_flight:
+                # Let exactly one probe through; everyone else keeps failing fast
+                self.probe_in_flight = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"{self.name} circuit open: {self.last_error}")
+
+    def record_success(self, seconds: float):
+        if seconds > self.slow_call_seconds:
+            self.record_failure(f"slow call ({seconds:.1f}s)")
+            return
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self, error: str):
+        with self.lock:
+            self.failures += 1
+            self.last_error = error[:200]
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Circuit {self.name} open after {self.failures} failures: {self.last_error}")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            state = self._current_state()
+            retry_in = max(0.0, self.recovery_seconds - (time.monotonic() - self.opened_at)) if state == OPEN else 0.0
+            return {"state": state, "consecutive_failures": self.failures, "rejected": self.rejected,
+                    "retry_in_seconds": round(retry_in, 1), "last_error": self.last_error}
+
+
+class Guard:
+    """A token bucket and a circuit breaker in front of one dependency."""
+
+    def __init__(self, name: str, per_minute: float):
+        self.name = name
+        self.bucket = TokenBucket(per_minute)
+        self.breaker = CircuitBreaker(name)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        self.breaker.before_call()
+        if not self.bucket.acquire():
+            # Not the dependency's fault: release a half-open probe without judging it
+            with self.breaker.lock:
+                self.breaker.probe_in_flight = False
+            raise RateLimitedError(f"{self.name} rate limit reached")
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.breaker.record_failure(f"{type(e).__name__}: {e}")
+            raise
+        self.breaker.record_success(time.perf_counter() - start)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.breaker.snapshot(), "rate_limiter": self.bucket.snapshot()}
+
+
+class GuardedEmbeddings(Embeddings):
+    """Embeddings wrapper that routes every call through a Guard."""
+
+    def __init__(self, embeddings: Embeddings, guard: Guard):
+        self.embeddings = embeddings
+        self.guard = guard
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.guard.call(self.embeddings.embed_query, text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.guard.call(self.embeddings.embed_documents, texts)
+
+
+class GuardedChatModel:
+    """Chat model wrapper exposing invoke() through a Guard."""
+
+    def __init__(self, llm, guard: Guard):
+        self.llm = llm
+        self.guard = guard
+
+    def invoke(self, *args, **kwargs):
+        return self.guard.call(self.llm.invoke, *args, **kwargs)
+
+
+# Per-process guards, shared by every RAG instance in the worker
+embedding_guard = Guard("gemini_embeddings", EMBEDDING_REQUESTS_PER_MINUTE)
+llm_guard = Guard("gemini_chat", LLM_REQUESTS_PER_MINUTE)
+
+
+def resilience_status() -> Dict[str, Any]:
+    guards = {guard.name: guard.snapshot() for guard in (embedding_guard, llm_guard)}
+    degraded = any(g["state"] == OPEN for g in guards.values())
+    return {"degraded": degraded, "breakers": guards}
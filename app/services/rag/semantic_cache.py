@@ -0,0 +1,167 @@
+# app/services/rag/semantic_cache.py
+# In-memory semantic cache of answers to free-text questions.
+#
+# Users ask the same things in different words ("what exercises help?",
+# "which exercises are good for the pain?"). A question is embedded and
+# compared with the questions already answered. If the closest one is at
+# least SEMANTIC_CACHE_THRESHOLD similar (cosine), its answer is served and
+# the retrieval and Gemini generation are skipped. A repeat of the exact same
+# normalized text is served without the embedding call.
+#
+# The index is a preallocated (SEMANTIC_CACHE_MAX_ENTRIES x dim) matrix of
+# unit vectors, so a lookup is one matrix-vector product. Entries expire after
+# SEMANTIC_CACHE_TTL_SECONDS. When the cache is full, an expired entry is
+# reused first, else the least recently used one.
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Lower-case, punctuation dropped, whitespace collapsed."""
+    return _SPACE_RE.sub(" ", _NON_WORD_RE.sub(" ", (text or "").lower())).strip()
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # Allocated on the first put, once the embedding dimension is known
+        self._vectors: Optional[np.ndarray] = None
+        self._expires = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._namespaces = [None] * max_entries
+        # Namespace of each slot as a small int, for the vectorized lookup mask
+        self._namespace_codes = np.full(max_entries, -1, dtype=np.int32)
+        self._namespace_ids: Dict[str, int] = {}
+        self._questions = [None] * max_entries
+        self._answers = [None] * max_entries
+        # (namespace, normalized question) -> slot
+        self._exact: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _live(self, slot: int, now: float) -> bool:
+        return self._answers[slot] is not None and self._expires[slot] > now
+
+    def _release(self, slot: int):
+        key = (self._namespaces[slot], self._questions[slot])
+        if self._exact.get(key) == slot:
+            del self._exact[key]
+        self._namespaces[slot] = self._questions[slot] = self._answers[slot] = None
+        self._namespace_codes[slot] = -1
+        self._expires[slot] = 0
+
+    def _hit(self, slot: int, now: float, similarity: float) -> Dict[str, Any]:
+        self._last_used[slot] = now
+        return {"answer": self._answers[slot], "question": self._questions[slot], "similarity": similarity}
+
+    def get_exact(self, namespace: str, question: str) -> Optional[Dict[str, Any]]:
+        """Cached answer for the same normalized question, without embedding it."""
+        now = time.time()
+        with self._lock:
+            slot = self._exact.get((namespace, normalize_question(question)))
+            if slot is None:
+                return None
+            if not self._live(slot, now):
+                self._release(slot)
+                self.expired += 1
+                return None
+            self.lookups += 1
+            self.exact_hits += 1
+            return self._hit(slot, now, 1.0)
+
+    def get(self, namespace: str, vector) -> Optional[Dict[str, Any]]:
+        """Cached answer of the most similar live question in the namespace, if similar enough."""
+        now = time.time()
+        query = self._unit(vector)
+        with self._lock:
+            self.lookups += 1
+            code = self._namespace_ids.get(namespace)
+            if self._vectors is None or code is None:
+                return None
+            live = (self._expires > now) & (self._namespace_codes == code)
+            if not live.any():
+                return None
+            similarities = np.where(live, self._vectors @ query, -np.inf)
+            slot = int(np.argmax(similarities))
+            if similarities[slot] < self.threshold:
+                return None
+            self.semantic_hits += 1
+            return self._hit(slot, now, round(float(similarities[slot]), 4))
+
+    def put(self, namespace: str, question: str, vector, answer: Any):
+        now = time.time()
+        vector = self._unit(vector)
+        key = (namespace, normalize_question(question))
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            slot = self._exact.get(key)
+            if slot is None:
+                free = np.flatnonzero(self._expires <= now)
+                if len(free):
+                    slot = int(free[0])
+                    if self._answers[slot] is not None:
+                        self.expired += 1
+                else:
+                    slot = int(np.argmin(self._last_used))
+                    self.evictions += 1
+                if self._answers[slot] is not None:
+                    self._release(slot)
+            self._vectors[slot] = vector
+            self._expires[slot] = now + self.ttl_seconds
+            self._last_used[slot] = now
+            self._namespaces[slot], self._questions[slot], self._answers[slot] = namespace, key[1], answer
+            self._namespace_codes[slot] = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+            self._exact[key] = slot
+
+    def clear(self):
+        with self._lock:
+            for slot in range(self.max_entries):
+                self._release(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "entries": int((self._expires > time.time()).sum()),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "lookups": self.lookups,
+                "hits": hits,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "hit_rate": round(hits / self.lookups, 3) if self.lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,72 @@
+# app/services/rag/single_flight.py
+# Request coalescing for identical in-flight computations.
+#
+# When many users at the same severity submit within a few seconds, each
+# run_rag_async thread would run the same retrieval and nearly the same
+# Gemini prompt. SingleFlight lets the first caller for a key run the
+# computation while concurrent callers with the same key wait for it and
+# share its result; an exception raised by the computation is re-raised in
+# every waiter. Nothing is cached once the computation finishes.
+
+import copy
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Runs fn() unless a call with the same key is already in flight, in which
+        case waits for that call. Every caller gets its own deep copy of the result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            if call.waiters:
+                logger.info(f"Single-flight {key}: shared with {call.waiters} waiting callers")
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"executions": self.executions, "coalesced": self.coalesced, "in_flight": in_flight}
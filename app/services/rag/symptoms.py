@@ -0,0 +1,367 @@
+# app/services/rag/symptoms.py
+# Per-symptom query sets, care tips and retrieval indexes for the non-pain
+# symptoms of symptom_config.py (light-headedness, unusual sweating, skin
+# changes).
+#
+# Each symptom has:
+#   - predefined care tips per severity band (SymptomCareTipManager, the
+#     counterpart of PainCaretipManager);
+#   - severity-specific retrieval queries;
+#   - optionally its own NumPy index: the knowledge-base chunks mentioning the
+#     symptom, exported by `python -m app.services.rag.symptoms --build` to
+#     ChromaDB_Parkinson_Data/symptom_indexes/<symptom>/. Without one, the
+#     symptom's queries run against the shared store.
+# Nothing is loaded at startup. A symptom's resources are built on first use
+# and kept in an LRU whose total index size stays within
+# SYMPTOM_INDEX_MEMORY_MB, so more symptoms cost neither startup time nor
+# resident memory beyond the budget.
+#
+#   python -m app.services.rag.symptoms --build
+#   python -m app.services.rag.symptoms --build --numpy-index /tmp/kb/numpy_index --output /tmp/kb/symptom_indexes
+
+import argparse
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SYMPTOM_INDEX_MEMORY_MB = float(os.getenv("SYMPTOM_INDEX_MEMORY_MB", "256"))
+SYMPTOM_INDEX_DIR = "symptom_indexes"
+
+
+@dataclass(frozen=True)
+class SymptomProfile:
+    name: str
+    display_name: str
+    # Lower-case substrings marking a knowledge-base chunk as about the symptom
+    keywords: tuple
+    severity_queries: Dict[int, List[str]]
+    care_tips: Dict[str, Dict[str, Any]]
+
+
+SYMPTOM_PROFILES: Dict[str, SymptomProfile] = {
+    "light_headedness": SymptomProfile(
+        name="light_headedness",
+        display_name="light-headedness",
+        keywords=("dizz", "light-headed", "lightheaded", "orthostatic", "blood pressure", "faint"),
+        severity_queries={
+            1: ["standing up slowly", "hydration", "orthostatic hypotension"],
+            2: ["hydration", "standing up slowly", "orthostatic hypotension"],
+            3: ["dizziness", "low blood pressure", "light-headedness"],
+            4: ["blood pressure monitoring", "dizziness tracking", "falls"],
+            5: ["fainting", "orthostatic hypotension treatment", "healthcare team"],
+        },
+        care_tips={
+            "educational": {
+                "rating_range": [1, 2],
+                "tip": "Stand up slowly and in stages: sit on the edge of the bed or chair for a moment before getting up.\n\nDrinking enough water through the day also helps keep your blood pressure steady.",
+                "tone": "gentle_encouragement",
+                "focus": "maintenance_and_prevention"
+            },
+            "basic_care": {
+                "rating_range": [3],
+                "tip": "When you feel light-headed, sit or lie down right away until it passes.\n\nDrink a glass of water, and be careful with hot showers and large meals, which can make dizziness worse.",
+                "tone": "practical_supportive",
+                "focus": "immediate_relief_strategies"
+            },
+            "advanced_care": {
+                "rating_range": [4],
+                "tip": "Keep a log of when you feel light-headed: the time of day, what you were doing and when you last took your medication.\n\nSharing this with your healthcare providers helps them check whether your blood pressure or medication needs attention.",
+                "tone": "solution_focused",
+                "focus": "tracking_and_healthcare_collaboration"
+            },
+            "escalation": {
+                "rating_range": [5],
+                "tip": "I recommend you speak to your doctor or your nurse about your light-headedness, especially if you have fainted or fallen.\n\nThey can check your blood pressure and find what is causing it.",
+                "tone": "calm_professional",
+                "focus": "healthcare_provider_consultation"
+            }
+        },
+    ),
+    "unusual_sweating": SymptomProfile(
+        name="unusual_sweating",
+        display_name="unusual sweating",
+        keywords=("sweat", "hyperhidrosis", "perspir", "thermoregulat"),
+        severity_queries={
+            1: ["sweating", "staying cool", "hydration"],
+            2: ["sweating", "hydration", "staying cool"],
+            3: ["excessive sweating", "hyperhidrosis", "autonomic symptoms"],
+            4: ["sweating off periods", "medication timing", "autonomic dysfunction"],
+            5: ["sweating", "healthcare team", "autonomic dysfunction treatment"],
+        },
+        care_tips={
+            "educational": {
+                "rating_range": [1, 2],
+                "tip": "Dressing in light, breathable layers and keeping your room cool can make sweating easier to manage.\n\nDrink water regularly to replace the fluid you lose.",
+                "tone": "gentle_encouragement",
+                "focus": "maintenance_and_prevention"
+            },
+            "basic_care": {
+                "rating_range": [3],
+                "tip": "Keep a change of clothes and a small towel handy, and use breathable cotton bedding at night.\n\nStaying hydrated is important when you sweat a lot.",
+                "tone": "practical_supportive",
+                "focus": "immediate_relief_strategies"
+            },
+            "advanced_care": {
+                "rating_range": [4],
+                "tip": "Note when heavy sweating happens and how it lines up with your medication times and 'off' periods.\n\nSharing this pattern with your healthcare providers can help them adjust your treatment.",
+                "tone": "solution_focused",
+                "focus": "tracking_and_healthcare_collaboration"
+            },
+            "escalation": {
+                "rating_range": [5],
+                "tip": "I recommend you speak to your doctor or your nurse about your sweating.\n\nThey can check whether your medication timing or dose needs to change.",
+                "tone": "calm_professional",
+                "focus": "healthcare_provider_consultation"
+            }
+        },
+    ),
+    "skin_changes": SymptomProfile(
+        name="skin_changes",
+        display_name="skin changes",
+        keywords=("skin", "seborrh", "dermatitis", "melanoma", "rash"),
+        severity_queries={
+            1: ["skin care", "dry skin", "moisturizing"],
+            2: ["dry skin", "skin care", "moisturizing"],
+            3: ["seborrheic dermatitis", "skin changes", "itchy skin"],
+            4: ["skin changes tracking", "dermatologist", "melanoma screening"],
+            5: ["skin changes", "dermatologist", "healthcare team"],
+        },
+        care_tips={
+            "educational": {
+                "rating_range": [1, 2],
+                "tip": "Gentle daily skin care helps: use a mild, fragrance-free cleanser and moisturize after bathing.",
+                "tone": "gentle_encouragement",
+                "focus": "maintenance_and_prevention"
+            },
+            "basic_care": {
+                "rating_range": [3],
+                "tip": "For dry or flaky skin, moisturize twice a day and avoid hot water and harsh soaps.\n\nGentle, fragrance-free products are less likely to irritate your skin.",
+                "tone": "practical_supportive",
+                "focus": "immediate_relief_strategies"
+            },
+            "advanced_care": {
+                "rating_range": [4],
+                "tip": "Take photos or notes of rashes or flaking so you can see how they change over time.\n\nSharing them with your healthcare providers or a dermatologist helps them choose the right treatment.",
+                "tone": "solution_focused",
+                "focus": "tracking_and_healthcare_collaboration"
+            },
+            "escalation": {
+                "rating_range": [5],
+                "tip": "I recommend you speak to your doctor or your nurse about your skin changes, especially if a rash is spreading or painful, or a mole looks different.\n\nThey can refer you to a dermatologist.",
+                "tone": "calm_professional",
+                "focus": "healthcare_provider_consultation"
+            }
+        },
+    ),
+}
+
+
+def normalize_symptom(symptom: str) -> str:
+    """'light-headedness', 'Light headedness' and 'light_headedness' all name the same profile."""
+    return (symptom or "").strip().lower().replace("-", "_").replace(" ", "_")
+
+
+def get_symptom_profile(symptom: str) -> Optional[SymptomProfile]:
+    return SYMPTOM_PROFILES.get(normalize_symptom(symptom))
+
+
+class SymptomCareTipManager:
+    """PainCaretipManager for any symptom profile."""
+
+    def __init__(self, profile: SymptomProfile):
+        self.profile = profile
+
+    def get_care_tip(self, rating: int) -> Dict:
+        for care_level, care_data in self.profile.care_tips.items():
+            if rating in care_data["rating_range"]:
+                return {
+                    "symptom": self.profile.display_name,
+                    "rating": rating,
+                    "care_level": care_level,
+                    "tip": care_data["tip"],
+                    "tone": care_data["tone"],
+                    "focus": care_data["focus"],
+                    "source": f"predefined_{care_level}",
+                    "escalation_needed": (care_level == "escalation")
+                }
+
+        return {
+            "symptom": self.profile.display_name,
+            "rating": rating,
+            "care_level": "general",
+            "tip": f"For a {self.profile.display_name} severity rating of {rating}, please monitor your symptoms and consult with your healthcare provider for personalized advice.",
+            "tone": "calm_professional",
+            "focus": "general_monitoring",
+            "source": "fallback",
+            "escalation_needed": (rating == 5)
+        }
+
+
+@dataclass
+class SymptomResources:
+    """What one symptom needs to answer: tips, a retriever over its index, its media cache."""
+    profile: SymptomProfile
+    care_manager: SymptomCareTipManager
+    retriever: Any
+    # Bytes counted against SYMPTOM_INDEX_MEMORY_MB; 0 when the shared store is reused
+    memory_bytes: int = 0
+    dedicated_index: bool = False
+    media_by_severity: Dict[int, List[Dict]] = field(default_factory=dict)
+
+
+def index_bytes(path: Path) -> int:
+    """Size of an index directory's files: the most its memory-mapped pages can occupy."""
+    return sum(f.stat().st_size for f in Path(path).iterdir() if f.is_file())
+
+
+class LazyResourceCache:
+    """
+    Resources built by loader(name) on first use and evicted least recently
+    used once their total memory_bytes exceed budget_bytes. The resource just
+    loaded is never evicted, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, loader: Callable[[str], Any], budget_bytes: float):
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self._resources: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.load_seconds: Dict[str, float] = {}
+
+    def get(self, name: str):
+        with self._lock:
+            resource = self._resources.get(name)
+            if resource is not None:
+                self._resources.move_to_end(name)
+                self.hits += 1
+                return resource
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # One load per name at a time; other names load in parallel
+        with load_lock:
+            with self._lock:
+                resource = self._resources.get(name)
+                if resource is not None:
+                    self._resources.move_to_end(name)
+                    self.hits += 1
+                    return resource
+            start = time.perf_counter()
+            resource = self.loader(name)
+            with self._lock:
+                self.loads += 1
+                self.load_seconds[name] = round(time.perf_counter() - start, 3)
+                self._resources[name] = resource
+                self._evict(keep=name)
+            return resource
+
+    def _evict(self, keep: str):
+        while self.memory_bytes() > self.budget_bytes and len(self._resources) > 1:
+            name = next(iter(self._resources))
+            if name == keep:
+                break
+            del self._resources[name]
+            self.evictions += 1
+            logger.info(f"Evicted symptom resources '{name}' (budget {self.budget_bytes / 2**20:.0f} MB)")
+
+    def memory_bytes(self) -> int:
+        return sum(getattr(r, "memory_bytes", 0) for r in self._resources.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": list(self._resources),
+                "memory_mb": round(self.memory_bytes() / 2**20, 2),
+                "budget_mb": round(self.budget_bytes / 2**20, 2),
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "load_seconds": dict(self.load_seconds),
+            }
+
+
+def symptom_rows(index, profile: SymptomProfile) -> np.ndarray:
+    """Rows of a NumpyIndex whose text or title mentions one of the profile's keywords."""
+    title_col = index.column_codes("title")
+    titles = [t.lower() for t in index.column_values.get("title", [])]
+    rows = []
+    for row in range(len(index)):
+        text = index.document(row).lower()
+        if title_col is not None and title_col[row] >= 0:
+            text += " " + titles[title_col[row]]
+        if any(keyword in text for keyword in profile.keywords):
+            rows.append(row)
+    return np.array(rows, dtype=np.int64)
+
+
+def build_symptom_indexes(numpy_index_path: Path, output_dir: Path) -> Dict[str, int]:
+    """Writes one NumPy index per symptom profile with the chunks that mention it."""
+    from .export_index import write_numpy_index
+    from .numpy_store import NumpyIndex
+
+    index = NumpyIndex(numpy_index_path)
+    counts = {}
+    for profile in SYMPTOM_PROFILES.values():
+        rows = symptom_rows(index, profile)
+        counts[profile.name] = len(rows)
+        if not len(rows):
+            # Nothing specific to index: the symptom searches the shared store
+            shutil.rmtree(output_dir / profile.name, ignore_errors=True)
+            logger.warning(f"No chunks mention {profile.display_name}; it will use the shared store")
+            continue
+        data = {
+            "ids": [index.ids[r] for r in rows],
+            "embeddings": np.asarray(index.embeddings[rows], dtype=np.float32),
+            "documents": [index.document(r) for r in rows],
+            "metadatas": [index.metadata(r) for r in rows],
+        }
+        write_numpy_index(data, output_dir / profile.name, dtype=index.manifest.get("dtype", "float32"),
+                          source=f"{numpy_index_path} ({profile.name})")
+        logger.info(f"Symptom index {profile.name}: {len(rows)} of {len(index)} chunks")
+    return counts
+
+
+def main():
+    from .index_versions import resolve_chromadb_path
+    from .numpy_store import DEFAULT_NUMPY_INDEX_PATH
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build the per-symptom NumPy indexes")
+    parser.add_argument("--build", action="store_true", help="Export one index per symptom")
+    parser.add_argument("--numpy-index", help="Source NumPy index (default: the exported knowledge base index)")
+    parser.add_argument("--output", help=f"Output directory (default: <knowledge base>/{SYMPTOM_INDEX_DIR})")
+    args = parser.parse_args()
+
+    base_path = resolve_chromadb_path(DEFAULT_NUMPY_INDEX_PATH.parent)
+    source = Path(args.numpy_index) if args.numpy_index else base_path / "numpy_index"
+    output = Path(args.output) if args.output else base_path / SYMPTOM_INDEX_DIR
+    if not args.build:
+        for profile in SYMPTOM_PROFILES.values():
+            path = output / profile.name
+            size = f"{index_bytes(path) / 2**20:.1f} MB" if path.exists() else "not built (shared store)"
+            print(f"   {profile.name:>18}: {size}")
+        return
+
+    start = time.perf_counter()
+    counts = build_symptom_indexes(source, output)
+    print(f"✅ Symptom indexes written to {output} in {time.perf_counter() - start:.1f}s")
+    for name, count in counts.items():
+        size = f"{index_bytes(output / name) / 2**20:.1f} MB" if count else "shared store"
+        print(f"   {name:>18}: {count} chunks, {size}")
+
+
+if __name__ == "__main__":
+    main()
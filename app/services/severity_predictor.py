@@ -1,13 +1,102 @@
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
 import joblib
 import pandas as pd
 from app.services.utils import to_severity_score
 
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.join(BASE_DIR, "models", "classification_model.pkl"))
+# Artifact directory written by app.tools.train_classifier (<version>/ + CURRENT).
+# When set, the active version is the one CURRENT names (or the newest one);
+# otherwise MODEL_PATH itself is watched for changes.
+MODEL_RELOAD_DIR = os.getenv("MODEL_RELOAD_DIR", "")
+# Seconds between checks for a new model; 0 disables the watcher
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "0"))
+# Labelled rows a new model must predict before it is swapped in
+MODEL_SMOKE_DATA = os.getenv("MODEL_SMOKE_DATA", os.path.join(BASE_DIR, "data", "synthetic_users_dataset_2000.csv"))
+MODEL_SMOKE_ROWS = int(os.getenv("MODEL_SMOKE_ROWS", "200"))
+MODEL_SMOKE_MIN_ACCURACY = float(os.getenv("MODEL_SMOKE_MIN_ACCURACY", "0.6"))
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+MODEL_FILENAME = "classification_model.pkl"
+
+
+class ModelValidationError(RuntimeError):
+    """Raised when a candidate model fails the smoke test and is not swapped in."""
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    model: object
+    version: str
+    path: str
+    fingerprint: tuple
+    sha256: str
+    loaded_at: float
+    load_seconds: float
+    smoke_accuracy: Optional[float] = None
+    manifest: Dict = field(default_factory=dict)
+
+
+def _file_fingerprint(path: str) -> tuple:
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 class SeverityPredictor:
-    def __init__(self):
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        model_path = os.path.join(base_dir, "models", "classification_model.pkl")
-        self.model = joblib.load(model_path)
+    def __init__(self, model_path: str = MODEL_PATH, reload_dir: str = MODEL_RELOAD_DIR):
+        self.model_path = model_path
+        self.reload_dir = reload_dir
+        # Serializes loads; predictions never take it
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._smoke_set = None
+        self.checks = 0
+        self.swaps = 0
+        self.last_error = ""
+        self.last_rejected_version = None
+        self._rejected_fingerprint = None
+        # The bundled MODEL_PATH model is trusted as before. An artifact from
+        # reload_dir gets the hot-reload smoke test, so one the watcher
+        # rejected is not served unvalidated after a restart.
+        candidate = None
+        try:
+            candidate = self._candidate()
+            self._active = self._load(candidate, validate=candidate["version"] is not None)
+        except Exception as e:
+            if not reload_dir:
+                raise
+            logger.warning(f"Model artifact in {reload_dir} not usable ({e}); using {model_path}")
+            self.last_error = f"{type(e).__name__}: {e}"
+            if candidate:
+                self.last_rejected_version = candidate["version"]
+                try:
+                    # Like a rejected hot reload: not retried until the file changes
+                    self._rejected_fingerprint = _file_fingerprint(candidate["path"])
+                except OSError:
+                    pass
+            self._active = self._load({"version": None, "path": model_path, "manifest": {}}, validate=False)
+
+    @property
+    def model(self):
+        return self._active.model
 
     def predict(self, input_features: dict) -> int:
         """
@@ -30,8 +119,147 @@ class SeverityPredictor:
             int: The predicted severity score (1 to 5).
         """
         df = pd.DataFrame([input_features])
-        return to_severity_score(int(self.model.predict(df)[0]))
+        # One read of the reference: a swap mid-request can't mix two models
+        model = self._active.model
+        return to_severity_score(int(model.predict(df)[0]))
+
+    def _candidate(self) -> Dict:
+        """Where the model should come from right now: version, file and manifest."""
+        if not self.reload_dir:
+            return {"version": None, "path": self.model_path, "manifest": {}}
+
+        versions = sorted(
+            name for name in os.listdir(self.reload_dir)
+            if os.path.isfile(os.path.join(self.reload_dir, name, MANIFEST_FILE))
+        )
+        current_path = os.path.join(self.reload_dir, CURRENT_FILE)
+        version = None
+        if os.path.isfile(current_path):
+            with open(current_path, encoding="utf-8") as f:
+                version = f.read().strip() or None
+        version = version or (versions[-1] if versions else None)
+        if version is None:
+            # Nothing trained yet: keep serving the bundled model
+            return {"version": None, "path": self.model_path, "manifest": {}}
+
+        with open(os.path.join(self.reload_dir, version, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        path = os.path.join(self.reload_dir, version, manifest.get("model_file", MODEL_FILENAME))
+        return {"version": version, "path": path, "manifest": manifest}
+
+    def _load(self, candidate: Dict, validate: bool = True) -> LoadedModel:
+        start = time.perf_counter()
+        path = candidate["path"]
+        fingerprint = _file_fingerprint(path)
+        sha256 = _sha256(path)
+        expected = candidate["manifest"].get("model_sha256")
+        if expected and expected != sha256:
+            raise ModelValidationError(f"{path} does not match the manifest checksum (partial copy?)")
+        model = joblib.load(path)
+        smoke_accuracy = self._smoke_test(model) if validate else None
+        return LoadedModel(
+            model=model,
+            version=candidate["version"] or f"file-{sha256[:12]}",
+            path=path,
+            fingerprint=fingerprint,
+            sha256=sha256,
+            loaded_at=time.time(),
+            load_seconds=time.perf_counter() - start,
+            smoke_accuracy=smoke_accuracy,
+            manifest=candidate["manifest"],
+        )
+
+    def _smoke_test(self, model) -> float:
+        if self._smoke_set is None:
+            df = pd.read_csv(MODEL_SMOKE_DATA)
+            df = df.sample(min(MODEL_SMOKE_ROWS, len(df)), random_state=0)
+            self._smoke_set = (df.drop(columns=["severity_score", "severity_class"]), df["severity_score"].to_numpy())
+        X, y = self._smoke_set
+        try:
+            predicted = [to_severity_score(int(p)) for p in model.predict(X)]
+            # The single-row call the webhook makes
+            to_severity_score(int(model.predict(X.iloc[:1])[0]))
+        except Exception as e:
+            raise ModelValidationError(f"smoke prediction failed: {type(e).__name__}: {e}")
+        if any(p < 1 or p > 5 for p in predicted):
+            raise ModelValidationError("smoke predictions outside severity 1-5")
+        accuracy = float((pd.Series(predicted) == y).mean())
+        if accuracy < MODEL_SMOKE_MIN_ACCURACY:
+            raise ModelValidationError(f"smoke accuracy {accuracy:.3f} below {MODEL_SMOKE_MIN_ACCURACY}")
+        return accuracy
+
+    def check_for_update(self, force: bool = False) -> bool:
+        """
+        Loads, validates and swaps in a new model if its source changed.
+        Returns True when a new model was swapped in.
+        """
+        with self._reload_lock:
+            self.checks += 1
+            candidate = fingerprint = None
+            try:
+                candidate = self._candidate()
+                fingerprint = _file_fingerprint(candidate["path"])
+                # A rejected file is retried only once it changes again
+                if not force and fingerprint in (self._active.fingerprint, self._rejected_fingerprint):
+                    return False
+                self.last_error = ""
+                loaded = self._load(candidate)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.last_rejected_version = candidate["version"] if candidate else None
+                self._rejected_fingerprint = fingerprint
+                logger.warning(f"Severity model not reloaded: {self.last_error}")
+                return False
+
+            previous = self._active.version
+            # Atomic reference swap; in-flight predictions finish on the old model
+            self._active = loaded
+            self.swaps += 1
+            self.last_error = ""
+            self.last_rejected_version = None
+            self._rejected_fingerprint = None
+            logger.info(f"Severity model swapped: {previous} -> {loaded.version} "
+                        f"(smoke accuracy {loaded.smoke_accuracy:.3f}, loaded in {loaded.load_seconds:.2f}s)")
+            return True
+
+    def start_watcher(self, interval: float = MODEL_RELOAD_INTERVAL):
+        # Started per worker (after the fork); a no-op when disabled or already running
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                self.check_for_update()
+
+        self._watcher = threading.Thread(target=watch, daemon=True, name="severity-model-watcher")
+        self._watcher.start()
+        logger.info(f"Watching {self.reload_dir or self.model_path} for new severity models every {interval}s")
 
+    def status(self) -> Dict:
+        active = self._active
+        return {
+            "version": active.version,
+            "path": active.path,
+            "sha256": active.sha256,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(active.loaded_at)),
+            "load_seconds": round(active.load_seconds, 3),
+            "smoke_accuracy": active.smoke_accuracy,
+            "model": type(getattr(active.model, "steps", [[None, active.model]])[-1][1]).__name__,
+            "manifest_selected": active.manifest.get("selected", {}),
+            "watching": self.reload_dir or self.model_path,
+            "reload_interval_seconds": MODEL_RELOAD_INTERVAL if self._watcher is not None else 0,
+            "checks": self.checks,
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+            "last_rejected_version": self.last_rejected_version,
+        }
 
 
+_severity_predictor_instance = None
 
+def get_severity_predictor() -> SeverityPredictor:
+    global _severity_predictor_instance
+    if _severity_predictor_instance is None:
+        _severity_predictor_instance = SeverityPredictor()
+    return _severity_predictor_instance
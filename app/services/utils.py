@@ -1,42 +1,98 @@
 import os
 import json
+import time
 import logging
+import tempfile
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Marker written by the submit handler so that any worker can tell a care tip
+# that is still being generated apart from one that was never requested.
+CARE_TIP_PENDING_KEY = "care_tip_status"
+CARE_TIP_PENDING = "pending"
+
 
 def to_severity_score(predicted_label: int) -> int:
     return int(predicted_label) + 1
 
-def save_refined_care_tip(session_id: str, uuid: str, response) -> None:
-    # Save to file
-    try:
+def get_care_tip_cache_dir() -> str:
+    # CARE_TIP_CACHE_DIR lets every worker (or instance, via a shared mount)
+    # read care tips written by whichever worker ran the RAG thread.
+    cache_dir = os.getenv("CARE_TIP_CACHE_DIR")
+    if not cache_dir:
         current_dir = os.path.dirname(os.path.abspath(__file__))
         cache_dir = os.path.join(current_dir, "care_tip_cache")
-        os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def _care_tip_cache_path(session_id: str, uuid: str) -> str:
+    return os.path.join(get_care_tip_cache_dir(), f"{session_id}-{uuid}.json")
+
+def write_json_atomic(path: str, data) -> None:
+    # Write to a temp file in the same directory and rename it into place, so a
+    # reader in another worker never sees a half-written file.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def mark_care_tip_pending(session_id: str, uuid: str, severity_score: Optional[int] = None) -> None:
+    try:
+        cache_path = _care_tip_cache_path(session_id, uuid)
+        marker = {CARE_TIP_PENDING_KEY: CARE_TIP_PENDING, "time": int(time.time())}
+        # Lets an overloaded "yes" turn serve the predefined tip instead of waiting
+        if severity_score is not None:
+            marker["severity_score"] = severity_score
+        write_json_atomic(cache_path, marker)
+    except Exception as file_err:
+        logger.warning(f"Failed to mark care tip as pending: {file_err}")
+
+def is_care_tip_pending(care_tip) -> bool:
+    return isinstance(care_tip, dict) and care_tip.get(CARE_TIP_PENDING_KEY) == CARE_TIP_PENDING
 
-        cache_path = os.path.join(cache_dir, f"{session_id}-{uuid}.json")
-        with open(cache_path, "w", encoding="utf-8") as f:
-            json.dump(response, f, ensure_ascii=False, indent=2)
+def save_refined_care_tip(session_id: str, uuid: str, response) -> None:
+    # Save to file
+    try:
+        cache_path = _care_tip_cache_path(session_id, uuid)
+        write_json_atomic(cache_path, response)
 
         logger.info(f"Saved RAG care tip to {cache_path}")
     except Exception as file_err:
         logger.warning(f"Failed to save care tip to file: {file_err}")
 
-def read_refined_care_tip(session_id: str, uuid: str):
+def read_refined_care_tip(session_id: str, uuid: str, wait_seconds: float = 0.0, poll_interval: float = 0.25):
+    """
+    Reads the care tip saved for a session. While the tip is still marked as
+    pending, polls for up to `wait_seconds` before returning the pending marker.
+    """
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        cache_dir = os.path.join(current_dir, "care_tip_cache")
-        cache_path = os.path.join(cache_dir, f"{session_id}-{uuid}.json")
+        cache_path = _care_tip_cache_path(session_id, uuid)
+        deadline = time.monotonic() + wait_seconds
 
-        if not os.path.exists(cache_path):
-            logger.warning(f"No care tip file found for session: {session_id}")
-            return None
+        while True:
+            if os.path.exists(cache_path):
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    care_tip = json.load(f)
+                if not is_care_tip_pending(care_tip):
+                    logger.info(f"Loaded care tip from {cache_path}")
+                    return care_tip
+            else:
+                care_tip = None
 
-        with open(cache_path, "r", encoding="utf-8") as f:
-            care_tip = json.load(f)
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(poll_interval)
 
-        logger.info(f"Loaded care tip from {cache_path}")
+        if care_tip is None:
+            logger.warning(f"No care tip file found for session: {session_id}")
+        else:
+            logger.info(f"Care tip still pending for session: {session_id}")
         return care_tip
 
     except Exception as file_err:
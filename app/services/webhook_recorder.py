@@ -0,0 +1,223 @@
+# app/services/webhook_recorder.py
+# Opt-in recorder of /webhook traffic for replay (app/tools/replay_traffic.py).
+#
+# Enabled by setting WEBHOOK_RECORD_PATH, e.g. "traffic/webhook-{pid}.jsonl.gz"
+# ({pid} keeps gunicorn workers in separate files; a .gz suffix compresses).
+# Each request is written as one JSON line with its arrival time, latency,
+# status, redacted request body and redacted response. Redaction:
+#   - session ids are replaced by a salted hash (stable within a recording, so
+#     a conversation's turns stay linked and ordered). The salt is
+#     WEBHOOK_RECORD_SALT; without it, the first process generates one and
+#     keeps it next to the recordings, where every worker on the host reads it.
+#     Instances that do not share that directory need the explicit salt;
+#   - free text (queryText, "*.original" parameters, originalDetectIntentRequest)
+#     is dropped; structured parameters and intent names are kept for replay.
+# Lines are handed to a background writer thread, so a slow disk never delays
+# the webhook response, and are dropped (and counted) if the queue is full.
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_RECORD_PATH = os.getenv("WEBHOOK_RECORD_PATH", "")
+# Share of requests recorded (1.0 = all)
+WEBHOOK_RECORD_SAMPLE = float(os.getenv("WEBHOOK_RECORD_SAMPLE", "1.0"))
+# Salt for the session hashes; the same for every process writing a recording
+WEBHOOK_RECORD_SALT = os.getenv("WEBHOOK_RECORD_SALT", "")
+RECORD_SALT_FILE = ".webhook_record_salt"
+RECORD_QUEUE_SIZE = 10000
+RECORDED_PATHS = ("/webhook",)
+
+_SESSION_RE = re.compile(r"(/sessions/)([^/\"]+)")
+REDACTED = "<redacted>"
+
+
+def record_salt(path_template: str) -> str:
+    """WEBHOOK_RECORD_SALT, else the salt generated once and kept next to the recordings."""
+    if WEBHOOK_RECORD_SALT:
+        return WEBHOOK_RECORD_SALT
+    directory = os.path.dirname(os.path.abspath(path_template))
+    os.makedirs(directory, exist_ok=True)
+    salt_path = os.path.join(directory, RECORD_SALT_FILE)
+    if not os.path.exists(salt_path):
+        # Written in full, then linked into place: of workers starting together
+        # one link wins and the others read its salt
+        tmp_path = f"{salt_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(os.urandom(16).hex())
+        try:
+            os.link(tmp_path, salt_path)
+            logger.warning(f"WEBHOOK_RECORD_SALT is not set; generated a salt in {salt_path}. "
+                           f"Set WEBHOOK_RECORD_SALT to link sessions across instances")
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(salt_path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def hash_session(session_id: str, salt: str = WEBHOOK_RECORD_SALT) -> str:
+    return "rec-" + hashlib.sha256(f"{salt}:{session_id}".encode("utf-8")).hexdigest()[:24]
+
+
+def _redact_sessions(value: Any, salt: str) -> Any:
+    if isinstance(value, str):
+        return _SESSION_RE.sub(lambda m: m.group(1) + hash_session(m.group(2), salt), value)
+    if isinstance(value, list):
+        return [_redact_sessions(v, salt) for v in value]
+    if isinstance(value, dict):
+        return {k: _redact_sessions(v, salt) for k, v in value.items()}
+    return value
+
+
+def _drop_original_parameters(parameters: Dict) -> Dict:
+    return {k: v for k, v in (parameters or {}).items() if not k.endswith(".original")}
+
+
+def redact_request(body: Dict, salt: str = WEBHOOK_RECORD_SALT) -> Dict:
+    """Dialogflow request without free text and with hashed session ids."""
+    body = {k: v for k, v in body.items() if k not in ("originalDetectIntentRequest", "responseId")}
+    query_result = dict(body.get("queryResult", {}))
+    if "queryText" in query_result:
+        query_result["queryText"] = REDACTED
+    query_result.pop("fulfillmentText", None)
+    query_result.pop("fulfillmentMessages", None)
+    query_result["parameters"] = _drop_original_parameters(query_result.get("parameters"))
+    query_result["outputContexts"] = [
+        {**context, "parameters": _drop_original_parameters(context.get("parameters"))}
+        if "parameters" in context else context
+        for context in query_result.get("outputContexts", [])
+    ]
+    body["queryResult"] = query_result
+    return _redact_sessions(body, salt)
+
+
+def redact_response(body: Dict, salt: str = WEBHOOK_RECORD_SALT) -> Dict:
+    # Responses are generated text and contexts; only the session paths identify a user
+    return _redact_sessions(body, salt)
+
+
+class _Writer:
+    def __init__(self, path_template: str):
+        self.path = path_template.replace("{pid}", str(os.getpid()))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=RECORD_QUEUE_SIZE)
+        self.written = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, daemon=True, name="webhook-recorder")
+        self.thread.start()
+        logger.info(f"Recording webhook traffic to {self.path}")
+
+    def put(self, line: str):
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def _open(self):
+        if self.path.endswith(".gz"):
+            # Appending adds a gzip member; readers see one continuous stream
+            return gzip.open(self.path, "at", encoding="utf-8")
+        return open(self.path, "a", encoding="utf-8")
+
+    def _run(self):
+        while True:
+            lines = [self.queue.get()]
+            # Take whatever else is waiting and write it as one batch. The file is
+            # closed after every batch, so a killed worker never leaves a
+            # truncated gzip member behind.
+            while not self.queue.empty() and len(lines) < 1000:
+                lines.append(self.queue.get_nowait())
+            try:
+                with self._open() as f:
+                    f.writelines(lines)
+                self.written += len(lines)
+            except OSError as e:
+                self.dropped += len(lines)
+                logger.warning(f"Failed to write webhook recording: {e}")
+
+
+class WebhookRecorderMiddleware:
+    """ASGI middleware recording RECORDED_PATHS requests and responses."""
+
+    def __init__(self, app, path: str = WEBHOOK_RECORD_PATH, sample: float = WEBHOOK_RECORD_SAMPLE,
+                 salt: Optional[str] = None):
+        self.app = app
+        self.path = path
+        self.sample = sample
+        self.salt = salt or record_salt(path)
+        self._writer = None
+        self._writer_pid = None
+
+    @property
+    def writer(self) -> _Writer:
+        # Created lazily in the serving process: a writer thread started in the
+        # gunicorn master would not survive the fork
+        if self._writer is None or self._writer_pid != os.getpid():
+            self._writer = _Writer(self.path)
+            self._writer_pid = os.getpid()
+        return self._writer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in RECORDED_PATHS or scope["method"] != "POST" \
+                or (self.sample < 1.0 and random.random() >= self.sample):
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.time()
+        start = time.perf_counter()
+        request_chunks, response_chunks = [], []
+        status = [0]
+
+        async def recording_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_chunks.append(message.get("body", b""))
+            return message
+
+        async def recording_send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, recording_receive, recording_send)
+        finally:
+            self._record(scope, arrived, time.perf_counter() - start, status[0],
+                         b"".join(request_chunks), b"".join(response_chunks))
+
+    def _record(self, scope, arrived: float, seconds: float, status: int, request: bytes, response: bytes):
+        try:
+            body = json.loads(request or b"{}")
+            redacted = redact_request(body, self.salt)
+            try:
+                response_body = redact_response(json.loads(response), self.salt) if response else None
+            except ValueError:
+                response_body = None
+            record = {
+                "t": round(arrived, 4),
+                "path": scope["path"],
+                "session": hash_session(body.get("session", "").split("/")[-1], self.salt),
+                "intent": body.get("queryResult", {}).get("intent", {}).get("displayName", ""),
+                "status": status,
+                "latency_ms": round(seconds * 1000, 2),
+                "request": redacted,
+                "response": response_body,
+            }
+            self.writer.put(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        except Exception as e:
+            # Recording must never affect the webhook
+            logger.warning(f"Failed to record webhook request: {e}")
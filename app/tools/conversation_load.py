@@ -0,0 +1,338 @@
+# app/tools/conversation_load.py
+# End-to-end Dialogflow conversation load generator for /webhook.
+#
+# Each simulated user walks the full multi-turn flow the webhook implements:
+#   1. clarification     "Report_Body_Reactions_And_Pain_Issue"
+#   2. consent           "Report_Body_Reactions_And_Pain_Issue - yes"
+#   3. submit            "Activity_assessment - custom" (pain_assessment answers
+#                        taken from a row of synthetic_users_dataset_2000.csv)
+#   4. care tip          "Activity_assessment - custom - yes", retried while the
+#                        tip is "still being prepared"
+#   5. feedback          "Care_Tip_Feedback"
+# with the session path and outputContexts Dialogflow would send. The app runs
+# in-process over ASGI (default) or a running server is targeted over HTTP.
+# The report has throughput, per-intent latency percentiles and the
+# care-tip-not-ready rate.
+#
+#   python -m app.tools.conversation_load --conversations 200 --concurrency 20
+#   python -m app.tools.conversation_load --base-url http://localhost:8080 --think-time 10
+#   python -m app.tools.conversation_load --with-rag --conversations 20     # in-process, calls Gemini
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_DATASET = PROJECT_ROOT / "app" / "data" / "synthetic_users_dataset_2000.csv"
+AGENT_PATH = "projects/load-test/agent"
+
+ASSESSMENT_FIELDS = ("pain_type", "radiates", "duration", "self_score", "activity_score", "mood_score", "sleep_score")
+INTEGER_FIELDS = ("self_score", "activity_score", "mood_score", "sleep_score")
+NOT_READY_TEXT = "still being prepared"
+FAILED_TEXT = "failed to retrieve care tip"
+FEEDBACK_OPTIONS = ("👍 Helpful", "👎 Not Helpful")
+
+STEPS = ("clarification", "consent", "submit", "care_tip", "feedback")
+
+
+def load_profiles(path: Path) -> List[Dict]:
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    profiles = []
+    for row in rows:
+        profile = {field: row[field] for field in ASSESSMENT_FIELDS}
+        for field in INTEGER_FIELDS:
+            profile[field] = int(profile[field])
+        profile["expected_severity"] = int(row["severity_score"]) if row.get("severity_score") else None
+        profiles.append(profile)
+    return profiles
+
+
+def _payload(session: str, intent: str, query_text: str, parameters: Dict = None, contexts: List[Dict] = None) -> Dict:
+    return {
+        "session": session,
+        "responseId": str(uuid.uuid4()),
+        "queryResult": {
+            "queryText": query_text,
+            "parameters": parameters or {},
+            "allRequiredParamsPresent": True,
+            "outputContexts": contexts or [],
+            "intent": {"name": f"{AGENT_PATH}/intents/{uuid.uuid5(uuid.NAMESPACE_URL, intent)}",
+                       "displayName": intent},
+            "languageCode": "en",
+        },
+    }
+
+
+def clarification_payload(session: str) -> Dict:
+    return _payload(session, "Report_Body_Reactions_And_Pain_Issue", "I have pain",
+                    {"symptom": "pain"},
+                    [{"name": f"{session}/contexts/report_body_reactions_and_pain_issue-followup",
+                      "lifespanCount": 2, "parameters": {"symptom": "pain", "symptom.original": "pain"}}])
+
+
+def consent_payload(session: str) -> Dict:
+    return _payload(session, "Report_Body_Reactions_And_Pain_Issue - yes", "yes", {},
+                    [{"name": f"{session}/contexts/report_body_reactions_and_pain_issue-followup",
+                      "lifespanCount": 1, "parameters": {"symptom": "pain", "symptom.original": "pain"}},
+                     {"name": f"{session}/contexts/__system_counters__",
+                      "parameters": {"no-input": 0, "no-match": 0}}])
+
+
+def submit_payload(session: str, profile: Dict) -> Dict:
+    answers = {field: profile[field] for field in ASSESSMENT_FIELDS}
+    originals = {f"{field}.original": str(value) for field, value in answers.items()}
+    return _payload(session, "Activity_assessment - custom", "submit", {},
+                    [{"name": f"{session}/contexts/pain_assessment", "lifespanCount": 5,
+                      "parameters": {**answers, **originals}},
+                     {"name": f"{session}/contexts/awaiting_consent", "lifespanCount": 0}])
+
+
+def care_tip_payload(session: str, care_tip_uuid: str) -> Dict:
+    return _payload(session, "Activity_assessment - custom - yes", "yes", {},
+                    [{"name": f"{session}/contexts/awaiting_care_tip", "lifespanCount": 3,
+                      "parameters": {"care_tip_uuid": care_tip_uuid}}])
+
+
+def feedback_payload(session: str, care_tip_uuid: str) -> Dict:
+    return _payload(session, "Care_Tip_Feedback", random.choice(FEEDBACK_OPTIONS), {},
+                    [{"name": f"{session}/contexts/awaiting_feedback", "lifespanCount": 3,
+                      "parameters": {"care_tip_uuid": care_tip_uuid}}])
+
+
+def _care_tip_uuid(response: Dict) -> str:
+    for context in response.get("outputContexts", []):
+        if context.get("name", "").endswith("/contexts/awaiting_care_tip"):
+            return context.get("parameters", {}).get("care_tip_uuid", "")
+    return ""
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.conversations = 0
+        self.completed = 0
+        self.care_tip_first_not_ready = 0
+        self.care_tip_never_ready = 0
+        self.care_tip_failed = 0
+        self.care_tip_attempts = 0
+        self.severity_matches = 0
+        self.severity_checked = 0
+
+
+class ConversationRunner:
+    def __init__(self, client: httpx.AsyncClient, stats: Stats, think_time: float,
+                 care_tip_retries: int, retry_delay: float):
+        self.client = client
+        self.stats = stats
+        self.think_time = think_time
+        self.care_tip_retries = care_tip_retries
+        self.retry_delay = retry_delay
+
+    async def turn(self, step: str, payload: Dict) -> Dict:
+        start = time.perf_counter()
+        try:
+            response = await self.client.post("/webhook", json=payload)
+        except httpx.HTTPError:
+            self.stats.errors[step] += 1
+            return None
+        self.stats.latencies[step].append(time.perf_counter() - start)
+        if response.status_code != 200:
+            self.stats.errors[step] += 1
+            return None
+        return response.json()
+
+    async def run(self, profile: Dict):
+        stats = self.stats
+        stats.conversations += 1
+        session = f"{AGENT_PATH}/sessions/{uuid.uuid4()}"
+
+        if await self.turn("clarification", clarification_payload(session)) is None:
+            return
+        if await self.turn("consent", consent_payload(session)) is None:
+            return
+        submitted = await self.turn("submit", submit_payload(session, profile))
+        if submitted is None:
+            return
+        care_tip_uuid = _care_tip_uuid(submitted)
+        if profile.get("expected_severity"):
+            stats.severity_checked += 1
+            stats.severity_matches += f"severity level is {profile['expected_severity']}/5" in submitted.get(
+                "fulfillmentText", "")
+
+        # The user reads the reply and answers "Yes" after the think time
+        await asyncio.sleep(self.think_time)
+        for attempt in range(self.care_tip_retries + 1):
+            care_tip = await self.turn("care_tip", care_tip_payload(session, care_tip_uuid))
+            if care_tip is None:
+                return
+            stats.care_tip_attempts += 1
+            text = care_tip.get("fulfillmentText", "")
+            if NOT_READY_TEXT not in text:
+                stats.care_tip_failed += FAILED_TEXT in text.lower()
+                break
+            if attempt == 0:
+                stats.care_tip_first_not_ready += 1
+            if attempt == self.care_tip_retries:
+                stats.care_tip_never_ready += 1
+                return
+            await asyncio.sleep(self.retry_delay)
+
+        if await self.turn("feedback", feedback_payload(session, care_tip_uuid)) is None:
+            return
+        stats.completed += 1
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+
+def build_report(stats: Stats, elapsed: float, transport: str, concurrency: int) -> Dict:
+    requests = sum(len(v) for v in stats.latencies.values())
+    care_tip_requests = stats.conversations - sum(stats.errors[s] for s in STEPS[:3])
+    return {
+        "transport": transport,
+        "concurrency": concurrency,
+        "conversations": stats.conversations,
+        "completed": stats.completed,
+        "seconds": round(elapsed, 2),
+        "requests": requests,
+        "requests_per_second": round(requests / elapsed, 1) if elapsed else 0.0,
+        "conversations_per_second": round(stats.completed / elapsed, 2) if elapsed else 0.0,
+        "intents": {
+            step: {
+                "count": len(stats.latencies[step]),
+                "errors": stats.errors[step],
+                "p50_ms": round(percentile(stats.latencies[step], 0.50), 1),
+                "p95_ms": round(percentile(stats.latencies[step], 0.95), 1),
+                "p99_ms": round(percentile(stats.latencies[step], 0.99), 1),
+                "max_ms": round(max(stats.latencies[step], default=0) * 1000, 1),
+            }
+            for step in STEPS
+        },
+        "care_tip": {
+            "not_ready_first_attempt_rate": round(stats.care_tip_first_not_ready / care_tip_requests, 3)
+            if care_tip_requests > 0 else 0.0,
+            "never_ready": stats.care_tip_never_ready,
+            "failed": stats.care_tip_failed,
+            "attempts_per_conversation": round(stats.care_tip_attempts / care_tip_requests, 2)
+            if care_tip_requests > 0 else 0.0,
+        },
+        "severity_matches_dataset": round(stats.severity_matches / stats.severity_checked, 3)
+        if stats.severity_checked else None,
+    }
+
+
+def _asgi_app(with_rag: bool, workdir: str):
+    # The webhook appends user_answers.jsonl and feedback_log.jsonl to the
+    # working directory and writes care tips to the cache dir; keep both out of
+    # the repository
+    os.environ["CARE_TIP_CACHE_DIR"] = os.path.join(workdir, "care_tip_cache")
+    if not with_rag:
+        # An empty key makes the background RAG thread fail fast instead of
+        # calling Gemini, as in load_test.py
+        os.environ["GOOGLE_API_KEY"] = ""
+    os.chdir(workdir)
+    from app.main import app
+    if not with_rag:
+        # main.py loads .env on import; override it again
+        os.environ["GOOGLE_API_KEY"] = ""
+    return app
+
+
+async def run(args) -> Dict:
+    profiles = load_profiles(Path(args.dataset))
+    if args.shuffle:
+        random.Random(args.seed).shuffle(profiles)
+    stats = Stats()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.base_url:
+            from app.tools.load_test import wait_until_ready
+            await wait_until_ready(args.base_url, timeout=30)
+            transport, base_url, label = None, args.base_url, f"http {args.base_url}"
+        else:
+            cwd = os.getcwd()
+            transport = httpx.ASGITransport(app=_asgi_app(args.with_rag, workdir))
+            base_url, label = "http://conversation-load", "asgi"
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits,
+                                     timeout=args.timeout) as client:
+            runner = ConversationRunner(client, stats, args.think_time, args.care_tip_retries, args.retry_delay)
+            next_index = 0
+
+            async def user_loop():
+                nonlocal next_index
+                while next_index < args.conversations:
+                    profile = profiles[next_index % len(profiles)]
+                    next_index += 1
+                    await runner.run(profile)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(user_loop() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+        if not args.base_url:
+            os.chdir(cwd)
+
+    return build_report(stats, elapsed, label, args.concurrency)
+
+
+def print_report(report: Dict):
+    print(f"\n=== CONVERSATION LOAD ({report['transport']}, concurrency {report['concurrency']}) ===")
+    print(f"{report['completed']}/{report['conversations']} conversations in {report['seconds']}s: "
+          f"{report['requests_per_second']} req/s, {report['conversations_per_second']} conversations/s")
+    print(f"{'intent':>14} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for step, s in report["intents"].items():
+        print(f"{step:>14} {s['count']:>7} {s['errors']:>7} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} "
+              f"{s['p99_ms']:>9.1f} {s['max_ms']:>9.1f}")
+    care_tip = report["care_tip"]
+    print(f"🩺 Care tip not ready on first attempt: {care_tip['not_ready_first_attempt_rate']:.1%}, "
+          f"never ready: {care_tip['never_ready']}, failed: {care_tip['failed']}, "
+          f"attempts per conversation: {care_tip['attempts_per_conversation']}")
+    if report["severity_matches_dataset"] is not None:
+        print(f"🎯 Predicted severity matches the dataset label: {report['severity_matches_dataset']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive full Dialogflow conversations against /webhook")
+    parser.add_argument("--dataset", default=str(DEFAULT_DATASET), help="CSV with the pain_assessment answers")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20, help="Simultaneous simulated users")
+    parser.add_argument("--base-url", help="Target a running server over HTTP instead of the in-process app")
+    parser.add_argument("--with-rag", action="store_true",
+                        help="In-process only: keep GOOGLE_API_KEY so care tips call Gemini (costs quota)")
+    parser.add_argument("--think-time", type=float, default=2.0,
+                        help="Seconds between the submit reply and the user's \"Yes\"")
+    parser.add_argument("--care-tip-retries", type=int, default=3, help="\"Yes\" retries while the tip is not ready")
+    parser.add_argument("--retry-delay", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--shuffle", action="store_true", help="Shuffle the dataset rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
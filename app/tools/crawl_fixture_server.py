@@ -0,0 +1,216 @@
+# app/tools/crawl_fixture_server.py
+# Local HTTP fixture site for the crawler (app/services/rag/crawler.py).
+#
+# Serves a small linked site with media links, a robots.txt that disallows
+# /private/, and ETag / Last-Modified validators that answer 304 to
+# conditional requests. It records every request, so --check can run the
+# crawler against it twice and verify politeness, robots handling and
+# conditional re-crawls without touching the real organization sites.
+#
+#   python -m app.tools.crawl_fixture_server --port 8765            # serve only
+#   python -m app.tools.crawl_fixture_server --check                # crawl twice and verify
+
+import argparse
+import asyncio
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+LAST_MODIFIED = formatdate(time.time() - 86400, usegmt=True)
+
+
+def page_html(index: int, pages: int) -> str:
+    # Pages 1..pages-1; page 0 is only reachable as the site root
+    targets = [(index * 7 + j) % (pages - 1) + 1 for j in range(3)]
+    links = "".join(f'<li><a href="/page/{t}">Page {t}</a></li>' for t in targets)
+    return f"""<html><head><title>Fixture page {index}</title>
+<meta name="description" content="Fixture page {index} about pain management">
+<meta name="keywords" content="parkinson, pain"></head>
+<body><h1>Managing pain, part {index}</h1>
+<p>Regular exercise and stretching can reduce stiffness and pain. Page {index} of the fixture site.</p>
+<ul>{links}<li><a href="/private/admin">Private</a></li><li><a href="/donate">Donate</a></li></ul>
+<p><a href="https://www.youtube.com/watch?v=fixture{index}">Exercise video {index}</a></p>
+<p><a href="https://podcasts.example.org/episodes/{index}">Listen to episode {index} of our podcast</a></p>
+<script>var ignored = true;</script></body></html>"""
+
+
+class FixtureSite:
+    def __init__(self, pages: int = 30, crawl_delay: float = 0.0):
+        self.pages = pages
+        self.crawl_delay = crawl_delay
+        self.requests = []  # (path, status, start, end)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                start = time.monotonic()
+                with site.lock:
+                    site.in_flight += 1
+                    site.max_in_flight = max(site.max_in_flight, site.in_flight)
+                try:
+                    status = self._respond()
+                finally:
+                    with site.lock:
+                        site.in_flight -= 1
+                        site.requests.append((self.path, status, start, time.monotonic()))
+
+            def _respond(self) -> int:
+                if self.path == "/robots.txt":
+                    body = "User-agent: *\nDisallow: /private/\n"
+                    if site.crawl_delay:
+                        body += f"Crawl-delay: {site.crawl_delay}\n"
+                    return self._send(200, body.encode(), "text/plain")
+
+                if self.path in ("/", "/index") or self.path.startswith("/page/"):
+                    index = 0 if self.path in ("/", "/index") else int(self.path.rsplit("/", 1)[1])
+                    if index >= site.pages:
+                        return self._send(404, b"not found", "text/plain")
+                    body = page_html(index, site.pages).encode()
+                    etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                    if self.headers.get("If-None-Match") == etag or \
+                            self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return 304
+                    time.sleep(0.02)  # simulated server time
+                    return self._send(200, body, "text/html; charset=utf-8",
+                                      {"ETag": etag, "Last-Modified": LAST_MODIFIED})
+
+                return self._send(404, b"not found", "text/plain")
+
+            def _send(self, status, body, content_type, headers=None) -> int:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                return status
+
+        return Handler
+
+    def serve(self, port: int) -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def mean_interval(requests) -> float:
+    # Server-side start times jitter with thread scheduling, so compare the mean
+    starts = sorted(start for path, _, start, _ in requests if path != "/robots.txt")
+    return (starts[-1] - starts[0]) / (len(starts) - 1) if len(starts) > 1 else 0.0
+
+
+def run_check(port: int, pages: int, min_delay: float, concurrency: int) -> bool:
+    from app.services.rag.crawler import AsyncCrawler, load_previous_crawl
+    from app.services.rag.ingest import crawl_documents, load_crawl
+
+    site = FixtureSite(pages)
+    server = site.serve(port)
+    organizations = {"Fixture Org": f"http://127.0.0.1:{port}/"}
+    ok = True
+
+    def check(label, condition, detail=""):
+        nonlocal ok
+        ok &= bool(condition)
+        print(f"{'✅' if condition else '❌'} {label} {detail}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first_path, second_path = Path(tmp) / "crawl1.jsonl", Path(tmp) / "crawl2.jsonl"
+
+        crawler = AsyncCrawler(organizations, max_pages_per_org=pages + 5, max_depth=5,
+                               per_host_concurrency=concurrency, min_delay=min_delay)
+        summary = asyncio.run(crawler.crawl(first_path))
+        first_requests = list(site.requests)
+        print(json.dumps(summary["crawl_stats"]))
+
+        check("all reachable pages crawled", summary["total_pages_scraped"] == pages,
+              f"({summary['total_pages_scraped']}/{pages})")
+        check("robots.txt fetched once", sum(p == "/robots.txt" for p, *_ in first_requests) == 1)
+        check("disallowed /private/ never requested", not any(p.startswith("/private") for p, *_ in first_requests))
+        check("per-host concurrency respected", site.max_in_flight <= concurrency,
+              f"(max in flight {site.max_in_flight})")
+        check("per-host request rate respected", mean_interval(first_requests) >= min_delay * 0.95,
+              f"(mean interval {mean_interval(first_requests):.3f}s, min delay {min_delay}s)")
+        check("videos and podcasts extracted",
+              summary["total_videos_found"] == pages and summary["total_podcasts_found"] == pages)
+
+        site.requests.clear()
+        crawler = AsyncCrawler(organizations, max_pages_per_org=pages + 5, max_depth=5,
+                               per_host_concurrency=concurrency, min_delay=min_delay,
+                               previous=load_previous_crawl(first_path))
+        summary = asyncio.run(crawler.crawl(second_path))
+        statuses = [status for path, status, *_ in site.requests if path != "/robots.txt"]
+        check("re-crawl answered with 304s", statuses and all(s == 304 for s in statuses),
+              f"({statuses.count(304)}/{len(statuses)})")
+        check("re-crawl output complete", summary["total_pages_scraped"] == pages)
+
+        docs = crawl_documents(load_crawl(second_path))
+        check("JSONL output readable by ingest", len(docs) > 0, f"({len(docs)} chunks)")
+
+        # Pages failing to parse must be counted, not kill the workers and hang the crawl
+        from app.services.rag import crawler as crawler_module
+        original_parse = crawler_module.parse_page
+
+        def broken_parse(body, url, base_domain):
+            if url != organizations["Fixture Org"]:
+                raise ValueError("fixture parse failure")
+            return original_parse(body, url, base_domain)
+
+        crawler_module.parse_page = broken_parse
+        try:
+            crawler = AsyncCrawler(organizations, max_pages_per_org=pages + 5, max_depth=5,
+                                   per_host_concurrency=concurrency, min_delay=min_delay)
+            summary = asyncio.run(asyncio.wait_for(crawler.crawl(Path(tmp) / "crawl3.jsonl"), timeout=30))
+        except asyncio.TimeoutError:
+            summary = None
+        finally:
+            crawler_module.parse_page = original_parse
+        check("parse failures counted without stopping the crawl",
+              summary is not None and summary["crawl_stats"]["errors"] >= concurrency,
+              f"({summary['crawl_stats']['errors']} errors)" if summary else "(timed out)")
+
+    server.shutdown()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fixture site for the crawler")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--crawl-delay", type=float, default=0.0, help="Crawl-delay advertised in robots.txt")
+    parser.add_argument("--check", action="store_true", help="Crawl the fixture twice and verify the crawler")
+    parser.add_argument("--min-delay", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if run_check(args.port, args.pages, args.min_delay, args.concurrency) else 1)
+
+    site = FixtureSite(args.pages, args.crawl_delay)
+    server = site.serve(args.port)
+    print(f"🌐 Fixture site on http://127.0.0.1:{args.port}/ ({args.pages} pages), Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
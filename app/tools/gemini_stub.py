@@ -0,0 +1,199 @@
+# app/tools/gemini_stub.py
+# Local stand-in for the Gemini REST API (app/services/rag/google_http.py).
+#
+# Answers embedContent, batchEmbedContents and generateContent with
+# deterministic embeddings and a canned reply, after an optional simulated
+# latency. A share of requests can fail with 503 to exercise the retries. It
+# counts the TCP connections it accepts, so --check can verify that the
+# pooled transport reuses connections: it sends the same calls once through
+# the shared transport and once with a new client per call, and compares
+# connections and wall time. The stub speaks plain HTTP/1.1, where HTTP/2 is
+# never negotiated, so the check verifies pooling and retries over HTTP/1.1
+# keep-alive only.
+#
+#   python -m app.tools.gemini_stub --port 8766        # serve only, then:
+#   GOOGLE_HTTP_TRANSPORT=pooled GOOGLE_API_BASE_URL=http://127.0.0.1:8766 uvicorn app.main:app
+#   python -m app.tools.gemini_stub --check --calls 300 --concurrency 8 --fail-rate 0.05
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+EMBEDDING_DIM = 768
+REPLY_TEXT = "Gentle stretching, regular walking and a consistent sleep routine can help. " \
+             "Discuss any new or worsening symptoms with your healthcare team."
+
+
+def stub_embedding(text: str) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32).round(6).tolist()
+
+
+class GeminiStub:
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.connections = 0
+        self.requests = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive: one handler instance serves every request on a connection
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub.lock:
+                    stub.requests += 1
+                    fail = stub.random.random() < stub.fail_rate
+                    if fail:
+                        stub.failed += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if fail:
+                    return self._send(503, {"error": {"code": 503, "message": "stub overloaded"}})
+
+                if self.path.endswith(":embedContent"):
+                    text = body["content"]["parts"][0]["text"]
+                    return self._send(200, {"embedding": {"values": stub_embedding(text)}})
+                if self.path.endswith(":batchEmbedContents"):
+                    return self._send(200, {"embeddings": [
+                        {"values": stub_embedding(r["content"]["parts"][0]["text"])} for r in body["requests"]
+                    ]})
+                if self.path.endswith(":generateContent"):
+                    return self._send(200, {"candidates": [{
+                        "content": {"role": "model", "parts": [{"text": REPLY_TEXT}]},
+                        "finishReason": "STOP",
+                    }]})
+                return self._send(404, {"error": {"code": 404, "message": f"unknown method {self.path}"}})
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def serve(self, port: int) -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def drive(calls: int, concurrency: int, make_clients):
+    """Alternating embedding and chat calls; returns wall seconds and the number of failed calls."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    def call(i):
+        embeddings, chat = make_clients()
+        try:
+            if i % 2:
+                chat.invoke([SystemMessage(content="You are a care assistant."), HumanMessage(content=f"question {i}")])
+            else:
+                embeddings.embed_query(f"query {i}")
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(calls)))
+    return time.perf_counter() - start, results.count(False)
+
+
+def run_check(port: int, calls: int, concurrency: int, latency: float, fail_rate: float) -> bool:
+    from app.services.rag.google_http import GoogleRestChatModel, GoogleRestEmbeddings, PooledTransport
+
+    # The injected 503s would log a retry warning each
+    logging.getLogger("app.services.rag.google_http").setLevel(logging.ERROR)
+    stub = GeminiStub(latency, fail_rate)
+    server = stub.serve(port)
+    base_url = f"http://127.0.0.1:{port}"
+    ok = True
+
+    def check(label, condition, detail=""):
+        nonlocal ok
+        ok &= bool(condition)
+        print(f"{'✅' if condition else '❌'} {label} {detail}")
+
+    transport = PooledTransport(base_url, api_key="stub", pool_size=concurrency, backoff=0.01)
+    shared = (GoogleRestEmbeddings(transport=transport), GoogleRestChatModel(transport=transport))
+    pooled_seconds, pooled_failed = drive(calls, concurrency, lambda: shared)
+    pooled_connections, pooled_stub_errors = stub.connections, stub.failed
+    stats = transport.stats()
+    print(json.dumps(stats))
+    transport.close()
+
+    def fresh_clients():
+        # What every call site building its own client costs: a connection per call
+        fresh = PooledTransport(base_url, api_key="stub", backoff=0.01)
+        return GoogleRestEmbeddings(transport=fresh), GoogleRestChatModel(transport=fresh)
+
+    stub.connections = 0
+    fresh_seconds, _ = drive(calls, concurrency, fresh_clients)
+    fresh_connections = stub.connections
+
+    check("pooled connections bounded by the pool size", pooled_connections <= concurrency,
+          f"({pooled_connections} connections for {stats['requests']} requests)")
+    check("client counts the same connections as the server", stats["connections"] == pooled_connections)
+    check("connection reuse", stats["connection_reuse"] > 0.9, f"({stats['connection_reuse']:.1%})")
+    check("requests sent over HTTP/1.1 (the stub cannot negotiate HTTP/2)", stats["protocol"] == "HTTP/1.1")
+    check("failures retried", not fail_rate or (stats["retries"] > 0 and pooled_failed < pooled_stub_errors),
+          f"({pooled_stub_errors} stub errors, {stats['retries']} retries, {pooled_failed} calls failed)")
+    print(f"⏱️  pooled {pooled_seconds:.2f}s ({pooled_connections} connections) vs "
+          f"client per call {fresh_seconds:.2f}s ({fresh_connections} connections) for {calls} calls")
+
+    server.shutdown()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the Gemini REST API")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--check", action="store_true", help="Verify connection reuse and retries of the transport")
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if run_check(args.port, args.calls, args.concurrency, args.latency, args.fail_rate) else 1)
+
+    stub = GeminiStub(args.latency, args.fail_rate)
+    server = stub.serve(args.port)
+    print(f"🌐 Gemini stub on http://127.0.0.1:{args.port}/, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"{stub.requests} requests on {stub.connections} connections, {stub.failed} failed")
+
+
+if __name__ == "__main__":
+    main()
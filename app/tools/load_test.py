@@ -0,0 +1,188 @@
+# app/tools/load_test.py
+# Throughput scaling load test for the multi-worker server.
+#
+# Starts the server with gunicorn.conf.py for each worker count, drives the
+# webhook with a fixed number of concurrent clients and reports requests/sec,
+# so you can check that throughput scales with the number of cores.
+#
+#   python -m app.tools.load_test --workers 1,2,4 --concurrency 32 --duration 15
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+AGENT_PATH = "projects/load-test/agent"
+
+
+def build_submit_payload() -> dict:
+    """Dialogflow payload for the "Activity_assessment - custom" submit turn."""
+    session = f"{AGENT_PATH}/sessions/{uuid.uuid4()}"
+    return {
+        "session": session,
+        "queryResult": {
+            "queryText": "submit",
+            "parameters": {},
+            "intent": {"displayName": "Activity_assessment - custom"},
+            "outputContexts": [{
+                "name": f"{session}/contexts/pain_assessment",
+                "lifespanCount": 5,
+                "parameters": {
+                    "pain_type": "burning",
+                    "radiates": "No",
+                    "duration": "Last week",
+                    "self_score": 3,
+                    "activity_score": 2,
+                    "mood_score": 2,
+                    "sleep_score": 2
+                }
+            }]
+        }
+    }
+
+
+def build_clarification_payload() -> dict:
+    """Dialogflow payload for the first (clarification) turn."""
+    return {
+        "session": f"{AGENT_PATH}/sessions/{uuid.uuid4()}",
+        "queryResult": {
+            "queryText": "I have pain",
+            "parameters": {"symptom": "pain"},
+            "intent": {"displayName": "Report_Body_Reactions_And_Pain_Issue"},
+            "outputContexts": []
+        }
+    }
+
+
+PAYLOADS = {
+    "submit": build_submit_payload,
+    "clarification": build_clarification_payload,
+}
+
+
+def start_server(workers: int, port: int, with_rag: bool, extra_env: dict = None) -> subprocess.Popen:
+    env = os.environ.copy()
+    env.update(extra_env or {})
+    env["WEB_CONCURRENCY"] = str(workers)
+    env["PORT"] = str(port)
+    env["LOG_LEVEL"] = "warning"
+    if not with_rag:
+        # An empty key makes the background RAG thread fail fast instead of
+        # calling Gemini, so the test measures the webhook itself.
+        env["GOOGLE_API_KEY"] = ""
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", os.devnull, "app.main:app"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_ready(base_url: str, timeout: float = 180.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(f"{base_url}/health")
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not become ready in {timeout}s")
+
+
+async def run_load(base_url: str, payload: str, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    build_payload = PAYLOADS[payload]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def client_loop():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/webhook", json=build_payload())
+                    if response.status_code != 200:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+async def main_async(args) -> None:
+    worker_counts = [int(w) for w in args.workers.split(",")]
+    results = []
+
+    for workers in worker_counts:
+        print(f"🚀 Starting server with {workers} worker(s)...")
+        server = start_server(workers, args.port, args.with_rag)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            await wait_until_ready(base_url)
+            # Short warm-up so worker start-up is not part of the measurement
+            await run_load(base_url, args.payload, args.concurrency, min(2.0, args.duration))
+            result = await run_load(base_url, args.payload, args.concurrency, args.duration)
+            result["workers"] = workers
+            results.append(result)
+            print(f"   {result['rps']:.1f} req/s, p50={result['p50_ms']:.1f}ms, "
+                  f"p95={result['p95_ms']:.1f}ms, errors={result['errors']}")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print("\n=== THROUGHPUT SCALING ===")
+    print(f"CPU cores: {os.cpu_count()}, concurrency: {args.concurrency}, payload: {args.payload}")
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    baseline = results[0]["rps"] if results and results[0]["rps"] else None
+    for r in results:
+        speedup = r["rps"] / baseline if baseline else 0.0
+        print(f"{r['workers']:>8} {r['rps']:>10.1f} {speedup:>7.2f}x {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook throughput scaling load test")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to test")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds to run each measurement")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--payload", choices=sorted(PAYLOADS), default="submit",
+                        help="Webhook turn to send (submit runs the severity classifier)")
+    parser.add_argument("--with-rag", action="store_true",
+                        help="Keep GOOGLE_API_KEY so background RAG calls Gemini (costs quota)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# app/tools/memory_report.py
+# Per-worker memory report: compares gunicorn with and without preload-before-fork.
+#
+# For each mode the server is started, warmed up with webhook traffic, and the
+# master's and workers' memory is read from /proc/<pid>/smaps_rollup (Linux).
+# PSS (proportional set size) charges shared pages fractionally to each process,
+# so the sum of PSS is the real memory footprint of the whole server.
+#
+#   python -m app.tools.memory_report --workers 4
+
+import argparse
+import asyncio
+from pathlib import Path
+
+import httpx
+
+from app.tools.load_test import build_submit_payload, start_server, wait_until_ready
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def read_smaps_rollup(pid: int) -> dict:
+    """Returns the smaps_rollup fields of a process in MiB."""
+    values = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in SMAPS_FIELDS:
+            values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    values["Uss"] = values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0)
+    return values
+
+
+def child_pids(pid: int) -> list:
+    children = []
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        children_file = task / "children"
+        if children_file.exists():
+            children.extend(int(c) for c in children_file.read_text().split())
+    return sorted(children)
+
+
+async def warm_up(base_url: str, requests: int) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        await asyncio.gather(*(client.post("/webhook", json=build_submit_payload()) for _ in range(requests)))
+
+
+async def measure(workers: int, port: int, preload: bool, warm_requests: int) -> dict:
+    server = start_server(workers, port, with_rag=False, extra_env={"GUNICORN_PRELOAD": "1" if preload else "0"})
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_until_ready(base_url)
+        await warm_up(base_url, warm_requests)
+        # server.pid is the python process running gunicorn, i.e. the master
+        master = read_smaps_rollup(server.pid)
+        worker_stats = [read_smaps_rollup(pid) for pid in child_pids(server.pid)]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return {
+        "preload": preload,
+        "master": master,
+        "workers": worker_stats,
+        "total_pss": master.get("Pss", 0.0) + sum(w.get("Pss", 0.0) for w in worker_stats),
+    }
+
+
+def print_report(result: dict) -> None:
+    label = "preload ON" if result["preload"] else "preload OFF"
+    print(f"\n=== {label} ===")
+    print(f"{'process':>10} {'RSS MiB':>9} {'PSS MiB':>9} {'USS MiB':>9} {'shared MiB':>11}")
+    rows = [("master", result["master"])] + [(f"worker {i}", w) for i, w in enumerate(result["workers"], 1)]
+    for name, m in rows:
+        shared = m.get("Shared_Clean", 0.0) + m.get("Shared_Dirty", 0.0)
+        print(f"{name:>10} {m.get('Rss', 0):>9.1f} {m.get('Pss', 0):>9.1f} {m.get('Uss', 0):>9.1f} {shared:>11.1f}")
+    print(f"{'total PSS':>10} {result['total_pss']:>9.1f} MiB")
+
+
+async def main_async(args) -> None:
+    results = []
+    for preload in (False, True):
+        print(f"🚀 Measuring {args.workers} worker(s) with preload {'ON' if preload else 'OFF'}...")
+        results.append(await measure(args.workers, args.port, preload, args.warm_requests))
+        print_report(results[-1])
+
+    without, with_preload = results
+    n = max(len(with_preload["workers"]), 1)
+    avg_uss_off = sum(w["Uss"] for w in without["workers"]) / max(len(without["workers"]), 1)
+    avg_uss_on = sum(w["Uss"] for w in with_preload["workers"]) / n
+    saved = without["total_pss"] - with_preload["total_pss"]
+
+    print("\n=== SAVINGS ===")
+    print(f"Private memory per worker: {avg_uss_off:.1f} MiB -> {avg_uss_on:.1f} MiB "
+          f"({avg_uss_off - avg_uss_on:.1f} MiB saved per worker)")
+    print(f"Total server footprint (PSS): {without['total_pss']:.1f} MiB -> {with_preload['total_pss']:.1f} MiB "
+          f"({saved:.1f} MiB saved)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory report with and without preload")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8097)
+    parser.add_argument("--warm-requests", type=int, default=50,
+                        help="Webhook requests sent before measuring, so every worker has done real work")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# app/tools/quantization_report.py
+# Recall@k and latency of the quantized NumPy index against exact search.
+#
+# Runs the same query vectors through the exact index and through each
+# quantized variant, with and without the full-precision re-rank, for the
+# three searches the retriever makes (all chunks, web pages one per URL,
+# media one per media URL). --queries severity embeds the retriever's
+# severity query set (needs GOOGLE_API_KEY); the default uses perturbed
+# copies of stored vectors.
+#
+#   python -m app.services.rag.quantization --method int8
+#   python -m app.services.rag.quantization --method pq
+#   python -m app.tools.quantization_report --queries severity --k 10
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.rag.numpy_store import NumpyIndex, current_numpy_index_path
+from app.services.rag.quantization import QUANTIZATION_METHODS
+from app.tools.vector_store_benchmark import build_query_vectors
+
+SCENARIOS = (
+    ("all chunks", None, None),
+    ("web pages / source_url", ["web_page"], "source_url"),
+    ("media / media_url", ["video", "podcast"], "media_url"),
+)
+
+
+def run_queries(index: NumpyIndex, query_vectors: np.ndarray, k: int, content_types, unique_by) -> dict:
+    rows = index.partition_rows(content_types) if content_types else None
+    results = []
+    latencies = []
+    for q in query_vectors:
+        start = time.perf_counter()
+        row_ids, _ = index.search(q, k, rows=rows, unique_by=unique_by)
+        latencies.append(time.perf_counter() - start)
+        results.append(row_ids.tolist())
+    latencies = np.array(latencies) * 1000
+    return {
+        "results": results,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def recall(results: list, exact: list) -> float:
+    scores = [len(set(r) & set(e)) / len(e) for r, e in zip(results, exact) if e]
+    return float(np.mean(scores)) if scores else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k of quantized vs exact NumPy index search")
+    parser.add_argument("--numpy-index", default=str(current_numpy_index_path()))
+    parser.add_argument("--methods", default=",".join(QUANTIZATION_METHODS),
+                        help="Comma-separated quantization methods (codes must already be built)")
+    parser.add_argument("--queries", choices=["corpus", "severity"], default="corpus")
+    parser.add_argument("--query-count", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    path = Path(args.numpy_index)
+    exact_index = NumpyIndex(path)
+    query_vectors = build_query_vectors(exact_index, args.queries, args.query_count, args.seed)
+    matrix_mb = exact_index.embeddings.nbytes / (1024 * 1024)
+
+    print(f"📊 {len(exact_index)} docs, dim={exact_index.dim}, {exact_index.embeddings.dtype} matrix "
+          f"{matrix_mb:.1f} MB, {len(query_vectors)} {args.queries} queries, k={args.k}")
+
+    variants = [("exact", exact_index)]
+    for method in [m.strip() for m in args.methods.split(",") if m.strip()]:
+        # A re-rank factor of 1 keeps the quantized top-k as is (only its distances are exact)
+        variants.append((f"{method}", NumpyIndex(path, method, rerank_factor=1)))
+        variants.append((f"{method} + rerank x{args.rerank_factor}", NumpyIndex(path, method, args.rerank_factor)))
+
+    for label, content_types, unique_by in SCENARIOS:
+        print(f"\n🔎 {label}")
+        print(f"{'variant':<22} {'codes MB':>9} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        exact = run_queries(exact_index, query_vectors, args.k, content_types, unique_by)
+        for name, index in variants:
+            result = exact if index is exact_index else \
+                run_queries(index, query_vectors, args.k, content_types, unique_by)
+            codes_mb = matrix_mb if index.quantizer is None else index.quantizer.nbytes / (1024 * 1024)
+            print(f"{name:<22} {codes_mb:>9.2f} {recall(result['results'], exact['results']):>9.2%} "
+                  f"{result['p50_ms']:>8.3f} {result['p95_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# app/tools/replay_traffic.py
+# Replays /webhook traffic captured by app/services/webhook_recorder.py.
+#
+# Requests are re-issued with their original spacing (--speed 1), compressed
+# (--speed 10) or as fast as possible (--speed max). Turns of the same session
+# are always sent in order, each after the previous one has answered, and the
+# care-tip uuid the new build hands out at submit is substituted into the
+# session's later turns. The report compares per-intent latency with the
+# recording and counts responses that differ (ignoring uuids and timestamps),
+# with a few example diffs.
+#
+#   python -m app.tools.replay_traffic traffic/webhook-*.jsonl.gz --speed 10
+#   python -m app.tools.replay_traffic traffic.jsonl --speed max --base-url http://localhost:8080
+
+import argparse
+import asyncio
+import difflib
+import glob
+import gzip
+import json
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.tools.conversation_load import _asgi_app, percentile
+
+_UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+VOLATILE_KEYS = ("time",)
+
+
+def load_records(patterns: List[str]) -> List[Dict]:
+    records = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            opener = gzip.open if path.endswith(".gz") else open
+            try:
+                with opener(path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            continue
+            except EOFError:
+                # A worker stopped mid-write; everything before the cut is usable
+                pass
+    records.sort(key=lambda r: r["t"])
+    return records
+
+
+def _care_tip_uuids(response: Optional[Dict]) -> List[str]:
+    return [context.get("parameters", {}).get("care_tip_uuid")
+            for context in (response or {}).get("outputContexts", [])
+            if context.get("parameters", {}).get("care_tip_uuid")]
+
+
+def normalize(response: Optional[Dict]):
+    if not isinstance(response, dict):
+        return response
+    text = json.dumps({k: v for k, v in response.items() if k not in VOLATILE_KEYS}, sort_keys=True,
+                      ensure_ascii=False)
+    return json.loads(_UUID_RE.sub("<uuid>", text))
+
+
+class Replayer:
+    def __init__(self, client: httpx.AsyncClient, speed: Optional[float], concurrency: int):
+        self.client = client
+        self.speed = speed
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.results: List[Dict] = []
+
+    async def replay_session(self, records: List[Dict], t0: float, started: float):
+        uuid_map: Dict[str, str] = {}
+        for record in records:
+            if self.speed:
+                delay = started + (record["t"] - t0) / self.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            request_text = json.dumps(record["request"], ensure_ascii=False)
+            for old, new in uuid_map.items():
+                request_text = request_text.replace(old, new)
+
+            async with self.semaphore:
+                sent = time.perf_counter()
+                lag = sent - (started + (record["t"] - t0) / self.speed) if self.speed else 0.0
+                try:
+                    response = await self.client.post(record.get("path", "/webhook"), content=request_text,
+                                                      headers={"Content-Type": "application/json"})
+                    status = response.status_code
+                    try:
+                        body = response.json()
+                    except ValueError:
+                        body = None
+                except httpx.HTTPError as e:
+                    status, body = 0, {"error": str(e)}
+                seconds = time.perf_counter() - sent
+
+            # The new build hands out new care-tip uuids; use them in the session's later turns
+            for old, new in zip(_care_tip_uuids(record.get("response")), _care_tip_uuids(body)):
+                uuid_map[old] = new
+
+            self.results.append({
+                "intent": record.get("intent", ""),
+                "recorded_status": record.get("status"),
+                "status": status,
+                "recorded_ms": record.get("latency_ms", 0.0),
+                "replay_ms": seconds * 1000,
+                "lag_ms": max(0.0, lag * 1000),
+                "same_response": normalize(record.get("response")) == normalize(body),
+                "recorded_text": (record.get("response") or {}).get("fulfillmentText", ""),
+                "replay_text": (body or {}).get("fulfillmentText", ""),
+            })
+
+    async def run(self, records: List[Dict]) -> float:
+        sessions: Dict[str, List[Dict]] = defaultdict(list)
+        for record in records:
+            sessions[record.get("session", "")].append(record)
+        t0 = records[0]["t"]
+        started = time.perf_counter()
+        await asyncio.gather(*(self.replay_session(rs, t0, started) for rs in sessions.values()))
+        return time.perf_counter() - started
+
+
+def build_report(results: List[Dict], elapsed: float, records: List[Dict], speed: Optional[float],
+                 examples: int) -> Dict:
+    by_intent: Dict[str, List[Dict]] = defaultdict(list)
+    for result in results:
+        by_intent[result["intent"]].append(result)
+
+    intents = {}
+    for intent, rs in sorted(by_intent.items()):
+        recorded = [r["recorded_ms"] / 1000 for r in rs]
+        replayed = [r["replay_ms"] / 1000 for r in rs]
+        intents[intent] = {
+            "count": len(rs),
+            "recorded_p50_ms": round(percentile(recorded, 0.50), 1),
+            "replay_p50_ms": round(percentile(replayed, 0.50), 1),
+            "recorded_p95_ms": round(percentile(recorded, 0.95), 1),
+            "replay_p95_ms": round(percentile(replayed, 0.95), 1),
+            "status_changed": sum(r["status"] != r["recorded_status"] for r in rs),
+            "responses_differ": sum(not r["same_response"] for r in rs),
+        }
+
+    diffs = []
+    for r in results:
+        if len(diffs) >= examples:
+            break
+        if not r["same_response"] and r["recorded_text"] != r["replay_text"]:
+            diffs.append({"intent": r["intent"], "diff": "\n".join(difflib.unified_diff(
+                r["recorded_text"].splitlines(), r["replay_text"].splitlines(),
+                "recorded", "replay", lineterm="", n=1))})
+
+    recorded_span = records[-1]["t"] - records[0]["t"] if records else 0.0
+    return {
+        "speed": speed or "max",
+        "requests": len(results),
+        "sessions": len({r.get("session") for r in records}),
+        "recorded_seconds": round(recorded_span, 2),
+        "replay_seconds": round(elapsed, 2),
+        "requests_per_second": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "schedule_lag_p95_ms": round(percentile([r["lag_ms"] / 1000 for r in results], 0.95), 1),
+        "intents": intents,
+        "example_diffs": diffs,
+    }
+
+
+def print_report(report: Dict):
+    print(f"\n=== REPLAY ({report['speed']}x) ===" if report["speed"] != "max" else "\n=== REPLAY (max speed) ===")
+    print(f"{report['requests']} requests in {report['sessions']} sessions: recorded over "
+          f"{report['recorded_seconds']}s, replayed in {report['replay_seconds']}s "
+          f"({report['requests_per_second']} req/s, p95 schedule lag {report['schedule_lag_p95_ms']}ms)")
+    print(f"{'intent':>42} {'count':>6} {'p50 rec':>8} {'p50 new':>8} {'p95 rec':>8} {'p95 new':>8} "
+          f"{'status≠':>7} {'diff':>5}")
+    for intent, s in report["intents"].items():
+        print(f"{intent[:42]:>42} {s['count']:>6} {s['recorded_p50_ms']:>8.1f} {s['replay_p50_ms']:>8.1f} "
+              f"{s['recorded_p95_ms']:>8.1f} {s['replay_p95_ms']:>8.1f} {s['status_changed']:>7} "
+              f"{s['responses_differ']:>5}")
+    for example in report["example_diffs"]:
+        print(f"\n🔍 {example['intent']}:\n{example['diff']}")
+
+
+async def main_async(args) -> Dict:
+    records = load_records(args.recordings)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        raise SystemExit("No recorded requests found")
+    speed = None if args.speed == "max" else float(args.speed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.base_url:
+            transport, base_url = None, args.base_url
+        else:
+            transport, base_url = httpx.ASGITransport(app=_asgi_app(args.with_rag, workdir)), "http://replay"
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits,
+                                     timeout=args.timeout) as client:
+            replayer = Replayer(client, speed, args.concurrency)
+            elapsed = await replayer.run(records)
+    return build_report(replayer.results, elapsed, records, speed, args.examples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded /webhook traffic and compare with the recording")
+    parser.add_argument("recordings", nargs="+", help="Recorder files or glob patterns (.jsonl or .jsonl.gz)")
+    parser.add_argument("--speed", default="1", help="1, 10, any factor, or max")
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--with-rag", action="store_true", help="In-process only: let care tips call Gemini")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight at most")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N requests")
+    parser.add_argument("--examples", type=int, default=3, help="Response diffs to print")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    report = asyncio.run(main_async(args))
+    os.chdir(cwd)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+# app/tools/synthetic_users.py
+# Vectorized synthetic pain-assessment generator.
+#
+# Reproduces the joint distributions of the two notebooks that produced the
+# datasets in app/data:
+#   v1  app/notebooks/synthetic_users.ipynb    -> synthetic_users_dataset.csv
+#       (uniform answers, severity sampled from the notebook's vote weights)
+#   v2  app/notebooks/synthetic_users_2.ipynb  -> synthetic_users_dataset_2000.csv
+#       (answers and functional scores conditioned on a target severity, then
+#       the vote/argmax severity pulled back towards the target)
+# Rows are drawn a chunk at a time with NumPy (inverse-CDF sampling on uint8
+# codes, no Python loop per row) and appended to a CSV or Parquet file, so
+# memory stays bounded by --chunk-size however many rows are generated.
+#
+# The v2 notebook emits exactly int(n * share) rows per target severity, sorted
+# by severity; here each row draws its target severity independently with the
+# same shares, so every chunk is a representative sample and the marginals
+# match in expectation.
+#
+#   python -m app.tools.synthetic_users --rows 20000000 --output /tmp/users.csv
+#   python -m app.tools.synthetic_users --variant v1 --rows 1000000 --output users.parquet --seed 7
+#   python -m app.tools.synthetic_users --rows 100000 --check      # compare with the notebook loop
+
+import argparse
+import os
+import random
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+PAIN_TYPES = ["Sharp", "Dull", "Burning", "Throbbing"]
+PAIN_LOCATIONS = ["Head", "Back", "Stomach", "Chest", "Arm", "Leg", "Neck", "Everywhere"]
+RADIATE = ["Yes", "No"]
+DURATIONS = ["Today", "Yesterday", "Several days ago", "Last week", "More than a week ago"]
+
+SHARP, DULL, BURNING, THROBBING = range(4)
+EVERYWHERE = PAIN_LOCATIONS.index("Everywhere")
+YES = 0
+TODAY, YESTERDAY, SEVERAL_DAYS, LAST_WEEK, OVER_A_WEEK = range(5)
+
+V1_COLUMNS = ["pain_type", "pain_location", "radiates", "duration", "self_score", "severity_score", "severity_class"]
+V2_COLUMNS = ["pain_type", "radiates", "duration", "self_score", "sleep_score", "activity_score", "mood_score",
+              "severity_score", "severity_class"]
+V1_CLASSES = ["Mild", "Moderate", "Severe"]
+V2_CLASSES = ["mild", "moderate", "severe", "very severe"]
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# v2: share of rows per target severity 1..5
+V2_TARGET_SHARES = np.array([0.20, 0.25, 0.25, 0.20, 0.10])
+
+# v2: per target severity (rows 1..5), probabilities over the category / score
+V2_PAIN_TYPE = np.array([
+    [0.10, 0.60, 0.15, 0.15],
+    [0.15, 0.50, 0.20, 0.15],
+    [0.20, 0.35, 0.25, 0.20],
+    [0.30, 0.15, 0.40, 0.15],
+    [0.40, 0.05, 0.50, 0.05],
+])
+V2_DURATION = np.array([
+    [0.50, 0.25, 0.15, 0.08, 0.02],
+    [0.30, 0.25, 0.25, 0.15, 0.05],
+    [0.15, 0.20, 0.30, 0.20, 0.15],
+    [0.05, 0.08, 0.12, 0.35, 0.40],
+    [0.01, 0.02, 0.05, 0.25, 0.67],
+])
+V2_RADIATES = np.array([  # [yes, no]
+    [0.15, 0.85],
+    [0.30, 0.70],
+    [0.50, 0.50],
+    [0.75, 0.25],
+    [0.90, 0.10],
+])
+V2_SELF_SCORE = np.array([  # scores 1..5
+    [0.0, 0.0, 0.0, 0.1, 0.9],
+    [0.0, 0.0, 0.0, 0.7, 0.3],
+    [0.0, 0.0, 0.7, 0.3, 0.0],
+    [0.3, 0.7, 0.0, 0.0, 0.0],
+    [1.0, 0.0, 0.0, 0.0, 0.0],
+])
+# generate_correlated_scores(): scores 1..5 per target severity
+V2_SLEEP = np.array([
+    [0.0, 0.0, 0.0, 0.3, 0.7],
+    [0.0, 0.0, 0.4, 0.4, 0.2],
+    [0.0, 0.3, 0.5, 0.2, 0.0],
+    [0.5, 0.4, 0.1, 0.0, 0.0],
+    [0.8, 0.2, 0.0, 0.0, 0.0],
+])
+V2_ACTIVITY = np.array([
+    [0.0, 0.0, 0.0, 0.3, 0.7],
+    [0.0, 0.0, 0.4, 0.4, 0.2],
+    [0.0, 0.3, 0.5, 0.2, 0.0],
+    [0.4, 0.5, 0.1, 0.0, 0.0],
+    [0.7, 0.3, 0.0, 0.0, 0.0],
+])
+V2_MOOD = np.array([
+    [0.0, 0.0, 0.0, 0.3, 0.7],
+    [0.0, 0.0, 0.4, 0.4, 0.2],
+    [0.0, 0.3, 0.5, 0.2, 0.0],
+    [0.4, 0.4, 0.2, 0.0, 0.0],
+    [0.7, 0.3, 0.0, 0.0, 0.0],
+])
+# Share of off-by-one votes replaced by the target severity
+V2_PULL_TO_TARGET = 0.7
+
+
+def _sample(rng: np.random.Generator, probs: np.ndarray, n: int, given: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Category codes (uint8) drawn from probs, a 1-D distribution, or a 2-D
+    table whose row is chosen per sample by `given`.
+    """
+    cdf = np.cumsum(probs, axis=-1)
+    cdf /= cdf[..., -1:]
+    u = rng.random(n)
+    if given is None:
+        return np.searchsorted(cdf, u, side="right").astype(np.uint8)
+    # One row of the table per sample; count the CDF steps below u
+    return (u[:, None] >= cdf[given][:, :-1]).sum(axis=1).astype(np.uint8)
+
+
+def _sample_weighted(rng: np.random.Generator, weights: np.ndarray) -> np.ndarray:
+    """One index per row of an (n, k) weight matrix, proportional to the weights."""
+    cdf = np.cumsum(weights, axis=1, dtype=np.float64)
+    u = rng.random(len(weights)) * cdf[:, -1]
+    return (u[:, None] >= cdf[:, :-1]).sum(axis=1).astype(np.uint8)
+
+
+def generate_v1_codes(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """synthetic_users.ipynb: choose_severity() over uniformly drawn answers."""
+    pain_type = rng.integers(0, len(PAIN_TYPES), n, dtype=np.uint8)
+    location = rng.integers(0, len(PAIN_LOCATIONS), n, dtype=np.uint8)
+    radiates = rng.integers(0, len(RADIATE), n, dtype=np.uint8)
+    duration = rng.integers(0, len(DURATIONS), n, dtype=np.uint8)
+    self_score = rng.integers(1, 6, n, dtype=np.uint8)
+
+    w = np.ones((n, 5), dtype=np.int16)
+    w[np.arange(n), self_score - 1] += 6
+    high, low = self_score >= 4, self_score <= 2
+    w[:, 3] += 2 * high
+    w[:, 4] += 3 * high
+    w[:, 0] += 3 * low
+    w[:, 1] += 2 * low
+    everywhere = location == EVERYWHERE
+    w[:, 3] += 2 * everywhere
+    w[:, 4] += 3 * everywhere
+    yes = radiates == YES
+    w[:, 3] += 2 * yes
+    w[:, 4] += 2 * yes
+    sharp = (pain_type == SHARP) | (pain_type == BURNING)
+    w[:, 2] += sharp
+    w[:, 3] += 2 * sharp
+    w[:, 4] += 2 * sharp
+    dull = ~sharp
+    w[:, 0] += 2 * dull
+    w[:, 1] += 2 * dull
+    w[:, 2] += dull
+    long = duration >= LAST_WEEK
+    w[:, 3] += 2 * long
+    w[:, 4] += 3 * long
+    w[:, 0] += long
+    w[:, 1] += long
+
+    severity = _sample_weighted(rng, w) + 1
+    severity_class = np.where(severity <= 2, 0, np.where(severity <= 4, 1, 2)).astype(np.uint8)
+    return {"pain_type": pain_type, "pain_location": location, "radiates": radiates, "duration": duration,
+            "self_score": self_score, "severity_score": severity, "severity_class": severity_class}
+
+
+def generate_v2_codes(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """synthetic_users_2.ipynb: target-conditioned answers, choose_severity_int_vote() and the pull to target."""
+    target = _sample(rng, V2_TARGET_SHARES, n)  # 0-based target severity
+    pain_type = _sample(rng, V2_PAIN_TYPE, n, target)
+    duration = _sample(rng, V2_DURATION, n, target)
+    radiates = _sample(rng, V2_RADIATES, n, target)
+    self_score = _sample(rng, V2_SELF_SCORE, n, target) + 1
+    sleep = _sample(rng, V2_SLEEP, n, target) + 1
+    activity = _sample(rng, V2_ACTIVITY, n, target) + 1
+    mood = _sample(rng, V2_MOOD, n, target) + 1
+
+    w = np.ones((n, 5), dtype=np.int16)
+    w[np.arange(n), self_score - 1] += 6
+    high, low = self_score >= 4, self_score <= 2
+    w[:, 3] += 2 * high
+    w[:, 4] += 3 * high
+    w[:, 0] += 3 * low
+    w[:, 1] += 2 * low
+    w[:, 4] += 4 * (pain_type == BURNING)
+    w[:, 3] += 3 * (pain_type == SHARP)
+    w[:, 2] += 3 * (pain_type == DULL)
+    w[:, 2] += 2 * (pain_type == THROBBING)
+    w[:, 4] += 3 * (duration == OVER_A_WEEK)
+    w[:, 3] += 2 * (duration == LAST_WEEK)
+    w[:, 2] += 2 * (duration == SEVERAL_DAYS)
+    w[:, 1] += duration == YESTERDAY
+    w[:, 0] += duration == TODAY
+    yes = radiates == YES
+    w[:, 4] += 2 * yes
+    w[:, 3] += yes
+    impact = 18 - sleep.astype(np.int16) - activity - mood
+    w[:, 4] += 3 * (impact >= 12)
+    w[:, 3] += 2 * ((impact >= 8) & (impact < 12))
+    w[:, 2] += (impact >= 5) & (impact < 8)
+    w[:, 0] += impact < 5
+
+    # argmax takes the first maximum, like np.argmax in the notebook
+    vote = w.argmax(axis=1).astype(np.uint8)
+    pull = (np.abs(vote.astype(np.int8) - target.astype(np.int8)) > 1) | (rng.random(n) < V2_PULL_TO_TARGET)
+    severity = np.where(pull, target, vote) + 1
+    severity_class = np.select([severity <= 2, severity == 3, severity == 4], [0, 1, 2], 3).astype(np.uint8)
+    return {"pain_type": pain_type, "radiates": radiates, "duration": duration, "self_score": self_score,
+            "sleep_score": sleep, "activity_score": activity, "mood_score": mood,
+            "severity_score": severity.astype(np.uint8), "severity_class": severity_class}
+
+
+VARIANTS = {
+    "v1": {"generate": generate_v1_codes, "columns": V1_COLUMNS, "lower": False, "classes": V1_CLASSES},
+    "v2": {"generate": generate_v2_codes, "columns": V2_COLUMNS, "lower": True, "classes": V2_CLASSES},
+}
+
+
+def _labels(values: List[str], lower: bool) -> List[str]:
+    return [v.lower() for v in values] if lower else values
+
+
+def to_frame(codes: Dict[str, np.ndarray], variant: str = "v2") -> pd.DataFrame:
+    """Chunk of codes as a DataFrame with the notebook's column order and spelling."""
+    spec = VARIANTS[variant]
+    categories = {
+        "pain_type": PAIN_TYPES,
+        "pain_location": PAIN_LOCATIONS,
+        "radiates": RADIATE,
+        "duration": DURATIONS,
+    }
+    frame = {}
+    for column in spec["columns"]:
+        if column in categories:
+            frame[column] = pd.Categorical.from_codes(codes[column], _labels(categories[column], spec["lower"]))
+        elif column == "severity_class":
+            frame[column] = pd.Categorical.from_codes(codes[column], spec["classes"])
+        else:
+            frame[column] = codes[column]
+    return pd.DataFrame(frame)
+
+
+def generate_chunks(rows: int, variant: str = "v2", chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    seed: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Yields DataFrames of at most chunk_size rows until `rows` have been generated."""
+    rng = np.random.default_rng(seed)
+    generate = VARIANTS[variant]["generate"]
+    remaining = rows
+    while remaining > 0:
+        n = min(chunk_size, remaining)
+        yield to_frame(generate(rng, n), variant)
+        remaining -= n
+
+
+def generate(rows: int, variant: str = "v2", seed: Optional[int] = None) -> pd.DataFrame:
+    """All rows in one DataFrame; for fixtures and small datasets."""
+    return pd.concat(list(generate_chunks(rows, variant, max(rows, 1), seed)), ignore_index=True)
+
+
+def _csv_text(chunk: pd.DataFrame) -> str:
+    """
+    CSV rows for a chunk. Every value is a category or a small score, so each
+    column is a lookup into its labels; about 4x faster than DataFrame.to_csv.
+    """
+    columns = []
+    for name in chunk.columns:
+        values = chunk[name]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            labels, codes = values.cat.categories, values.cat.codes.to_numpy()
+        else:
+            codes = values.to_numpy()
+            labels = [str(v) for v in range(int(codes.max()) + 1)] if len(codes) else []
+        columns.append(np.array(labels, dtype=object)[codes])
+    return "\n".join(map(",".join, zip(*columns))) + "\n"
+
+
+def write_dataset(path: str, rows: int, variant: str = "v2", chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  seed: Optional[int] = None, file_format: Optional[str] = None) -> Dict:
+    """
+    Streams `rows` rows to a CSV or Parquet file (chosen by file_format or the
+    extension) one chunk at a time and returns severity counts and timings.
+    """
+    file_format = file_format or ("parquet" if path.endswith(".parquet") else "csv")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    writer = csv_file = None
+    if file_format == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install -r requirements-tools.txt")
+
+    start = time.perf_counter()
+    written = 0
+    severity_counts = np.zeros(5, dtype=np.int64)
+    try:
+        for chunk in generate_chunks(rows, variant, chunk_size, seed):
+            severity_counts += np.bincount(chunk["severity_score"].to_numpy(), minlength=6)[1:]
+            if file_format == "parquet":
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                if csv_file is None:
+                    csv_file = open(path, "w", encoding="utf-8", newline="")
+                    csv_file.write(",".join(chunk.columns) + "\n")
+                csv_file.write(_csv_text(chunk))
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+        if csv_file is not None:
+            csv_file.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        "path": path,
+        "variant": variant,
+        "format": file_format,
+        "rows": written,
+        "seconds": round(seconds, 2),
+        "rows_per_second": round(written / seconds) if seconds else 0,
+        "severity_share": {str(s + 1): round(float(c) / max(written, 1), 4) for s, c in enumerate(severity_counts)},
+    }
+
+
+# Reference: the notebook loops, kept for --check
+def _notebook_v1_row() -> Dict:
+    pain_type = random.choice(PAIN_TYPES)
+    location = random.choice(PAIN_LOCATIONS)
+    radiates = random.choice(RADIATE)
+    duration = random.choice(DURATIONS)
+    self_score = random.randint(1, 5)
+    weights = [1, 1, 1, 1, 1]
+    weights[self_score - 1] += 6
+    if self_score >= 4:
+        weights[3] += 2
+        weights[4] += 3
+    elif self_score <= 2:
+        weights[0] += 3
+        weights[1] += 2
+    if location == "Everywhere":
+        weights[3] += 2
+        weights[4] += 3
+    if radiates == "Yes":
+        weights[3] += 2
+        weights[4] += 2
+    if pain_type in ["Sharp", "Burning"]:
+        weights[2] += 1
+        weights[3] += 2
+        weights[4] += 2
+    if pain_type in ["Dull", "Throbbing"]:
+        weights[0] += 2
+        weights[1] += 2
+        weights[2] += 1
+    if duration in ["Last week", "More than a week ago"]:
+        weights[3] += 2
+        weights[4] += 3
+        weights[0] += 1
+        weights[1] += 1
+    severity = random.choices(range(1, 6), weights)[0]
+    return {"pain_type": pain_type, "pain_location": location, "radiates": radiates, "duration": duration,
+            "self_score": self_score, "severity_score": severity}
+
+
+def _notebook_v2_row() -> Dict:
+    target = random.choices(range(1, 6), V2_TARGET_SHARES.tolist())[0]
+    t = target - 1
+    pain_type = random.choices(PAIN_TYPES, V2_PAIN_TYPE[t].tolist())[0]
+    duration = random.choices(DURATIONS, V2_DURATION[t].tolist())[0]
+    radiates = random.choices(RADIATE, V2_RADIATES[t].tolist())[0]
+    self_score = random.choices(range(1, 6), V2_SELF_SCORE[t].tolist())[0]
+    sleep = random.choices(range(1, 6), V2_SLEEP[t].tolist())[0]
+    activity = random.choices(range(1, 6), V2_ACTIVITY[t].tolist())[0]
+    mood = random.choices(range(1, 6), V2_MOOD[t].tolist())[0]
+
+    weights = [1, 1, 1, 1, 1]
+    weights[self_score - 1] += 6
+    if self_score >= 4:
+        weights[3] += 2
+        weights[4] += 3
+    elif self_score <= 2:
+        weights[0] += 3
+        weights[1] += 2
+    if pain_type == "Burning":
+        weights[4] += 4
+    elif pain_type == "Sharp":
+        weights[3] += 3
+    elif pain_type == "Dull":
+        weights[2] += 3
+    elif pain_type == "Throbbing":
+        weights[2] += 2
+    if duration == "More than a week ago":
+        weights[4] += 3
+    elif duration == "Last week":
+        weights[3] += 2
+    elif duration == "Several days ago":
+        weights[2] += 2
+    elif duration == "Yesterday":
+        weights[1] += 1
+    elif duration == "Today":
+        weights[0] += 1
+    if radiates == "Yes":
+        weights[4] += 2
+        weights[3] += 1
+    impact = (6 - sleep) + (6 - activity) + (6 - mood)
+    if impact >= 12:
+        weights[4] += 3
+    elif impact >= 8:
+        weights[3] += 2
+    elif impact >= 5:
+        weights[2] += 1
+    else:
+        weights[0] += 1
+    severity = int(np.argmax(weights)) + 1
+    if abs(severity - target) > 1:
+        severity = target
+    elif severity != target and random.random() < V2_PULL_TO_TARGET:
+        severity = target
+    return {"pain_type": pain_type.lower(), "radiates": radiates.lower(), "duration": duration.lower(),
+            "self_score": self_score, "sleep_score": sleep, "activity_score": activity, "mood_score": mood,
+            "severity_score": severity}
+
+
+def check_distributions(rows: int, variant: str = "v2", seed: Optional[int] = None) -> Dict:
+    """
+    Largest absolute difference between the vectorized and the notebook-loop
+    joint distributions of (each column, severity_score), plus both timings.
+    """
+    start = time.perf_counter()
+    fast = generate(rows, variant, seed)
+    fast_seconds = time.perf_counter() - start
+
+    random.seed(seed)
+    row_fn = _notebook_v1_row if variant == "v1" else _notebook_v2_row
+    start = time.perf_counter()
+    slow = pd.DataFrame([row_fn() for _ in range(rows)])
+    slow_seconds = time.perf_counter() - start
+
+    worst = {}
+    for column in slow.columns:
+        if column == "severity_score":
+            continue
+        joint_fast = pd.crosstab(fast[column].astype(str), fast["severity_score"], normalize=True)
+        joint_slow = pd.crosstab(slow[column].astype(str), slow["severity_score"], normalize=True)
+        diff = joint_fast.sub(joint_slow, fill_value=0).abs().max().max()
+        worst[column] = round(float(diff), 4)
+    severity = (fast["severity_score"].value_counts(normalize=True)
+                .sub(slow["severity_score"].value_counts(normalize=True), fill_value=0).abs().max())
+    worst["severity_score"] = round(float(severity), 4)
+    return {"rows": rows, "variant": variant, "max_joint_difference": worst,
+            "vectorized_seconds": round(fast_seconds, 3), "notebook_seconds": round(slow_seconds, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic pain assessments (vectorized notebook logic)")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--variant", choices=sorted(VARIANTS), default="v2",
+                        help="v1: synthetic_users.ipynb, v2: synthetic_users_2.ipynb (default)")
+    parser.add_argument("--output", help="CSV or .parquet file to write")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Defaults to the output extension")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows generated and written at a time")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible output")
+    parser.add_argument("--check", action="store_true",
+                        help="Compare --rows vectorized rows with the notebook loop instead of writing a file")
+    args = parser.parse_args()
+
+    if args.check:
+        result = check_distributions(args.rows, args.variant, args.seed)
+        print(f"🔬 {result['rows']} rows ({result['variant']}): vectorized {result['vectorized_seconds']}s, "
+              f"notebook loop {result['notebook_seconds']}s")
+        for column, diff in result["max_joint_difference"].items():
+            print(f"   {column:>15}: max |Δ joint probability| = {diff}")
+        return
+
+    if not args.output:
+        parser.error("--output is required unless --check is given")
+    result = write_dataset(args.output, args.rows, args.variant, args.chunk_size, args.seed, args.format)
+    print(f"✅ {result['rows']} rows ({result['variant']}) written to {result['path']} in {result['seconds']}s "
+          f"({result['rows_per_second']} rows/s)")
+    print(f"   severity share: {result['severity_share']}")
+
+
+if __name__ == "__main__":
+    main()
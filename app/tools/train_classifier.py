@@ -0,0 +1,390 @@
+# app/tools/train_classifier.py
+# Reproducible, parallel training of the severity classifier.
+#
+# classification.ipynb fits Logistic Regression, KNN, Random Forest and XGBoost
+# one after another with fixed hyperparameters. Here every (family,
+# hyperparameters, CV fold) fit runs as its own joblib task across cores.
+# All candidates share the notebook's preprocessing (one-hot categorical,
+# ordinal scores), so it is fitted once per fold and the transformed fold
+# matrices are reused by every task (and kept in --cache-dir across runs).
+#
+# The best configuration of each family is refitted as a full pipeline on the
+# training split and measured on the held-out split for accuracy/F1, on single
+# row predict latency (the way SeverityPredictor calls it), on batch throughput
+# and on pickled size. The overall winner is written as a versioned artifact:
+#   app/models/artifacts/<version>/classification_model.pkl
+#   app/models/artifacts/<version>/manifest.json
+# and, with --promote, copied over app/models/classification_model.pkl and
+# named in app/models/artifacts/CURRENT (picked up by servers hot-reloading
+# from MODEL_RELOAD_DIR, see app/services/severity_predictor.py).
+#
+#   python -m app.tools.train_classifier
+#   python -m app.tools.train_classifier --families rf,xgb --jobs 8 --promote
+#   python -m app.tools.train_classifier --synthetic-rows 200000 --select-by latency_adjusted
+
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report, f1_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder, OneHotEncoder, OrdinalEncoder
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_DATASET = PROJECT_ROOT / "app" / "data" / "synthetic_users_dataset_2000.csv"
+MODELS_DIR = PROJECT_ROOT / "app" / "models"
+DEFAULT_ARTIFACTS_DIR = MODELS_DIR / "artifacts"
+SERVING_MODEL_PATH = MODELS_DIR / "classification_model.pkl"
+MODEL_FILENAME = "classification_model.pkl"
+CURRENT_FILE = "CURRENT"
+
+RANDOM_STATE = 42
+TEST_SIZE = 0.3
+TARGET = "severity_score"
+DROP_COLUMNS = ["severity_score", "severity_class"]
+
+# Hyperparameter grids; the notebook's settings are included in each
+GRIDS = {
+    "lr": {
+        "name": "Logistic Regression",
+        "params": {"C": [0.1, 1.0, 10.0]},
+    },
+    "knn": {
+        "name": "KNN",
+        "params": {"n_neighbors": [5, 8, 15, 25], "weights": ["uniform", "distance"]},
+    },
+    "rf": {
+        "name": "Random Forest",
+        "params": {"n_estimators": [100, 200], "max_depth": [5, 7, None], "min_samples_leaf": [1, 3]},
+    },
+    "xgb": {
+        "name": "XGBoost",
+        "params": {"max_depth": [3, 5], "learning_rate": [0.05, 0.1, 0.3], "n_estimators": [100, 300]},
+    },
+}
+
+
+def make_classifier(family: str, params: Dict, n_classes: int):
+    # n_jobs=1 inside each task: the parallelism is across tasks
+    if family == "lr":
+        return LogisticRegression(max_iter=1000, **params)
+    if family == "knn":
+        return KNeighborsClassifier(n_jobs=1, **params)
+    if family == "rf":
+        return RandomForestClassifier(class_weight="balanced", random_state=RANDOM_STATE, n_jobs=1, **params)
+    if family == "xgb":
+        from xgboost import XGBClassifier
+        return XGBClassifier(eval_metric="mlogloss", objective="multi:softprob", num_class=n_classes,
+                             random_state=RANDOM_STATE, n_jobs=1, **params)
+    raise ValueError(f"Unknown model family: {family}")
+
+
+def available_families(requested: List[str]) -> List[str]:
+    families = []
+    for family in requested:
+        if family not in GRIDS:
+            raise SystemExit(f"Unknown family '{family}' (choose from {', '.join(GRIDS)})")
+        if family == "xgb":
+            try:
+                import xgboost  # noqa: F401
+            except ImportError:
+                print("⚠️ xgboost is not installed (pip install -r requirements-tools.txt); skipping the XGBoost grid")
+                continue
+        families.append(family)
+    return families
+
+
+def make_preprocessor(X: pd.DataFrame) -> ColumnTransformer:
+    # Same preprocessing as classification.ipynb and the served model
+    categorical_features = X.select_dtypes(include=["object", "string", "category"]).columns.tolist()
+    ordinal_features = X.select_dtypes(include="number").columns.tolist()
+    return ColumnTransformer(transformers=[
+        ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), categorical_features),
+        ("ord", OrdinalEncoder(), ordinal_features),
+    ])
+
+
+def load_dataset(path: Optional[str], synthetic_rows: int, seed: int) -> Tuple[pd.DataFrame, str]:
+    if synthetic_rows:
+        from app.tools.synthetic_users import generate
+        return generate(synthetic_rows, "v2", seed), f"synthetic_users v2 ({synthetic_rows} rows, seed {seed})"
+    path = path or str(DEFAULT_DATASET)
+    return pd.read_csv(path), path
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()[:16]
+
+
+def build_folds(X_train: pd.DataFrame, y_train: np.ndarray, n_folds: int, seed: int,
+                cache_dir: Optional[str], fingerprint: str) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Preprocessed (X_fit, y_fit, X_val, y_val) per CV fold. The preprocessor is
+    fitted on each fold's training part only, so there is no leakage.
+    """
+    cache_path = None
+    if cache_dir:
+        cache_path = Path(cache_dir) / f"folds-{fingerprint}-{n_folds}-{seed}.joblib"
+        if cache_path.exists():
+            print(f"♻️ Reusing preprocessed folds from {cache_path}")
+            return joblib.load(cache_path)
+
+    folds = []
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    for fit_idx, val_idx in splitter.split(X_train, y_train):
+        preprocessor = make_preprocessor(X_train).fit(X_train.iloc[fit_idx])
+        folds.append((
+            preprocessor.transform(X_train.iloc[fit_idx]).astype(np.float32), y_train[fit_idx],
+            preprocessor.transform(X_train.iloc[val_idx]).astype(np.float32), y_train[val_idx],
+        ))
+
+    if cache_path:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(folds, cache_path)
+    return folds
+
+
+def expand_grid(families: List[str]) -> List[Tuple[str, Dict]]:
+    candidates = []
+    for family in families:
+        params = GRIDS[family]["params"]
+        for values in itertools.product(*params.values()):
+            candidates.append((family, dict(zip(params.keys(), values))))
+    return candidates
+
+
+def _fit_and_score(family: str, params: Dict, fold, n_classes: int) -> Dict:
+    X_fit, y_fit, X_val, y_val = fold
+    start = time.perf_counter()
+    model = make_classifier(family, params, n_classes).fit(X_fit, y_fit)
+    fit_seconds = time.perf_counter() - start
+    y_pred = model.predict(X_val)
+    return {"accuracy": accuracy_score(y_val, y_pred),
+            "macro_f1": f1_score(y_val, y_pred, average="macro", zero_division=0),
+            "fit_seconds": fit_seconds}
+
+
+def search(candidates: List[Tuple[str, Dict]], folds, n_classes: int, jobs: int) -> List[Dict]:
+    # One task per (candidate, fold); loky memory-maps the shared fold arrays
+    tasks = [(c, f) for c in range(len(candidates)) for f in range(len(folds))]
+    scores = Parallel(n_jobs=jobs)(
+        delayed(_fit_and_score)(candidates[c][0], candidates[c][1], folds[f], n_classes) for c, f in tasks)
+
+    per_candidate: Dict[int, List[Dict]] = {}
+    for (c, _), score in zip(tasks, scores):
+        per_candidate.setdefault(c, []).append(score)
+
+    results = []
+    for c, fold_scores in per_candidate.items():
+        family, params = candidates[c]
+        accuracy = [s["accuracy"] for s in fold_scores]
+        results.append({
+            "family": family,
+            "params": params,
+            "cv_accuracy": round(float(np.mean(accuracy)), 4),
+            "cv_accuracy_std": round(float(np.std(accuracy)), 4),
+            "cv_macro_f1": round(float(np.mean([s["macro_f1"] for s in fold_scores])), 4),
+            "fit_seconds": round(float(np.mean([s["fit_seconds"] for s in fold_scores])), 4),
+        })
+    return sorted(results, key=lambda r: (-r["cv_accuracy"], r["fit_seconds"]))
+
+
+def serving_cost(pipeline: Pipeline, X_test: pd.DataFrame, runs: int) -> Dict:
+    """Single-row latency as SeverityPredictor.predict() sees it, batch throughput and pickled size."""
+    rows = X_test.to_dict(orient="records")
+    pipeline.predict(pd.DataFrame([rows[0]]))  # warm-up
+    latencies = []
+    for i in range(runs):
+        start = time.perf_counter()
+        pipeline.predict(pd.DataFrame([rows[i % len(rows)]]))
+        latencies.append(time.perf_counter() - start)
+
+    batch = pd.concat([X_test] * max(1, 10000 // len(X_test)), ignore_index=True)
+    start = time.perf_counter()
+    pipeline.predict(batch)
+    batch_seconds = time.perf_counter() - start
+
+    buffer = io.BytesIO()
+    joblib.dump(pipeline, buffer)
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "predict_p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "predict_p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "batch_rows_per_second": round(len(batch) / batch_seconds) if batch_seconds else 0,
+        "model_bytes": buffer.getbuffer().nbytes,
+    }
+
+
+def evaluate_finalists(results: List[Dict], X_train, y_train, X_test, y_test, n_classes: int,
+                       latency_runs: int) -> List[Dict]:
+    """Refits the best configuration of each family as a full pipeline and measures it on the test split."""
+    best_per_family = {}
+    for result in results:
+        best_per_family.setdefault(result["family"], result)
+
+    def finalize(result):
+        pipeline = Pipeline([
+            ("preprocessor", make_preprocessor(X_train)),
+            ("classifier", make_classifier(result["family"], result["params"], n_classes)),
+        ])
+        start = time.perf_counter()
+        pipeline.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        y_pred = pipeline.predict(X_test)
+        report = classification_report(y_test, y_pred, output_dict=True, zero_division=0)
+        return pipeline, {
+            **result,
+            "name": GRIDS[result["family"]]["name"],
+            "test_accuracy": round(report["accuracy"], 4),
+            "test_macro_f1": round(report["macro avg"]["f1-score"], 4),
+            "test_weighted_f1": round(report["weighted avg"]["f1-score"], 4),
+            "refit_seconds": round(fit_seconds, 3),
+            **serving_cost(pipeline, X_test, latency_runs),
+        }
+
+    # Latency is measured one finalist at a time so they don't compete for cores
+    finalists = []
+    for result in best_per_family.values():
+        pipeline, summary = finalize(result)
+        finalists.append({"pipeline": pipeline, "summary": summary})
+    return finalists
+
+
+def select(finalists: List[Dict], select_by: str) -> Dict:
+    if select_by == "latency_adjusted":
+        # Most accurate among those within one point of the best, then fastest
+        best = max(f["summary"]["test_accuracy"] for f in finalists)
+        close = [f for f in finalists if f["summary"]["test_accuracy"] >= best - 0.01]
+        return min(close, key=lambda f: (f["summary"]["predict_p50_ms"], f["summary"]["model_bytes"]))
+    return max(finalists, key=lambda f: (f["summary"][select_by], -f["summary"]["predict_p50_ms"]))
+
+
+def write_artifact(winner: Dict, finalists: List[Dict], results: List[Dict], meta: Dict,
+                   artifacts_dir: Path, promote: bool) -> Path:
+    version = f"{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}-{meta['data_fingerprint'][:8]}"
+    out_dir = artifacts_dir / version
+    out_dir.mkdir(parents=True, exist_ok=True)
+    model_path = out_dir / MODEL_FILENAME
+    joblib.dump(winner["pipeline"], model_path)
+
+    manifest = {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "model_file": MODEL_FILENAME,
+        "model_sha256": hashlib.sha256(model_path.read_bytes()).hexdigest(),
+        "selected": winner["summary"],
+        "finalists": [f["summary"] for f in finalists],
+        "search": results,
+        **meta,
+        "environment": {"python": platform.python_version(), "sklearn": sklearn.__version__,
+                        "numpy": np.__version__, "pandas": pd.__version__},
+    }
+    with open(out_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+    if promote:
+        # Copy next to the served model, then rename over it in one step
+        tmp_path = SERVING_MODEL_PATH.with_suffix(".pkl.tmp")
+        shutil.copyfile(model_path, tmp_path)
+        os.replace(tmp_path, SERVING_MODEL_PATH)
+        # Point CURRENT at the version for servers watching MODEL_RELOAD_DIR
+        current_tmp = artifacts_dir / f".{CURRENT_FILE}.{os.getpid()}.tmp"
+        current_tmp.write_text(version, encoding="utf-8")
+        os.replace(current_tmp, artifacts_dir / CURRENT_FILE)
+    return out_dir
+
+
+def print_summary(results: List[Dict], finalists: List[Dict], winner: Dict, out_dir: Path, promote: bool):
+    print(f"\n📊 Top configurations ({len(results)} evaluated):")
+    for r in results[:10]:
+        print(f"   {GRIDS[r['family']]['name']:>20} {r['cv_accuracy']:.3f} ± {r['cv_accuracy_std']:.3f}  {r['params']}")
+    print(f"\n{'finalist':>20} {'test acc':>8} {'macro F1':>8} {'p50 ms':>7} {'p95 ms':>7} {'rows/s':>9} {'size KB':>8}")
+    for f in finalists:
+        s = f["summary"]
+        print(f"{s['name']:>20} {s['test_accuracy']:>8.3f} {s['test_macro_f1']:>8.3f} {s['predict_p50_ms']:>7.2f} "
+              f"{s['predict_p95_ms']:>7.2f} {s['batch_rows_per_second']:>9} {s['model_bytes'] / 1024:>8.0f}")
+    print(f"\n✅ Selected: {winner['summary']['name']} {winner['summary']['params']}")
+    print(f"💾 Artifact written to {out_dir}")
+    if promote:
+        print(f"🚀 Promoted to {SERVING_MODEL_PATH}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and compare severity classifiers in parallel")
+    parser.add_argument("--data", help=f"Training CSV (default: {DEFAULT_DATASET.name})")
+    parser.add_argument("--synthetic-rows", type=int, default=0,
+                        help="Train on this many rows from app.tools.synthetic_users instead of a CSV")
+    parser.add_argument("--families", default=",".join(GRIDS), help="Comma-separated subset of lr,knn,rf,xgb")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel fits (-1: all cores)")
+    parser.add_argument("--seed", type=int, default=RANDOM_STATE)
+    parser.add_argument("--select-by", choices=["test_accuracy", "test_macro_f1", "latency_adjusted"],
+                        default="test_accuracy", help="latency_adjusted: fastest model within 1 point of the best")
+    parser.add_argument("--latency-runs", type=int, default=200, help="Single-row predictions timed per finalist")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_ARTIFACTS_DIR / ".fold_cache"),
+                        help="Where preprocessed folds are kept between runs ('' to disable)")
+    parser.add_argument("--artifacts-dir", default=str(DEFAULT_ARTIFACTS_DIR))
+    parser.add_argument("--promote", action="store_true", help=f"Also replace {SERVING_MODEL_PATH.name}")
+    args = parser.parse_args()
+
+    families = available_families([f.strip() for f in args.families.split(",") if f.strip()])
+    if not families:
+        raise SystemExit("No model family left to train")
+
+    df, source = load_dataset(args.data, args.synthetic_rows, args.seed)
+    X = df.drop(columns=[c for c in DROP_COLUMNS if c in df.columns])
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(df[TARGET])  # 1→0 ... 5→4, undone by to_severity_score()
+    n_classes = len(label_encoder.classes_)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, stratify=y, shuffle=True, random_state=args.seed)
+    fingerprint = data_fingerprint(df)
+
+    start = time.perf_counter()
+    folds = build_folds(X_train, y_train, args.folds, args.seed, args.cache_dir or None, fingerprint)
+    candidates = expand_grid(families)
+    print(f"🔍 {len(candidates)} configurations × {args.folds} folds on {len(X_train)} rows ({source})")
+    results = search(candidates, folds, n_classes, args.jobs)
+    search_seconds = time.perf_counter() - start
+
+    finalists = evaluate_finalists(results, X_train, y_train, X_test, y_test, n_classes,
+                                   args.latency_runs)
+    winner = select(finalists, args.select_by)
+
+    meta = {
+        "data_source": source,
+        "data_fingerprint": fingerprint,
+        "rows": len(df),
+        "features": X.columns.tolist(),
+        "classes": [int(c) for c in label_encoder.classes_],
+        "seed": args.seed,
+        "test_size": TEST_SIZE,
+        "folds": args.folds,
+        "select_by": args.select_by,
+        "search_seconds": round(search_seconds, 2),
+    }
+    out_dir = write_artifact(winner, finalists, results, meta, Path(args.artifacts_dir), args.promote)
+    print_summary(results, finalists, winner, out_dir, args.promote)
+
+
+if __name__ == "__main__":
+    main()
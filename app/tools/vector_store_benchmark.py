@@ -0,0 +1,109 @@
+# app/tools/vector_store_benchmark.py
+# Latency comparison: Chroma persistent client vs the in-process NumPy index.
+#
+# Both stores are queried by vector with the same query embeddings, so the
+# comparison covers search + Document construction, not the embedding call.
+# By default the queries are perturbed copies of stored vectors (no API key
+# needed); --queries severity embeds the retriever's severity queries instead.
+#
+#   python -m app.services.rag.export_index
+#   python -m app.tools.vector_store_benchmark --runs 200
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.rag.export_index import DEFAULT_CHROMADB_PATH, DEFAULT_COLLECTION
+from app.services.rag.index_versions import resolve_chromadb_path
+from app.services.rag.numpy_store import NumpyVectorStore, current_numpy_index_path, load_numpy_index
+
+MEDIA_FILTER = {"content_type": {"$in": ["video", "podcast"]}}
+
+
+def severity_query_texts() -> list:
+    # Same query set the retriever uses, plus the media-suffixed variants
+    from app.services.rag.rag_service import SimplifiedPainFocusedRAGRetriever
+    queries = SimplifiedPainFocusedRAGRetriever(None).severity_queries
+    texts = sorted({q for qs in queries.values() for q in qs})
+    return texts + [f"{q} video podcast" for q in texts]
+
+
+def build_query_vectors(index, source: str, count: int, seed: int) -> np.ndarray:
+    if source == "severity":
+        from app.services.rag.google_http import make_embeddings
+        embeddings = make_embeddings("models/embedding-001")
+        return np.asarray(embeddings.embed_documents(severity_query_texts()), dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), size=min(count, len(index)), replace=False)
+    vectors = np.asarray(index.embeddings[rows], dtype=np.float32)
+    noise = rng.normal(scale=0.01, size=vectors.shape).astype(np.float32)
+    return vectors + noise
+
+
+def time_search(search, query_vectors: np.ndarray, runs: int) -> dict:
+    latencies = []
+    results = []
+    for i in range(runs):
+        q = query_vectors[i % len(query_vectors)]
+        start = time.perf_counter()
+        docs = search(q)
+        latencies.append(time.perf_counter() - start)
+        if i < len(query_vectors):
+            results.append([doc.id for doc in docs])
+    latencies = np.array(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "mean_ms": float(latencies.mean()),
+        "results": results,
+    }
+
+
+def overlap(a: list, b: list) -> float:
+    scores = [len(set(x) & set(y)) / max(len(x), 1) for x, y in zip(a, b)]
+    return float(np.mean(scores)) if scores else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma vs NumPy vector store latency comparison")
+    parser.add_argument("--chromadb-path", default=str(resolve_chromadb_path(DEFAULT_CHROMADB_PATH)))
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--numpy-index", default=str(current_numpy_index_path()))
+    parser.add_argument("--queries", choices=["corpus", "severity"], default="corpus")
+    parser.add_argument("--query-count", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from langchain_chroma import Chroma
+
+    index = load_numpy_index(Path(args.numpy_index))
+    numpy_store = NumpyVectorStore(index, embedding_function=None)
+    chroma_store = Chroma(collection_name=args.collection, persist_directory=args.chromadb_path)
+    query_vectors = build_query_vectors(index, args.queries, args.query_count, args.seed)
+
+    print(f"📊 {len(index)} docs, dim={index.dim}, dtype={index.embeddings.dtype}, "
+          f"{len(query_vectors)} query vectors, {args.runs} runs, k={args.k}")
+    print(f"{'scenario':<28} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'top-k overlap':>14}")
+
+    for label, where in (("unfiltered", None), ("content_type $in media", MEDIA_FILTER)):
+        chroma = time_search(
+            lambda q: chroma_store.similarity_search_by_vector(q.tolist(), k=args.k, filter=where),
+            query_vectors, args.runs)
+        numpy_result = time_search(
+            lambda q: numpy_store.similarity_search_by_vector(q, k=args.k, filter=where),
+            query_vectors, args.runs)
+        agreement = overlap(numpy_result["results"], chroma["results"])
+
+        print(f"{'chroma ' + label:<28} {chroma['p50_ms']:>8.3f} {chroma['p95_ms']:>8.3f} {chroma['mean_ms']:>8.3f}")
+        print(f"{'numpy ' + label:<28} {numpy_result['p50_ms']:>8.3f} {numpy_result['p95_ms']:>8.3f} "
+              f"{numpy_result['mean_ms']:>8.3f} {agreement:>14.2%}")
+        print(f"{'speedup (p50)':<28} {chroma['p50_ms'] / max(numpy_result['p50_ms'], 1e-9):>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
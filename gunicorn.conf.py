@@ -0,0 +1,40 @@
+# gunicorn.conf.py
+# Multi-worker production server: gunicorn process manager with uvicorn workers.
+#
+#   gunicorn -c gunicorn.conf.py app.main:app
+#
+# The app is imported once in the master (preload_app) and the read-only assets
+# (classifier, NumPy vector index when enabled, RAG libraries) are loaded there
+# before forking, so the workers share them copy-on-write. Care tips are
+# handed off between workers through the shared care-tip cache directory
+# (CARE_TIP_CACHE_DIR), so the submit and "yes" turns may land on any worker.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+# GUNICORN_PRELOAD=0 disables preloading (each worker loads its own copy)
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+# RAG generation runs in background threads inside the workers, so give
+# workers time to finish them on shutdown instead of recycling them.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # Runs in the master after the app is imported and before any worker is forked
+    if preload_app:
+        from app.services.preload import preload_assets
+        preload_assets()
+
+
+def post_fork(server, worker):
+    from app.services.preload import reinitialize_after_fork
+    reinitialize_after_fork()
@@ -0,0 +1,158 @@
+# tests/test_admission.py
+# Stage thresholds, shedding transitions and the middleware of admission control.
+#
+#   python -m pytest -q tests/test_admission.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services import admission
+from app.services.admission import (
+    NORMAL, PREDEFINED, REJECT, SKIP_RAG, AdmissionControlMiddleware, AdmissionController,
+)
+
+
+def controller(**kwargs):
+    options = dict(max_in_flight=10, max_rag_backlog=4, slo_seconds=1.0, window_seconds=30,
+                   stage_loads=[0.8, 1.0, 1.25])
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def add_latencies(ctl, seconds, count=admission.MIN_LATENCY_SAMPLES):
+    for _ in range(count):
+        ctl.in_flight += 1  # as if admitted
+        ctl.release(heavy=True, seconds=seconds, rejected=False)
+
+
+@pytest.mark.parametrize("load, stage", [
+    (0.0, NORMAL), (0.79, NORMAL), (0.8, SKIP_RAG), (0.99, SKIP_RAG),
+    (1.0, PREDEFINED), (1.24, PREDEFINED), (1.25, REJECT), (5.0, REJECT),
+])
+def test_stage_thresholds(load, stage):
+    assert controller()._stage(load) == stage
+
+
+def test_latency_transitions_skip_rag_predefined_reject():
+    ctl = controller()
+    assert ctl.admit(heavy=True) == NORMAL
+    ctl.release(heavy=True, seconds=0.0, rejected=True)
+
+    stages = []
+    for p95 in (0.9, 1.1, 1.3):
+        ctl._latencies.clear()
+        add_latencies(ctl, p95)
+        stages.append(ctl.admit(heavy=True))
+        ctl.release(heavy=True, seconds=0.0, rejected=True)
+    assert stages == [SKIP_RAG, PREDEFINED, REJECT]
+    assert ctl.rejected == 1
+    assert ctl.admitted == {"normal": 1, "skip_rag": 1, "predefined": 1}
+
+
+def test_too_few_latency_samples_are_ignored():
+    ctl = controller()
+    add_latencies(ctl, 10.0, count=admission.MIN_LATENCY_SAMPLES - 1)
+    assert ctl.stats()["signals"]["latency"] == 0.0
+
+
+def test_old_latency_samples_age_out():
+    ctl = controller(window_seconds=0.1)
+    add_latencies(ctl, 10.0)
+    assert ctl.stats()["stage"] == "reject"
+    time.sleep(0.15)
+    assert ctl.stats()["stage"] == "normal"
+
+
+def test_in_flight_and_rag_backlog_signals():
+    ctl = controller()
+    for _ in range(8):
+        ctl.admit(heavy=False)
+    assert ctl.admit(heavy=True) == SKIP_RAG  # 8 of 10 in flight
+    for _ in range(9):
+        ctl.release(heavy=False, seconds=0.0, rejected=True)
+
+    with ctl.rag_job(), ctl.rag_job(), ctl.rag_job(), ctl.rag_job():
+        assert ctl.rag_backlog == 4
+        assert ctl.admit(heavy=True) == PREDEFINED  # 4 of 4 RAG jobs
+        ctl.release(heavy=True, seconds=0.0, rejected=False)
+    assert ctl.rag_backlog == 0
+
+
+def test_core_intents_are_never_shed():
+    ctl = controller()
+    add_latencies(ctl, 10.0)
+    assert ctl.admit(heavy=True) == REJECT
+    assert ctl.admit(heavy=False) == NORMAL
+
+
+def webhook_body(intent):
+    return {"queryResult": {"intent": {"displayName": intent}}}
+
+
+def run_middleware(ctl, monkeypatch, intents, handler_seconds=0.0):
+    """Posts one request per intent concurrently; returns the responses and the stages handlers saw."""
+    httpx = pytest.importorskip("httpx")
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    monkeypatch.setattr(admission, "_admission_controller_instance", ctl)
+    seen = []
+
+    def handle(body):
+        seen.append(admission.current_stage())
+        time.sleep(handler_seconds)
+        return JSONResponse({"fulfillmentText": "served"})
+
+    async def webhook(request):
+        return await asyncio.to_thread(handle, await request.json())
+
+    app = AdmissionControlMiddleware(Starlette(routes=[Route("/webhook", webhook, methods=["POST"])]))
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/webhook", json=webhook_body(i)) for i in intents))
+
+    return asyncio.run(run()), seen
+
+
+def test_middleware_rejects_heavy_intents_and_serves_core_ones(monkeypatch):
+    ctl = controller()
+    add_latencies(ctl, 10.0)
+    heavy, core = admission.HEAVY_INTENTS[0], "Report_Body_Reactions_And_Pain_Issue"
+    (rejected, served), seen = run_middleware(ctl, monkeypatch, [heavy, core])
+    assert rejected.json() == admission.try_again_response()
+    assert served.json() == {"fulfillmentText": "served"}
+    assert seen == [NORMAL]
+    assert ctl.in_flight == 0
+
+
+def test_middleware_passes_the_stage_to_the_handler(monkeypatch):
+    ctl = controller()
+    add_latencies(ctl, 0.9)
+    _, seen = run_middleware(ctl, monkeypatch, [admission.HEAVY_INTENTS[1]])
+    assert seen == [SKIP_RAG]
+
+
+def test_concurrent_requests_overlap_in_flight_and_latency_includes_the_wait(monkeypatch):
+    ctl = controller()
+    peak = []
+    original_admit = ctl.admit
+    lock = threading.Lock()
+
+    def admit(heavy):
+        stage = original_admit(heavy)
+        with lock:
+            peak.append(ctl.in_flight)
+        return stage
+
+    monkeypatch.setattr(ctl, "admit", admit)
+    heavy = admission.HEAVY_INTENTS[0]
+    run_middleware(ctl, monkeypatch, [heavy] * 5, handler_seconds=0.3)
+    assert max(peak) == 5
+    assert len(ctl._latencies) == 5
+    assert all(seconds >= 0.3 for _, seconds in ctl._latencies)
@@ -0,0 +1,172 @@
+# tests/test_care_tip_handoff.py
+# Pending-marker handoff between the submit turn and the "Yes" turn.
+#
+#   python -m pytest -q tests/test_care_tip_handoff.py
+
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from app.services import utils
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("CARE_TIP_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_missing_tip_reads_as_none(cache_dir):
+    assert utils.read_refined_care_tip("s1", "u1") is None
+
+
+def test_pending_marker_is_returned_after_the_wait(cache_dir):
+    utils.mark_care_tip_pending("s1", "u1", 4)
+    start = time.monotonic()
+    tip = utils.read_refined_care_tip("s1", "u1", wait_seconds=0.3, poll_interval=0.05)
+    assert time.monotonic() - start >= 0.3
+    assert utils.is_care_tip_pending(tip)
+    assert tip["severity_score"] == 4
+
+
+def test_tip_saved_while_waiting_is_picked_up(cache_dir):
+    utils.mark_care_tip_pending("s1", "u1")
+    saver = threading.Timer(0.2, utils.save_refined_care_tip, args=("s1", "u1", {"fulfillmentText": "tip"}))
+    saver.start()
+    tip = utils.read_refined_care_tip("s1", "u1", wait_seconds=5, poll_interval=0.05)
+    saver.join()
+    assert tip == {"fulfillmentText": "tip"}
+
+
+def test_atomic_write_leaves_no_temp_files(cache_dir):
+    utils.mark_care_tip_pending("s1", "u1")
+    utils.save_refined_care_tip("s1", "u1", {"fulfillmentText": "tip"})
+    assert os.listdir(cache_dir) == ["s1-u1.json"]
+
+
+def test_reader_never_sees_a_partial_write(cache_dir):
+    utils.mark_care_tip_pending("s1", "u1")
+    payload = {"fulfillmentText": "x" * 200_000}
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            utils.save_refined_care_tip("s1", "u1", payload)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(200):
+            # A torn read would fail to parse and come back as None
+            tip = utils.read_refined_care_tip("s1", "u1")
+            assert utils.is_care_tip_pending(tip) or tip == payload
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_pending_yes_turns_do_not_block_each_other(cache_dir, monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    from app import main
+    from app.services import care_tip_handlers
+
+    monkeypatch.setattr(care_tip_handlers, "CARE_TIP_WAIT_SECONDS", 1.0)
+    uuids = [f"u{i}" for i in range(5)]
+    for uuid in uuids:
+        utils.mark_care_tip_pending("s1", uuid)
+
+    def body(uuid):
+        return {
+            "session": "projects/p/agent/sessions/s1",
+            "queryResult": {
+                "intent": {"displayName": "Activity_assessment - custom - yes"},
+                "outputContexts": [{
+                    "name": "projects/p/agent/sessions/s1/contexts/awaiting_care_tip",
+                    "parameters": {"care_tip_uuid": uuid},
+                }],
+            },
+        }
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/webhook", json=body(uuid)) for uuid in uuids))
+
+    start = time.monotonic()
+    responses = asyncio.run(run())
+    elapsed = time.monotonic() - start
+    assert all(r.status_code == 200 for r in responses)
+    assert all("still being prepared" in r.json()["fulfillmentText"] for r in responses)
+    # Five 1 s waits in sequence would take 5 s
+    assert elapsed < 2.5
+
+
+def _yes_body(uuid):
+    return {
+        "session": "projects/p/agent/sessions/s1",
+        "queryResult": {
+            "outputContexts": [{
+                "name": "projects/p/agent/sessions/s1/contexts/awaiting_care_tip",
+                "parameters": {"care_tip_uuid": uuid},
+            }],
+        },
+    }
+
+
+def test_failed_generation_replaces_the_pending_marker(cache_dir, monkeypatch):
+    from app.services import care_tip_handlers
+
+    real_pain_care_tip = care_tip_handlers._pain_care_tip
+
+    def failing_pain_care_tip(session_id, severity_score, predefined_only=False):
+        if not predefined_only:
+            raise RuntimeError("Gemini unavailable")
+        return real_pain_care_tip(session_id, severity_score, predefined_only=True)
+
+    monkeypatch.setattr(care_tip_handlers, "_pain_care_tip", failing_pain_care_tip)
+    monkeypatch.setattr(care_tip_handlers, "CARE_TIP_WAIT_SECONDS", 0)
+    utils.mark_care_tip_pending("s1", "u1", 3)
+    care_tip_handlers.run_rag_async("s1", "u1", 3)
+
+    tip = care_tip_handlers.handle_care_tip(_yes_body("u1"))
+    assert not utils.is_care_tip_pending(tip)
+    assert tip == real_pain_care_tip("s1", 3, predefined_only=True)
+
+
+def test_failed_fallback_reports_the_failure(cache_dir, monkeypatch):
+    from app.services import care_tip_handlers
+
+    def failing_pain_care_tip(session_id, severity_score, predefined_only=False):
+        raise RuntimeError("Gemini unavailable")
+
+    monkeypatch.setattr(care_tip_handlers, "_pain_care_tip", failing_pain_care_tip)
+    monkeypatch.setattr(care_tip_handlers, "CARE_TIP_WAIT_SECONDS", 0)
+    utils.mark_care_tip_pending("s1", "u1", 3)
+    care_tip_handlers.run_rag_async("s1", "u1", 3)
+
+    tip = care_tip_handlers.handle_care_tip(_yes_body("u1"))
+    assert "failed to retrieve care tip" in tip["fulfillmentText"]
+
+
+def test_stale_pending_marker_serves_the_predefined_tip(cache_dir, monkeypatch):
+    from app.services import care_tip_handlers
+
+    monkeypatch.setattr(care_tip_handlers, "CARE_TIP_WAIT_SECONDS", 0)
+    monkeypatch.setattr(care_tip_handlers, "CARE_TIP_STALE_SECONDS", 60)
+    # A marker left by a worker that died mid-generation
+    utils.save_refined_care_tip("s1", "u1", {utils.CARE_TIP_PENDING_KEY: utils.CARE_TIP_PENDING,
+                                             "time": int(time.time()) - 120, "severity_score": 2})
+    utils.save_refined_care_tip("s1", "u2", {utils.CARE_TIP_PENDING_KEY: utils.CARE_TIP_PENDING,
+                                             "time": int(time.time()) - 120})
+
+    tip = care_tip_handlers.handle_care_tip(_yes_body("u1"))
+    assert tip == care_tip_handlers._pain_care_tip("s1", 2, predefined_only=True)
+    assert utils.read_refined_care_tip("s1", "u1") == tip
+    assert "failed to retrieve care tip" in care_tip_handlers.handle_care_tip(_yes_body("u2"))["fulfillmentText"]
+
+    # A fresh marker still asks the user to wait
+    utils.mark_care_tip_pending("s1", "u3", 2)
+    assert "still being prepared" in care_tip_handlers.handle_care_tip(_yes_body("u3"))["fulfillmentText"]
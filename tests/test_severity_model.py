@@ -0,0 +1,64 @@
+# tests/test_severity_model.py
+# Startup validation of reload-dir models and the admin endpoints' token check.
+#
+#   python -m pytest -q tests/test_severity_model.py
+
+import json
+import shutil
+
+import joblib
+import pytest
+from sklearn.dummy import DummyClassifier
+
+from app.services import severity_predictor
+from app.services.severity_predictor import SeverityPredictor
+
+
+def write_version(reload_dir, version, model_path):
+    version_dir = reload_dir / version
+    version_dir.mkdir(parents=True)
+    shutil.copy(model_path, version_dir / severity_predictor.MODEL_FILENAME)
+    (version_dir / severity_predictor.MANIFEST_FILE).write_text(json.dumps({"version": version}))
+    (reload_dir / severity_predictor.CURRENT_FILE).write_text(version)
+
+
+def test_current_version_is_smoke_tested_at_startup(tmp_path):
+    write_version(tmp_path, "v1", severity_predictor.MODEL_PATH)
+    predictor = SeverityPredictor(reload_dir=str(tmp_path))
+    assert predictor.status()["version"] == "v1"
+    assert predictor.status()["smoke_accuracy"] >= severity_predictor.MODEL_SMOKE_MIN_ACCURACY
+
+
+def test_rejected_version_falls_back_to_model_path(tmp_path):
+    bad_model = tmp_path / "bad.pkl"
+    joblib.dump(DummyClassifier(strategy="constant", constant=7).fit([[0]], [7]), bad_model)
+    write_version(tmp_path, "v2", bad_model)
+    predictor = SeverityPredictor(reload_dir=str(tmp_path))
+    status = predictor.status()
+    assert status["path"] == severity_predictor.MODEL_PATH
+    assert status["last_rejected_version"] == "v2"
+    assert "ModelValidationError" in status["last_error"]
+    # Not retried until the file changes
+    assert predictor.check_for_update() is False
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from app import main
+    return TestClient(main.app)
+
+
+def test_admin_endpoints_disabled_without_token(client, monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.get("/admin/model").status_code == 403
+    assert client.post("/admin/model/reload?force=true").status_code == 403
+
+
+def test_admin_endpoints_require_the_token(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert client.get("/admin/model").status_code == 401
+    assert client.get("/admin/model", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    response = client.get("/admin/model", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["sha256"]